@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Catalog Bulk Rewriter
+
+Checks and injects vars into every Terraform component of the stack
+catalog in one pass. By default it makes sure each component has
+`tenant: "${tenant}"`.
+
+- Walks the whole catalog tree (stacks/catalog/**), including nested files
+  such as catalog/vpc/defaults.yaml and multi-document files.
+- A component already has a var when its own vars (or a `<<` merge into
+  them) define it, or when the file's top-level vars do. Existing values are
+  never changed.
+- Files are edited as text at the positions PyYAML reports, so comments,
+  key order, quoting and anchors stay exactly as they were. New vars go
+  first in the component's vars block; a missing vars block is added as the
+  component's first key.
+- Files are processed on a process pool. Only files that change are
+  written, through a temporary file renamed over the original.
+- Components whose vars can't be edited safely (an alias, a templated
+  value) are reported and left alone.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./catalog_rewrite.py check [options]
+    ./catalog_rewrite.py apply [--dry-run] [options]
+
+Commands:
+    check                 List components missing a var; exit 1 if any are
+    apply                 Inject the missing vars
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --var NAME=VALUE      Var to inject, VALUE parsed as YAML (repeatable; default: tenant=${tenant})
+    --exclude GLOB        Catalog-relative paths to leave alone, e.g. 'templates/*' (repeatable)
+    -j, --jobs N          Worker processes (default: number of CPUs, at most 8)
+    --dry-run             With apply, print a unified diff instead of writing
+"""
+
+import os
+import sys
+import json
+import fnmatch
+import difflib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+import yaml
+
+from stack_graph import StackGraph, YAML_EXTENSIONS
+
+LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+DEFAULT_RULES = (("tenant", "${tenant}"),)
+
+# Below this many files a process pool costs more than it saves
+MIN_PARALLEL_FILES = 32
+
+Rule = Tuple[str, Any]
+Edit = Tuple[int, int, str]  # start offset, end offset, replacement
+
+
+def parse_rule(spec: str) -> Rule:
+    """NAME=VALUE with VALUE parsed as YAML"""
+    name, sep, value = spec.partition("=")
+    if not sep or not name.strip():
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {spec!r}")
+    return name.strip(), yaml.safe_load(value) if value else ""
+
+
+def render_var(name: str, value: Any) -> str:
+    """A var as a YAML mapping entry; JSON scalars and flow collections are valid YAML"""
+    return f"{name}: {json.dumps(value, ensure_ascii=False)}"
+
+
+def entry(mapping: yaml.MappingNode, key: str) -> Optional[Tuple[yaml.Node, yaml.Node]]:
+    """The (key node, value node) pair of a mapping entry"""
+    for key_node, value_node in mapping.value:
+        if isinstance(key_node, yaml.ScalarNode) and key_node.value == key:
+            return key_node, value_node
+    return None
+
+
+def mapping_keys(node: Optional[yaml.Node]) -> Set[str]:
+    """Keys of a mapping, including those merged in with `<<`"""
+    keys = set()  # type: Set[str]
+    if not isinstance(node, yaml.MappingNode):
+        return keys
+    for key_node, value_node in node.value:
+        if key_node.tag == "tag:yaml.org,2002:merge":
+            for merged in (value_node.value if isinstance(value_node, yaml.SequenceNode) else [value_node]):
+                keys.update(mapping_keys(merged))
+        elif isinstance(key_node, yaml.ScalarNode):
+            keys.add(key_node.value)
+    return keys
+
+
+def next_line(text: str, index: int) -> int:
+    """Offset of the start of the line after the one containing `index`"""
+    end = text.find("\n", index)
+    return len(text) if end == -1 else end + 1
+
+
+def plan_component(text: str, name: str, key_node: yaml.Node, component: yaml.Node, step: int,
+                   missing: List[Rule]) -> Tuple[Optional[Edit], Optional[str]]:
+    """The edit adding `missing` vars to one component, or why it can't be made"""
+    if not isinstance(component, yaml.MappingNode) or not component.value or component.flow_style:
+        return None, f"{name} is not a block mapping"
+    indent = component.value[0][0].start_mark.column
+    if indent > key_node.start_mark.column:
+        step = indent - key_node.start_mark.column
+    found = entry(component, "vars")
+
+    if found is None:
+        lines = [" " * indent + "vars:"] + [" " * (indent + step) + render_var(n, v) for n, v in missing]
+        return (next_line(text, key_node.end_mark.index),) * 2 + ("".join(line + "\n" for line in lines),), None
+
+    vars_key, vars_node = found
+    if text[vars_node.start_mark.index:vars_node.start_mark.index + 1] == "*":
+        return None, f"{name} takes its vars from an alias"
+    if isinstance(vars_node, yaml.MappingNode) and vars_node.flow_style:
+        entries = ", ".join(render_var(n, v) for n, v in missing)
+        start, end = vars_node.start_mark.index, vars_node.end_mark.index
+        if not vars_node.value:
+            return (text.rindex("{", start, end), end, "{" + entries + "}"), None  # keeps an anchor
+        return (end - 1, end - 1, ", " + entries), None
+    if isinstance(vars_node, yaml.MappingNode) and vars_node.value:
+        column = vars_node.value[0][0].start_mark.column
+        position = next_line(text, vars_key.end_mark.index)
+        return (position, position, "".join(" " * column + render_var(n, v) + "\n" for n, v in missing)), None
+    if isinstance(vars_node, yaml.ScalarNode) and vars_node.tag == "tag:yaml.org,2002:null":
+        # `vars:` with no value (or ~/null): replace the value with an indented block
+        line_end = next_line(text, vars_key.end_mark.index)
+        rest = text[vars_key.end_mark.index:line_end]
+        comment = rest[rest.index("#"):].strip() if "#" in rest else ""
+        block = "".join(" " * (vars_key.start_mark.column + step) + render_var(n, v) + "\n" for n, v in missing)
+        return (vars_key.end_mark.index, line_end, ":" + (" " + comment if comment else "") + "\n" + block), None
+    return None, f"{name} has vars that aren't a mapping"
+
+
+def plan_document(text: str, document: yaml.Node,
+                  rules: List[Rule]) -> Tuple[List[Edit], List[Dict[str, Any]], List[str]]:
+    """Edits, injected vars per component and problems for one YAML document"""
+    edits, changes, notes = [], [], []  # type: List[Edit], List[Dict[str, Any]], List[str]
+    if not isinstance(document, yaml.MappingNode):
+        return edits, changes, notes
+    top_vars = entry(document, "vars")
+    global_keys = mapping_keys(top_vars[1]) if top_vars else set()
+
+    components = entry(document, "components")
+    terraform = None
+    if components and isinstance(components[1], yaml.MappingNode):
+        terraform = entry(components[1], "terraform")
+    if not terraform or not isinstance(terraform[1], yaml.MappingNode):
+        return edits, changes, notes
+    terraform_key, terraform_node = terraform
+    step = (terraform_node.value[0][0].start_mark.column - terraform_key.start_mark.column
+            if terraform_node.value and not terraform_node.flow_style else 2)
+
+    for key_node, component in terraform_node.value:
+        name = key_node.value
+        found = entry(component, "vars") if isinstance(component, yaml.MappingNode) else None
+        present = global_keys | mapping_keys(found[1] if found else None)
+        missing = [(n, v) for n, v in rules if n not in present]
+        if not missing:
+            continue
+        edit, note = plan_component(text, name, key_node, component, max(1, step), missing)
+        if edit:
+            edits.append(edit)
+            changes.append({"component": name, "vars": [n for n, _ in missing]})
+        else:
+            notes.append(f"{note}; not adding {', '.join(n for n, _ in missing)}")
+    return edits, changes, notes
+
+
+def rewrite_text(text: str, rules: List[Rule]) -> Tuple[str, List[Dict[str, Any]], List[str]]:
+    """The text with every missing var injected, the injected vars per component, and problems.
+
+    Raises yaml.YAMLError when the text doesn't parse.
+    """
+    edits, changes, notes = [], [], []  # type: List[Edit], List[Dict[str, Any]], List[str]
+    for document in yaml.compose_all(text, Loader=LOADER):
+        doc_edits, doc_changes, doc_notes = plan_document(text, document, rules)
+        edits += doc_edits
+        changes += doc_changes
+        notes += doc_notes
+    for start, end, replacement in sorted(edits, reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text, changes, notes
+
+
+def write_text_atomic(file_path: str, text: str):
+    """Write text to a temporary file beside `file_path` and rename it over the original"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=f".{os.path.basename(file_path)}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        if os.path.exists(file_path):
+            os.chmod(tmp_path, os.stat(file_path).st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def process_file(args: Tuple[str, str, List[Rule], bool, bool]) -> Dict[str, Any]:
+    """Check or rewrite one catalog file"""
+    file_path, name, rules, write, diff = args
+    result = {"file": name, "changes": [], "notes": [], "error": None, "written": False, "diff": None}
+    try:
+        with open(file_path, "r") as f:
+            original = f.read()
+        updated, result["changes"], result["notes"] = rewrite_text(original, rules)
+    except (yaml.YAMLError, OSError) as e:
+        result["error"] = str(e)
+        return result
+    if updated != original:
+        if diff:
+            result["diff"] = "".join(difflib.unified_diff(
+                original.splitlines(True), updated.splitlines(True), f"a/{name}", f"b/{name}"))
+        if write:
+            write_text_atomic(file_path, updated)
+            result["written"] = True
+    return result
+
+
+class CatalogRewriter:
+    """Applies var-injection rules across every file of the stack catalog"""
+
+    def __init__(self, repo_root: str, rules: Iterable[Rule] = DEFAULT_RULES, excludes: Iterable[str] = (),
+                 jobs: int = min(8, os.cpu_count() or 1)):
+        self.repo_root = os.path.abspath(repo_root)
+        self.catalog_path = os.path.join(StackGraph.from_atmos_config(self.repo_root).stacks_path, "catalog")
+        self.rules = list(rules)
+        self.excludes = list(excludes)
+        self.jobs = max(1, jobs)
+
+    def files(self) -> List[str]:
+        """Catalog-relative paths of every YAML file in the catalog tree"""
+        found = []
+        for root, dirs, files in os.walk(self.catalog_path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(YAML_EXTENSIONS):
+                    rel_path = os.path.relpath(os.path.join(root, name), self.catalog_path).replace(os.sep, "/")
+                    if not any(fnmatch.fnmatch(rel_path, pattern) for pattern in self.excludes):
+                        found.append(rel_path)
+        return found
+
+    def run(self, write: bool = False, diff: bool = False) -> List[Dict[str, Any]]:
+        """Process every catalog file; files are only written with `write` and when they change"""
+        tasks = [
+            (path, os.path.relpath(path, self.repo_root).replace(os.sep, "/"), self.rules, write, diff)
+            for path in (os.path.join(self.catalog_path, name) for name in self.files())
+        ]
+        if len(tasks) >= MIN_PARALLEL_FILES and self.jobs > 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                return list(pool.map(process_file, tasks, chunksize=max(1, len(tasks) // (self.jobs * 4))))
+        return [process_file(task) for task in tasks]
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Check and inject vars across every component of the stack catalog")
+    parser.add_argument("command", choices=("check", "apply"), help="check: report missing vars; apply: inject them")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("--var", dest="rules", action="append", type=parse_rule, metavar="NAME=VALUE",
+                        help="Var to inject, VALUE parsed as YAML (repeatable; default: tenant=${tenant})")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Catalog-relative paths to leave alone (repeatable)")
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="Worker processes (default: number of CPUs, at most 8)")
+    parser.add_argument("--dry-run", action="store_true", help="With apply, print a unified diff instead of writing")
+    args = parser.parse_args()
+
+    rewriter = CatalogRewriter(args.repo_root, args.rules or DEFAULT_RULES, args.exclude, args.jobs)
+    if not os.path.isdir(rewriter.catalog_path):
+        print(f"Error: no catalog at {rewriter.catalog_path}", file=sys.stderr)
+        sys.exit(1)
+    apply = args.command == "apply"
+    results = rewriter.run(write=apply and not args.dry_run, diff=apply and args.dry_run)
+
+    changed = [r for r in results if r["changes"]]
+    problems = [r for r in results if r["notes"] or r["error"]]
+    for result in results:
+        if result["diff"]:
+            sys.stdout.write(result["diff"])
+        if args.command == "check" or not args.dry_run:
+            for change in result["changes"]:
+                verb = "added" if result["written"] else "missing"
+                print(f"{'✅' if result['written'] else '❌'} {result['file']}: {change['component']} "
+                      f"{verb} {', '.join(change['vars'])}")
+        if result["error"]:
+            print(f"⚠️  {result['file']}: invalid YAML: {result['error'].splitlines()[0]}")
+        for note in result["notes"]:
+            print(f"⚠️  {result['file']}: {note}")
+
+    components = sum(len(r["changes"]) for r in changed)
+    vars_list = ", ".join(n for n, _ in rewriter.rules)
+    if apply and not args.dry_run:
+        summary = f"Added {vars_list} to {components} components in {len(changed)} of {len(results)} files"
+    else:
+        summary = f"{components} components in {len(changed)} of {len(results)} files are missing {vars_list}"
+    if problems:
+        summary += f"; {len(problems)} files need manual changes"
+    print(f"\n{summary}", file=sys.stderr if args.dry_run else sys.stdout)
+    sys.exit(1 if problems or (changed and not (apply and not args.dry_run)) else 0)
+
+
+if __name__ == "__main__":
+    main()
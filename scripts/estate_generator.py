@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Synthetic Atmos Estate Generator
+
+Generates a repository-shaped estate of tenants x accounts x regions x
+environments from the stacks that exist today, for exercising the stack
+tooling at scale (see stack_benchmark.py).
+
+Every top-level stack of the repository is a template for its stage (dev,
+staging, prod). A generated environment copies its template's manifest and
+every orgs/ manifest the template imports (tenant, account and region
+defaults, the environment's component files) with:
+
+- import paths moved to orgs/<tenant>/<account>/<region>/<environment>
+- the tenant, account, region and environment names replaced
+- the second octet of 10.x.y.z CIDRs shifted per environment, so VPCs of
+  different environments don't share address space (up to 64 environments)
+
+Accounts cycle through the template stages (dev, staging, prod, dev2, ...).
+stacks/catalog, stacks/mixins, stacks/schemas and atmos.yaml are copied as
+they are, tenant and region mixins are added for the generated names, and
+components/ is symlinked to the repository's.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./estate_generator.py OUTPUT [options]
+
+Options:
+    -r, --repo-root PATH  Repository providing the templates (default: current directory)
+    --tenants N           Tenants (default: 2)
+    --accounts N          Accounts per tenant (default: 3)
+    --regions N           Regions per account (default: 2)
+    --environments N      Environments per region (default: 4)
+    --force               Replace OUTPUT if it exists
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+from typing import Dict, List, Any, Tuple
+
+from stack_resolver import StackResolver
+
+REGIONS = (
+    "eu-west-2", "us-east-2", "us-west-2", "eu-west-1", "eu-central-1", "us-east-1",
+    "ap-southeast-1", "ap-southeast-2", "ap-northeast-1", "ca-central-1", "sa-east-1", "eu-north-1",
+)
+
+# Copied verbatim into every estate
+SHARED_STACK_DIRS = ("catalog", "mixins", "schemas")
+
+ORG_PATH = re.compile(r"\borgs/[\w./-]+")
+CIDR = re.compile(r"\b10\.(\d{1,3})\.(?=\d{1,3}\.\d{1,3}/\d{1,2})")
+
+
+class Template:
+    """A top-level stack and the org manifests it imports, as raw text"""
+
+    def __init__(self, resolver: StackResolver, stack: str):
+        graph = resolver.graph
+        variables = resolver.resolve_stack(stack)["vars"]
+        self.stack = stack
+        self.stage = variables.get("stage") or variables.get("account")
+        self.names = {key: str(variables.get(key)) for key in ("tenant", "account", "region", "environment")}
+        self.files = {}  # type: Dict[str, str]
+        for key in [stack] + [k for k in graph.imports_of(stack) if k.startswith("orgs/")]:
+            with open(os.path.join(graph.stacks_path, graph.nodes[key]["path"]), "r") as f:
+                self.files[key] = f.read()
+
+    def move_path(self, path: str, names: Dict[str, str]) -> str:
+        """orgs/<tenant>/<account>/<region>/<environment>/... with the generated names"""
+        parts = path.split("/")
+        for index, key in enumerate(("tenant", "account", "region", "environment"), start=1):
+            if len(parts) > index and parts[index] == self.names[key]:
+                parts[index] = names[key]
+        return "/".join(parts)
+
+    def render(self, text: str, names: Dict[str, str], cidr_offset: int) -> str:
+        """A template manifest rewritten for one generated environment"""
+        text = ORG_PATH.sub(lambda m: self.move_path(m.group(0), names), text)
+        for key in ("tenant", "region", "environment"):
+            if self.names[key] != names[key]:
+                text = re.sub(rf"(?<![\w/-]){re.escape(self.names[key])}(?![\w-])", names[key], text)
+        text = re.sub(rf"(?m)^(\s*account:\s*[\"']?){re.escape(self.names['account'])}\b",
+                      lambda m: m.group(1) + names["account"], text)
+        return CIDR.sub(lambda m: f"10.{(int(m.group(1)) + cidr_offset) % 256}.", text)
+
+
+def load_templates(resolver: StackResolver) -> List[Template]:
+    """One template per stage, in stage order of the repository's stacks"""
+    templates = {}  # type: Dict[str, Template]
+    for stack in resolver.graph.stacks:
+        template = Template(resolver, stack)
+        templates.setdefault(template.stage, template)
+    order = ("dev", "staging", "prod")
+    return sorted(templates.values(), key=lambda t: (order.index(t.stage) if t.stage in order else len(order), t.stage))
+
+
+def write_file(path: str, text: str):
+    """Write a file, creating its directory"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def generate_estate(repo_root: str, output: str, tenants: int = 2, accounts: int = 3, regions: int = 2,
+                    environments: int = 4) -> Dict[str, Any]:
+    """Write a synthetic estate to `output` and return its size"""
+    repo_root = os.path.abspath(repo_root)
+    resolver = StackResolver.for_repo(repo_root)
+    graph = resolver.graph
+    templates = load_templates(resolver)
+    if not templates:
+        raise ValueError(f"{repo_root} has no stacks to use as templates")
+    if regions > len(REGIONS):
+        raise ValueError(f"at most {len(REGIONS)} regions are supported")
+
+    stacks_root = os.path.join(output, graph.base_path)
+    os.makedirs(stacks_root)
+    shutil.copy2(os.path.join(repo_root, "atmos.yaml"), output)
+    for name in SHARED_STACK_DIRS:
+        source = os.path.join(graph.stacks_path, name)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(stacks_root, name))
+    components_root = graph.components_base_path.split("/")[0]
+    os.symlink(os.path.join(repo_root, components_root), os.path.join(output, components_root))
+
+    mixins: Dict[str, Tuple[str, str]] = {}
+    for kind in ("tenant", "region"):
+        path = os.path.join(graph.stacks_path, "mixins", kind, templates[0].names[kind] + ".yaml")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                mixins[kind] = (templates[0].names[kind], f.read())
+
+    def write_mixin(kind: str, name: str):
+        target = os.path.join(stacks_root, "mixins", kind, name + ".yaml")
+        if kind in mixins and not os.path.exists(target):
+            original, text = mixins[kind]
+            write_file(target, re.sub(rf"(?<![\w-]){re.escape(original)}(?![\w-])", name, text))
+
+    written, stacks, index = 0, [], 0
+    for t in range(tenants):
+        tenant = f"t{t + 1:02d}"
+        write_mixin("tenant", tenant)
+        for a in range(accounts):
+            template = templates[a % len(templates)]
+            account = template.stage if a < len(templates) else f"{template.stage}{a // len(templates) + 1}"
+            for region in REGIONS[:regions]:
+                write_mixin("region", region)
+                for e in range(environments):
+                    names = {"tenant": tenant, "account": account, "region": region,
+                             "environment": f"{template.stage}-{e + 1:02d}"}
+                    for key, text in template.files.items():
+                        target = os.path.join(stacks_root, template.move_path(key, names) + ".yaml")
+                        if key != template.stack and os.path.exists(target):
+                            continue  # tenant, account and region defaults are shared
+                        write_file(target, template.render(text, names, cidr_offset=4 * index))
+                        written += 1
+                    stacks.append(f"{tenant}-{account}-{names['environment']}")
+                    index += 1
+
+    return {
+        "tenants": tenants, "accounts": accounts, "regions": regions, "environments": environments,
+        "stacks": len(stacks), "generated_manifests": written,
+    }
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic Atmos estate from the repository's stacks")
+    parser.add_argument("output", help="Directory to write the estate to")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Repository providing the templates (default: current directory)")
+    parser.add_argument("--tenants", type=int, default=2, help="Tenants (default: 2)")
+    parser.add_argument("--accounts", type=int, default=3, help="Accounts per tenant (default: 3)")
+    parser.add_argument("--regions", type=int, default=2, help="Regions per account (default: 2)")
+    parser.add_argument("--environments", type=int, default=4, help="Environments per region (default: 4)")
+    parser.add_argument("--force", action="store_true", help="Replace OUTPUT if it exists")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        if not args.force:
+            print(f"Error: {args.output} exists, use --force to replace it", file=sys.stderr)
+            sys.exit(1)
+        shutil.rmtree(args.output)
+
+    try:
+        stats = generate_estate(args.repo_root, args.output, args.tenants, args.accounts, args.regions,
+                                args.environments)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Atmos Hook Result Cache
+
+Runs a Terraform hook command (the pre_plan `terraform fmt -check -recursive`
+and pre_apply `terraform validate` hooks in atmos.yaml) only when its result
+could have changed. The fingerprint of a run covers:
+
+- the component directory's source files (generated backend and tfvars
+  files, plans, state and .terraform are ignored), including its lock file
+- the source files of the local modules it calls (`source = "../s3"`)
+- the installed module manifest (.terraform/modules/modules.json)
+- the Terraform version
+- the hook command itself
+
+A successful run records its fingerprint in .cache/hook-cache.json under the
+component directory and command. The next run with the same fingerprint is
+skipped and reported as such; failures are never cached. Every run, skip and
+failure is appended to .cache/hook-runs.jsonl as the audit trail.
+
+Hooks run in the component directory; the repository root is the nearest
+parent containing atmos.yaml.
+
+Requirements:
+    - Python 3.6+ on Linux or macOS (fcntl)
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./hook_cache.py run [--workdir DIR] [--no-cache] <command>...
+    ./hook_cache.py list
+    ./hook_cache.py clear [--workdir DIR]
+
+Options:
+    --workdir DIR    Component directory (default: current directory)
+    --no-cache       Always run the command, still recording a success
+    --terraform PATH terraform binary whose version is fingerprinted (default: terraform)
+
+Exit code: the command's exit code, or 0 on a cache hit.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import argparse
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+
+from provider_cache import read_module
+from stack_graph import hash_tree, write_json_atomic
+
+CACHE_VERSION = 1
+CACHE_FILE = os.path.join(".cache", "hook-cache.json")
+AUDIT_FILE = os.path.join(".cache", "hook-runs.jsonl")
+
+
+def find_repo_root(path: str) -> str:
+    """Nearest directory at or above `path` containing atmos.yaml"""
+    current = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(current, "atmos.yaml")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return os.path.abspath(path)
+        current = parent
+
+
+def utc_now() -> str:
+    """Current time as an ISO 8601 UTC timestamp"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class HookCache:
+    """Fingerprinted record of successful hook runs per component directory"""
+
+    def __init__(self, repo_root: str, terraform: str = "terraform"):
+        self.repo_root = os.path.abspath(repo_root)
+        self.terraform = terraform
+        self.cache_path = os.path.join(self.repo_root, CACHE_FILE)
+        self.audit_path = os.path.join(self.repo_root, AUDIT_FILE)
+
+    @contextmanager
+    def locked(self):
+        """Serialize read-modify-write of the cache between concurrent hooks"""
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self) -> Dict[str, Any]:
+        """Cache contents, empty when missing, unreadable or from another version"""
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": CACHE_VERSION, "terraform": {}, "entries": {}}
+
+    def terraform_version(self, data: Dict[str, Any]) -> str:
+        """Version of the terraform binary, memoized in the cache by path, size and mtime"""
+        binary = shutil.which(self.terraform)
+        if binary is None:
+            return "missing"
+        binary = os.path.realpath(binary)
+        stat = os.stat(binary)
+        identity = f"{stat.st_size}:{stat.st_mtime_ns}"
+        known = data["terraform"].get(binary)
+        if known and known["identity"] == identity:
+            return known["version"]
+        try:
+            output = subprocess.run([binary, "version", "-json"], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, text=True, timeout=60).stdout
+            version = json.loads(output).get("terraform_version", "unknown")
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            version = "unknown"
+        data["terraform"][binary] = {"identity": identity, "version": version}
+        return version
+
+    def fingerprint(self, workdir: str, command: List[str], terraform_version: str) -> str:
+        """Hash of everything the hook's result depends on"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([command, terraform_version]).encode())
+        pending, seen = [os.path.abspath(workdir)], set()
+        while pending:
+            module_dir = os.path.normpath(pending.pop())
+            if module_dir in seen or not os.path.isdir(module_dir):
+                continue
+            seen.add(module_dir)
+            digest.update(os.path.relpath(module_dir, self.repo_root).encode() + b"\0")
+            digest.update(hash_tree(module_dir).encode())
+            pending.extend(os.path.join(module_dir, s) for s in read_module(module_dir)[1])
+        modules_json = os.path.join(workdir, os.environ.get("TF_DATA_DIR", ".terraform"), "modules", "modules.json")
+        if os.path.exists(modules_json):
+            with open(modules_json, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def audit(self, record: Dict[str, Any]):
+        """Append one run record to the audit trail"""
+        os.makedirs(os.path.dirname(self.audit_path), exist_ok=True)
+        with open(self.audit_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def run(self, workdir: str, command: List[str], use_cache: bool = True) -> int:
+        """Run a hook command unless an identical run already succeeded; returns its exit code"""
+        workdir = os.path.abspath(workdir)
+        relative = os.path.relpath(workdir, self.repo_root)
+        key = f"{relative}\0{' '.join(command)}"
+        with self.locked():
+            data = self.load()
+            known_versions = dict(data["terraform"])
+            terraform_version = self.terraform_version(data)
+            if data["terraform"] != known_versions:
+                write_json_atomic(self.cache_path, data, indent=1)
+        fingerprint = self.fingerprint(workdir, command, terraform_version)
+        record = {
+            "time": utc_now(), "workdir": relative, "command": " ".join(command),
+            "fingerprint": fingerprint, "terraform_version": terraform_version,
+        }
+
+        entry = data["entries"].get(key)
+        if use_cache and entry and entry["fingerprint"] == fingerprint:
+            print(f"hook cache: skipping `{record['command']}` in {relative}, unchanged since "
+                  f"{entry['succeeded_at']} (fingerprint {fingerprint[:12]})", file=sys.stderr)
+            self.audit(dict(record, result="skipped", succeeded_at=entry["succeeded_at"]))
+            return 0
+
+        start = time.perf_counter()
+        try:
+            exit_code = subprocess.run(command, cwd=workdir).returncode
+        except OSError as e:
+            print(f"hook cache: failed to run `{record['command']}`: {e}", file=sys.stderr)
+            exit_code = 127
+        record.update(exit_code=exit_code, duration=round(time.perf_counter() - start, 3))
+        self.audit(dict(record, result="succeeded" if exit_code == 0 else "failed"))
+
+        if exit_code == 0:
+            with self.locked():
+                data = self.load()
+                data["entries"][key] = {
+                    "workdir": relative, "command": record["command"], "fingerprint": fingerprint,
+                    "terraform_version": terraform_version, "succeeded_at": record["time"],
+                    "duration": record["duration"],
+                }
+                write_json_atomic(self.cache_path, data, indent=1)
+        return exit_code
+
+    def clear(self, workdir: Optional[str] = None) -> int:
+        """Forget recorded successes, for one component directory or all; returns how many"""
+        relative = os.path.relpath(os.path.abspath(workdir), self.repo_root) if workdir else None
+        with self.locked():
+            data = self.load()
+            removed = [k for k, e in data["entries"].items() if relative is None or e["workdir"] == relative]
+            for key in removed:
+                del data["entries"][key]
+            write_json_atomic(self.cache_path, data, indent=1)
+        return len(removed)
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Run Terraform hook commands with a content-addressed result cache")
+    parser.add_argument("--terraform", default="terraform", help="terraform binary whose version is fingerprinted")
+    subparsers = parser.add_subparsers(dest="action")
+    run_parser = subparsers.add_parser("run", help="Run a hook command unless it already succeeded on this input")
+    run_parser.add_argument("--workdir", default=os.getcwd(), help="Component directory (default: current directory)")
+    run_parser.add_argument("--no-cache", action="store_true", help="Always run the command")
+    run_parser.add_argument("hook_command", nargs=argparse.REMAINDER, help="Command to run")
+    subparsers.add_parser("list", help="Recorded successful hook runs")
+    clear_parser = subparsers.add_parser("clear", help="Forget recorded successes")
+    clear_parser.add_argument("--workdir", help="Only this component directory")
+    args = parser.parse_args()
+
+    if not args.action:
+        parser.print_help()
+        sys.exit(1)
+
+    workdir = getattr(args, "workdir", None) or os.getcwd()
+    cache = HookCache(find_repo_root(workdir), terraform=args.terraform)
+
+    if args.action == "run":
+        command = args.hook_command[1:] if args.hook_command[:1] == ["--"] else args.hook_command
+        if not command:
+            run_parser.error("a command is required")
+        sys.exit(cache.run(workdir, command, use_cache=not args.no_cache))
+
+    elif args.action == "list":
+        entries = sorted(cache.load()["entries"].values(), key=lambda e: (e["workdir"], e["command"]))
+        for entry in entries:
+            print(f"{entry['succeeded_at']}  {entry['workdir']:<50} {entry['command']} "
+                  f"(terraform {entry['terraform_version']}, {entry['duration']:.1f}s)")
+        print(f"{len(entries)} cached hook results")
+
+    else:
+        print(f"Cleared {cache.clear(args.workdir)} cached hook results")
+
+
+if __name__ == "__main__":
+    main()
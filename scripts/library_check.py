@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Module Library Consistency Checker
+
+Compares the module registry (components/terraform/_catalog/module-registry.yaml)
+and the category lists of stacks/catalog/_library/catalog.yaml with the
+modules that actually exist under components/terraform:
+
+- path and alternate_paths must be module directories (with .tf files)
+- version must match the module's v<version> directory when it has them,
+  and path must point at that directory
+- variable_count must match the variable blocks the module declares
+- library modules no registry entry points at are reported
+- catalog.yaml components must exist as a component, library module or
+  registry entry, and registry categories must be in the catalog's tree
+
+Every .tf file of every module is read and its top-level blocks (variable,
+output, ...) are parsed. Parse results are cached in .cache/hcl-parse.json
+by content hash, so an unchanged file is never parsed twice, wherever it
+lives. Files missing from the cache are parsed on a process pool.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./library_check.py [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -j, --jobs N          Worker processes (default: number of CPUs, at most 8)
+    --no-cache            Parse every file, ignoring and not updating the parse cache
+    --json                Print findings and module summaries as JSON
+    -v, --verbose         List every module with its variable and output counts
+
+Exit code: 0 when the registry and catalog match the library, 1 otherwise.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Tuple
+
+from provider_cache import SKIPPED_DIRS, strip_comments
+from registry_index import RegistryIndex, as_list
+from stack_graph import StackGraph, load_yaml_file, write_json_atomic
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(".cache", "hcl-parse.json")
+DEFAULT_CATALOG_PATH = os.path.join("stacks", "catalog", "_library", "catalog.yaml")
+LIBRARY_DIR = "_library"
+
+# Below this many files a process pool costs more than it saves
+MIN_PARALLEL_FILES = 32
+
+# String literals and heredocs are skipped so their braces don't count
+TOKEN = re.compile(r'"(?:\\.|[^"\\\n])*"|<<-?\s*(\w+)\n.*?^\s*\1\s*$|[{}]', re.S | re.M)
+BLOCK_HEADER = re.compile(r'([A-Za-z_][\w-]*)((?:\s+"[^"]*"|\s+[A-Za-z_][\w-]*)*)')
+LABEL = re.compile(r'"([^"]*)"|([A-Za-z_][\w-]*)')
+VERSION_DIR = re.compile(r"^v(\d+\.\d+\.\d+.*)$")
+
+Parsed = Dict[str, List[str]]
+
+
+def parse_hcl(text: str) -> Parsed:
+    """First labels of the top-level blocks of an HCL file by block type, e.g. {"variable": ["name", ...]}"""
+    text = strip_comments(text)
+    blocks = {}  # type: Parsed
+    depth = 0
+    for match in TOKEN.finditer(text):
+        token = match.group(0)
+        if token == "{":
+            if depth == 0:
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                header = BLOCK_HEADER.fullmatch(text[line_start:match.start()].strip())
+                if header:
+                    labels = [a or b for a, b in LABEL.findall(header.group(2))]
+                    blocks.setdefault(header.group(1), []).append(labels[0] if labels else "")
+            depth += 1
+        elif token == "}":
+            depth = max(0, depth - 1)
+    return blocks
+
+
+def parse_file(path: str) -> Tuple[str, Parsed]:
+    """Content hash and parse result of one file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return hashlib.sha256(data).hexdigest(), parse_hcl(data.decode("utf-8", "replace"))
+
+
+def _parse_batch(paths: List[str]) -> List[Tuple[str, Parsed]]:
+    return [parse_file(path) for path in paths]
+
+
+def library_modules(components_path: str) -> List[str]:
+    """Library module directories (with .tf files) relative to the components path"""
+    found = []
+    for root, dirs, files in os.walk(os.path.join(components_path, LIBRARY_DIR)):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+        if any(name.endswith(".tf") for name in files):
+            found.append(os.path.relpath(root, components_path))
+            dirs[:] = [d for d in dirs if VERSION_DIR.match(d)]
+    return found
+
+
+class HclParseCache:
+    """Parse results by content hash, persisted as JSON"""
+
+    def __init__(self, cache_path: str, enabled: bool = True):
+        self.cache_path = cache_path
+        self.enabled = enabled
+        self.entries = {}  # type: Dict[str, Parsed]
+        self.hits = 0
+        self.parsed = 0
+        if enabled:
+            try:
+                with open(cache_path, "r") as f:
+                    cache = json.load(f)
+                if cache.get("version") == CACHE_VERSION:
+                    self.entries = cache.get("files") or {}
+            except (OSError, ValueError):
+                pass
+
+    def parse(self, paths: List[str], jobs: int) -> Dict[str, Parsed]:
+        """Parse results of files, parsing only the contents not seen before"""
+        results = {}  # type: Dict[str, Parsed]
+        pending = []  # type: List[str]
+        used = set()
+        for path in paths:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            used.add(digest)
+            if digest in self.entries:
+                results[path] = self.entries[digest]
+            else:
+                pending.append(path)
+        self.hits = len(results)
+        self.parsed = len(pending)
+
+        if len(pending) >= MIN_PARALLEL_FILES and jobs > 1:
+            per_batch = max(1, len(pending) // (jobs * 4))
+            batches = [pending[i:i + per_batch] for i in range(0, len(pending), per_batch)]
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                outcomes = [o for batch in pool.map(_parse_batch, batches) for o in batch]
+        else:
+            outcomes = [parse_file(path) for path in pending]
+
+        for path, (digest, parsed) in zip(pending, outcomes):
+            self.entries[digest] = parsed
+            results[path] = parsed
+        # Contents no file has any more are dropped
+        stale = set(self.entries) - used
+        for digest in stale:
+            del self.entries[digest]
+        if self.enabled and (pending or stale):
+            write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "files": self.entries})
+        return results
+
+
+class LibraryChecker:
+    """Checks registry entries and catalog lists against the module directories"""
+
+    def __init__(self, repo_root: str, jobs: int = min(8, os.cpu_count() or 1), use_cache: bool = True):
+        self.repo_root = os.path.abspath(repo_root)
+        graph = StackGraph.from_atmos_config(self.repo_root)
+        self.components_path = os.path.join(self.repo_root, graph.components_base_path)
+        self.catalog_path = os.path.join(self.repo_root, DEFAULT_CATALOG_PATH)
+        self.index = RegistryIndex(self.repo_root)
+        self.cache = HclParseCache(os.path.join(self.repo_root, DEFAULT_CACHE_PATH), enabled=use_cache)
+        self.jobs = max(1, jobs)
+        self.findings = []  # type: List[Dict[str, str]]
+        self.modules = {}  # type: Dict[str, Dict[str, Any]]
+
+    def report(self, subject: str, kind: str, message: str):
+        """Record a mismatch"""
+        self.findings.append({"subject": subject, "kind": kind, "message": message})
+
+    def tf_files(self, module_dir: str) -> List[str]:
+        """.tf files of a module directory"""
+        path = os.path.join(self.components_path, module_dir)
+        if not os.path.isdir(path):
+            return []
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".tf"))
+
+    def summarize(self, module_dir: str, parsed: Dict[str, Parsed]) -> Dict[str, Any]:
+        """Variables and outputs declared by a module directory"""
+        variables = []  # type: List[str]
+        outputs = []  # type: List[str]
+        for path in self.tf_files(module_dir):
+            variables += parsed[path].get("variable", [])
+            outputs += parsed[path].get("output", [])
+        return {"path": module_dir, "variables": len(variables), "outputs": len(outputs),
+                "duplicate_variables": sorted({v for v in variables if variables.count(v) > 1})}
+
+    def check(self) -> List[Dict[str, str]]:
+        """Run every check; returns the findings"""
+        registry = self.index.all_modules()
+        library = library_modules(self.components_path)
+        referenced = {}  # type: Dict[str, str]
+        for module_id, module in registry.items():
+            for path in as_list(module.get("path")) + as_list(module.get("alternate_paths")):
+                referenced.setdefault(path.strip("/"), module_id)
+
+        dirs = sorted(set(library) | {p for p in referenced if self.tf_files(p)})
+        parsed = self.cache.parse([f for d in dirs for f in self.tf_files(d)], self.jobs)
+        self.modules = {d: self.summarize(d, parsed) for d in dirs}
+
+        for module_id, module in sorted(registry.items()):
+            self.check_entry(module_id, module)
+        for module_dir in library:
+            parent = os.path.dirname(module_dir)
+            versioned = VERSION_DIR.match(os.path.basename(module_dir))
+            if module_dir not in referenced and not (versioned and parent in referenced):
+                self.report(module_dir, "unregistered", "library module has no registry entry")
+        for summary in self.modules.values():
+            if summary["duplicate_variables"]:
+                self.report(summary["path"], "variables",
+                            f"declares {', '.join(summary['duplicate_variables'])} more than once")
+        self.check_catalog(registry, library)
+        return self.findings
+
+    def check_entry(self, module_id: str, module: Dict[str, Any]):
+        """Paths, version and variable count of one registry entry"""
+        path = str(module.get("path") or "").strip("/")
+        for alternate in as_list(module.get("alternate_paths")):
+            if not self.tf_files(alternate.strip("/")):
+                self.report(module_id, "path", f"alternate path {alternate} is not a module directory")
+        if not path:
+            self.report(module_id, "path", "has no path")
+            return
+        if not self.tf_files(path):
+            if os.path.isdir(os.path.join(self.components_path, path)):
+                self.report(module_id, "path", f"{path} has no .tf files")
+            else:
+                self.report(module_id, "path", f"{path} does not exist")
+            return
+
+        version = str(module.get("version") or "")
+        head, tail = os.path.split(path)
+        module_root = head if VERSION_DIR.match(tail) else path
+        entries = os.listdir(os.path.join(self.components_path, module_root))
+        versions = sorted(m.group(1) for m in map(VERSION_DIR.match, entries) if m)
+        if VERSION_DIR.match(tail) and VERSION_DIR.match(tail).group(1) != version:
+            self.report(module_id, "version", f"version {version} but path points at {tail}")
+        elif versions and version not in versions:
+            self.report(module_id, "version",
+                        f"version {version} has no directory; {module_root} has {', '.join('v' + v for v in versions)}")
+        elif versions and not VERSION_DIR.match(tail):
+            self.report(module_id, "path", f"{path} is versioned; point path at {module_root}/v{version}")
+
+        expected = module.get("variable_count")
+        actual = self.modules[path]["variables"]
+        if expected is not None and expected != actual:
+            self.report(module_id, "variable_count", f"registry says {expected}, {path} declares {actual}")
+
+    def check_catalog(self, registry: Dict[str, Dict[str, Any]], library: List[str]):
+        """Catalog components exist and registry categories are in the catalog's tree"""
+        if not os.path.exists(self.catalog_path):
+            return
+        catalog = (load_yaml_file(self.catalog_path) or {}).get("library") or {}
+        known = set(registry) | {os.path.basename(d) for d in library}
+        known |= {d for d in os.listdir(self.components_path) if os.path.isdir(os.path.join(self.components_path, d))}
+        tree = set()
+        name = os.path.relpath(self.catalog_path, self.repo_root)
+        for category in catalog.get("categories") or []:
+            for subcategory in category.get("subcategories") or []:
+                tree.add(f"{category.get('name')}/{subcategory.get('name')}")
+                for component in subcategory.get("components") or []:
+                    if component not in known:
+                        self.report(name, "catalog", f"{category.get('name')}/{subcategory.get('name')} lists "
+                                                     f"{component}, which is not a component or registry module")
+        for module_id, module in sorted(registry.items()):
+            category = module.get("category")
+            if category and category not in tree:
+                self.report(module_id, "category", f"category {category} is not in {name}")
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Check the module registry and catalog against the module library")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="Worker processes (default: number of CPUs, at most 8)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and don't update the parse cache")
+    parser.add_argument("--json", action="store_true", help="Print findings and module summaries as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List every module with its counts")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    checker = LibraryChecker(args.repo_root, jobs=args.jobs, use_cache=not args.no_cache)
+    findings = checker.check()
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps({"findings": findings, "modules": checker.modules}, indent=2))
+    else:
+        if args.verbose:
+            for summary in checker.modules.values():
+                print(f"  {summary['path']}: {summary['variables']} variables, {summary['outputs']} outputs")
+        for finding in findings:
+            print(f"❌ {finding['subject']}: [{finding['kind']}] {finding['message']}")
+    print(f"{len(findings)} mismatches across {len(checker.modules)} modules ({checker.cache.parsed} files parsed, "
+          f"{checker.cache.hits} cached, {elapsed:.2f}s)", file=sys.stderr)
+    sys.exit(1 if findings else 0)
+
+
+if __name__ == "__main__":
+    main()
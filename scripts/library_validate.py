@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Module Library Validation Runner
+
+Runs `terraform init -backend=false` and `terraform validate` for every
+module under components/terraform/_library on a worker pool, instead of one
+module after another like _library/validate.sh:
+
+- Providers come from the shared plugin cache (see provider_cache.py). The
+  cache is warmed for the library's requirement sets first, then held with a
+  shared lock, so concurrent inits only ever read from it. Modules whose set
+  failed to warm initialize without the cache instead.
+- Each module initializes into its own TF_DATA_DIR under
+  .cache/library-validate/, so module directories stay clean and parallel
+  runs never share a .terraform directory. A lock file created by init is
+  removed again; existing lock files are left alone.
+- A module is skipped while its source hash matches a passing run recorded
+  in .cache/library-validate.json. The hash covers the module's source files,
+  the local modules it calls and the Terraform version. Failures are never
+  recorded, so they run again every time.
+
+The time spent in init and validate is reported per module, slowest first.
+--junit writes a JUnit XML report with one test case per module: skipped
+modules are marked skipped, failures carry terraform's output.
+
+Requirements:
+    - Python 3.6+ on Linux or macOS (fcntl)
+    - PyYAML: pip install pyyaml
+    - terraform
+
+Usage:
+    ./library_validate.py [MODULE...] [options]
+
+    MODULE is a library module path such as networking/vpc-endpoints, or a
+    prefix such as networking; without modules the whole library is validated.
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -j, --jobs N          Concurrent modules (default: 8)
+    --force               Validate modules even when they passed unchanged before
+    --junit FILE          Write a JUnit XML report
+    --log-dir DIR         Write each module's terraform output to DIR/<module>.log
+    --timeout SECONDS     Limit for each terraform command (default: 600)
+    --no-plugin-cache     Let every init download its providers
+    --terraform PATH      terraform binary (default: terraform)
+    --dry-run             List the modules that would be validated or skipped
+
+Exit codes: 0 all modules passed, 1 failures, 2 when terraform is missing.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set, Tuple
+from xml.etree import ElementTree
+
+from hook_cache import HookCache, utc_now
+from library_check import library_modules
+from provider_cache import ProviderCache, read_module
+from stack_graph import hash_tree, write_json_atomic
+from stack_resolver import StackResolver
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(".cache", "library-validate.json")
+DATA_DIR = os.path.join(".cache", "library-validate")
+DEFAULT_TIMEOUT = 600
+
+
+class LibraryValidator:
+    """Parallel, source-hash cached terraform init and validate of library modules"""
+
+    def __init__(self, repo_root: str, jobs: int = 8, terraform: str = "terraform", force: bool = False,
+                 log_dir: Optional[str] = None, timeout: int = DEFAULT_TIMEOUT, plugin_cache: bool = True,
+                 dry_run: bool = False):
+        self.resolver = StackResolver.for_repo(repo_root)
+        self.repo_root = self.resolver.graph.repo_root
+        self.components_path = os.path.join(self.repo_root, self.resolver.graph.components_base_path)
+        self.jobs = max(1, jobs)
+        self.terraform = terraform
+        self.force = force
+        self.log_dir = log_dir
+        self.timeout = timeout
+        self.dry_run = dry_run
+        self.provider_cache = ProviderCache(self.resolver) if plugin_cache else None
+        # Modules (relative to the components path) whose requirement set failed to warm
+        self.unwarmed: Set[str] = set()
+        self.cache_path = os.path.join(self.repo_root, DEFAULT_CACHE_PATH)
+        self.cache = self.load_cache()
+        self.cache_lock = threading.Lock()
+        self.results = {}  # type: Dict[str, Dict[str, Any]]
+
+    def load_cache(self) -> Dict[str, Any]:
+        """Passing runs by module, empty when missing, unreadable or from another version"""
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {"version": CACHE_VERSION, "terraform": {}, "modules": {}}
+
+    def modules(self, selectors: Optional[List[str]] = None) -> List[str]:
+        """Library module directories relative to the components path, optionally filtered by path prefix"""
+        found = library_modules(self.components_path)
+        if not selectors:
+            return found
+        prefixes = [s.strip("/") if s.startswith("_library") else "_library/" + s.strip("/") for s in selectors]
+        return [m for m in found if any(m == p or m.startswith(p + "/") for p in prefixes)]
+
+    def source_hash(self, module: str, terraform_version: str) -> str:
+        """Hash of the module's sources, the local modules it calls and the Terraform version"""
+        digest = hashlib.sha256(terraform_version.encode())
+        pending, seen = [os.path.join(self.components_path, module)], set()
+        while pending:
+            module_dir = os.path.normpath(pending.pop())
+            if module_dir in seen or not os.path.isdir(module_dir):
+                continue
+            seen.add(module_dir)
+            digest.update(os.path.relpath(module_dir, self.components_path).encode() + b"\0")
+            digest.update(hash_tree(module_dir).encode())
+            pending.extend(os.path.join(module_dir, s) for s in read_module(module_dir)[1])
+        return digest.hexdigest()
+
+    def environment(self, module: str) -> Dict[str, str]:
+        """Environment of a module's terraform commands"""
+        if self.provider_cache:
+            env = self.provider_cache.environment(cached=module not in self.unwarmed)
+        else:
+            env = dict(os.environ)
+        env["TF_DATA_DIR"] = os.path.join(self.repo_root, DATA_DIR, module.replace("/", "__"))
+        env["TF_IN_AUTOMATION"] = "1"
+        return env
+
+    def terraform_command(self, args: List[str], workdir: str, env: Dict[str, str]) -> Tuple[int, str, float]:
+        """Exit code, combined output and duration of one terraform command"""
+        start = time.perf_counter()
+        try:
+            process = subprocess.run([self.terraform] + args, cwd=workdir, env=env, stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT, text=True, timeout=self.timeout)
+            exit_code, output = process.returncode, process.stdout
+        except subprocess.TimeoutExpired as e:
+            exit_code, output = 124, f"{e.output or ''}\nTimed out after {self.timeout}s"
+        except OSError as e:
+            exit_code, output = 127, str(e)
+        return exit_code, output, time.perf_counter() - start
+
+    def validate_module(self, module: str, source_hash: str) -> Dict[str, Any]:
+        """Init and validate one module and record a pass"""
+        workdir = os.path.join(self.components_path, module)
+        env = self.environment(module)
+        os.makedirs(env["TF_DATA_DIR"], exist_ok=True)
+        lock_file = os.path.join(workdir, ".terraform.lock.hcl")
+        had_lock_file = os.path.exists(lock_file)
+
+        timings = {}  # type: Dict[str, float]
+        output = []  # type: List[str]
+        try:
+            exit_code, text, timings["init"] = self.terraform_command(
+                ["init", "-backend=false", "-input=false", "-no-color"], workdir, env)
+            output.append(text)
+            step = "init"
+            if exit_code == 0:
+                exit_code, text, timings["validate"] = self.terraform_command(["validate", "-no-color"], workdir, env)
+                output.append(text)
+                step = "validate"
+        finally:
+            if not had_lock_file and os.path.exists(lock_file):
+                os.remove(lock_file)
+
+        result = {
+            "module": module, "status": "passed" if exit_code == 0 else "failed",
+            "failed_step": None if exit_code == 0 else step, "exit_code": exit_code,
+            "timings": {k: round(v, 3) for k, v in timings.items()},
+            "duration": round(sum(timings.values()), 3), "output": "\n".join(output).strip(),
+        }
+        if self.log_dir:
+            log_path = os.path.join(self.log_dir, module + ".log")
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, "w") as f:
+                f.write(result["output"] + "\n")
+        if exit_code == 0:
+            with self.cache_lock:
+                self.cache["modules"][module] = {
+                    "source_hash": source_hash, "passed_at": utc_now(), "duration": result["duration"],
+                }
+                write_json_atomic(self.cache_path, self.cache, indent=1, sort_keys=True)
+        status = "✅" if exit_code == 0 else f"❌ {step} failed"
+        print(f"{status} {module} ({result['duration']:.1f}s)", flush=True)
+        return result
+
+    def run(self, selectors: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Validate every selected module that changed since it last passed"""
+        modules = self.modules(selectors)
+        terraform_version = HookCache(self.repo_root, self.terraform).terraform_version(self.cache)
+        pending = []  # type: List[Tuple[str, str]]
+        for module in modules:
+            source_hash = self.source_hash(module, terraform_version)
+            passed = self.cache["modules"].get(module)
+            if not self.force and passed and passed["source_hash"] == source_hash:
+                self.results[module] = {
+                    "module": module, "status": "skipped", "duration": 0.0, "timings": {},
+                    "output": f"unchanged since it passed at {passed['passed_at']}",
+                }
+            else:
+                pending.append((module, source_hash))
+        print(f"Validating {len(pending)} of {len(modules)} library modules "
+              f"({len(modules) - len(pending)} unchanged since passing), {self.jobs} at a time", flush=True)
+        if self.dry_run:
+            for module, _ in pending:
+                self.results[module] = {"module": module, "status": "pending", "duration": 0.0, "timings": {},
+                                        "output": ""}
+            return self.results
+
+        cache_lock = contextlib.ExitStack()
+        if self.provider_cache and pending:
+            warmed = self.provider_cache.warm([os.path.join(self.components_path, m) for m, _ in pending],
+                                              terraform=self.terraform)
+            for failure in warmed["failed"]:
+                self.unwarmed.update(os.path.relpath(os.path.join(self.repo_root, m), self.components_path)
+                                     for m in failure["modules"])
+                print(f"⚠️  could not warm {', '.join(' '.join(r) for r in failure['requirements'])}, "
+                      f"initializing {', '.join(failure['modules'])} without the cache", file=sys.stderr)
+            # Readers share the cache; a concurrent warm waits until the run is over
+            cache_lock.enter_context(self.provider_cache.locked())
+        with cache_lock, ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for result in pool.map(lambda entry: self.validate_module(*entry), pending):
+                self.results[result["module"]] = result
+        return self.results
+
+    def print_summary(self):
+        """Per-module timings, slowest first, and the totals"""
+        ran = sorted((r for r in self.results.values() if r["status"] in ("passed", "failed")),
+                     key=lambda r: -r["duration"])
+        if ran:
+            print("\nTime per module:")
+            for result in ran:
+                steps = ", ".join(f"{step} {seconds:.1f}s" for step, seconds in result["timings"].items())
+                print(f"  {result['duration']:>7.1f}s  {result['module']}  ({steps})")
+        counts = {}  # type: Dict[str, int]
+        for result in self.results.values():
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        print("\n" + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) +
+              f" ({sum(r['duration'] for r in ran):.1f}s of terraform)")
+        for result in ran:
+            if result["status"] == "failed":
+                print(f"\n❌ {result['module']} ({result['failed_step']}):\n{result['output']}")
+
+    def write_junit(self, path: str):
+        """JUnit XML report with one test case per module"""
+        results = [self.results[m] for m in sorted(self.results)]
+        suite = ElementTree.Element("testsuite", {
+            "name": "library-validate",
+            "tests": str(len(results)),
+            "failures": str(sum(1 for r in results if r["status"] == "failed")),
+            "skipped": str(sum(1 for r in results if r["status"] in ("skipped", "pending"))),
+            "time": f"{sum(r['duration'] for r in results):.3f}",
+            "timestamp": utc_now(),
+        })
+        for result in results:
+            category, _, name = result["module"][len("_library/"):].partition("/")
+            case = ElementTree.SubElement(suite, "testcase", {
+                "classname": f"library.{category}", "name": name, "time": f"{result['duration']:.3f}",
+            })
+            if result["status"] == "failed":
+                failure = ElementTree.SubElement(case, "failure", {
+                    "message": f"terraform {result['failed_step']} exited with {result['exit_code']}",
+                })
+                failure.text = result["output"]
+            elif result["status"] in ("skipped", "pending"):
+                ElementTree.SubElement(case, "skipped", {"message": result["output"] or "dry run"})
+            elif result["output"]:
+                ElementTree.SubElement(case, "system-out").text = result["output"]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        root = ElementTree.Element("testsuites")
+        root.append(suite)
+        ElementTree.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Validate the module library in parallel")
+    parser.add_argument("modules", nargs="*", help="Library module paths or prefixes (default: every module)")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="Concurrent modules (default: 8)")
+    parser.add_argument("--force", action="store_true", help="Validate modules even when they passed unchanged before")
+    parser.add_argument("--junit", metavar="FILE", help="Write a JUnit XML report")
+    parser.add_argument("--log-dir", help="Write each module's terraform output to DIR/<module>.log")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT,
+                        help="Limit for each terraform command (default: 600)")
+    parser.add_argument("--no-plugin-cache", action="store_true", help="Let every init download its providers")
+    parser.add_argument("--terraform", default="terraform", help="terraform binary (default: terraform)")
+    parser.add_argument("--dry-run", action="store_true", help="List the modules that would be validated or skipped")
+    args = parser.parse_args()
+
+    if shutil.which(args.terraform) is None and not args.dry_run:
+        print(f"Error: {args.terraform} not found", file=sys.stderr)
+        sys.exit(2)
+
+    validator = LibraryValidator(
+        args.repo_root, jobs=args.jobs, terraform=args.terraform, force=args.force, log_dir=args.log_dir,
+        timeout=args.timeout, plugin_cache=not args.no_plugin_cache, dry_run=args.dry_run,
+    )
+    results = validator.run(args.modules)
+    if not results:
+        print("Error: no library modules match", file=sys.stderr)
+        sys.exit(1)
+    if args.dry_run:
+        for module, result in sorted(results.items()):
+            print(f"  {'skip' if result['status'] == 'skipped' else 'run '}  {module}")
+    else:
+        validator.print_summary()
+    if args.junit:
+        validator.write_junit(args.junit)
+        print(f"JUnit report written to {args.junit}")
+    sys.exit(1 if any(r["status"] == "failed" for r in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Resource Name Index
+
+Indexes the globally significant names the stacks derive from their naming
+patterns and checks them before they collide at apply time:
+
+- S3 bucket names, shared by every account and region: the Terraform state
+  bucket of each stack (the backend bucket pattern in atmos.yaml) and the
+  buckets of the backend and s3-bucket components
+- IAM role names, unique within an account
+- DynamoDB table names, unique within an account and region
+
+Only the vars in NAME_VARS are names: those each Terraform component (by
+directory name) creates a resource with verbatim. A var counts only where
+the component or a component it inherits from sets it. Vars merged in from
+a stack's `vars:`, like a `log_bucket_name` that components point their
+access logs at, name resources created elsewhere.
+
+A name used by more than one component in its scope is an error. So is a
+state bucket shared by two stacks, or one that another stack's component
+creates; a stack's backend may point at a bucket its own components create.
+Names longer or shorter than AWS allows, or with characters it rejects, are
+errors too.
+
+Names are taken from fully resolved stacks, with ${var} placeholders filled
+from the component's vars; values still holding a placeholder are skipped.
+Accounts are told apart by tenant and account, regions by the region var.
+
+The index is a hash map from (kind, scope, name) to the components using the
+name, so finding a name's users is a single lookup. Each stack's names are
+cached in .cache/name-index.json, keyed by the manifests the stack is made
+of and by atmos.yaml, whose backend section gives the state bucket, and
+load() on an existing index only re-indexes the stacks whose keys changed
+since it last ran.
+
+Used by the names phase of validate_atmos.py; also runs on its own.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./name_index.py [options]
+    ./name_index.py --query NAME [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --query NAME          List the components using NAME
+    --json                Print findings as JSON
+    --no-cache            Resolve every stack, ignoring and not updating the cache
+
+Exit code: 0 without errors, 1 when errors were found.
+"""
+
+import os
+import re
+import hashlib
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+from stack_graph import StackGraph, write_json_atomic
+from stack_resolver import StackResolver, fill_placeholders, is_false
+
+CACHE_VERSION = 2
+
+# Kind -> what the name is, where it must be unique and the limits AWS puts on it
+NAME_RULES = {
+    "s3-bucket": {
+        "label": "S3 bucket",
+        "scope": "global",
+        "min_length": 3,
+        "max_length": 63,
+        "pattern": re.compile(r"^[a-z0-9][a-z0-9.-]*[a-z0-9]$"),
+    },
+    "iam-role": {
+        "label": "IAM role",
+        "scope": "account",
+        "min_length": 1,
+        "max_length": 64,
+        "pattern": re.compile(r"^[\w+=,.@-]+$"),
+    },
+    "dynamodb-table": {
+        "label": "DynamoDB table",
+        "scope": "region",
+        "min_length": 3,
+        "max_length": 255,
+        "pattern": re.compile(r"^[\w.-]+$"),
+    },
+}  # type: Dict[str, Dict[str, Any]]
+
+# Terraform component (directory name) -> var -> kind of the resource it names
+NAME_VARS = {
+    "backend": {"bucket_name": "s3-bucket", "dynamodb_table_name": "dynamodb-table", "iam_role_name": "iam-role"},
+    "iam": {"cross_account_role_name": "iam-role"},
+    "s3": {"bucket_name": "s3-bucket"},
+    "s3-bucket": {"bucket_name": "s3-bucket"},
+}  # type: Dict[str, Dict[str, str]]
+
+# Component recorded for a stack's Terraform state bucket
+STATE_BUCKET = ""
+
+# Users named per duplicate before the rest are counted
+MAX_LISTED = 5
+
+# (kind, scope, name) and (stack, component)
+Key = Tuple[str, str, str]
+Owner = Tuple[str, str]
+Finding = Dict[str, Any]
+
+
+def is_placeholder(value: Any) -> bool:
+    """Whether a value is left for atmos or Terraform to fill in"""
+    return isinstance(value, str) and ("${" in value or "{{" in value)
+
+
+def atmos_config_hash(repo_root: str) -> str:
+    """Hash of atmos.yaml, whose backend defaults name every stack's state bucket"""
+    try:
+        with open(os.path.join(repo_root, "atmos.yaml"), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return "missing"
+
+
+def scope_label(kind: str, component_vars: Dict[str, Any], stack: str) -> str:
+    """Where a name of this kind must be unique: "" globally, else the account or account/region"""
+    scope = NAME_RULES[kind]["scope"]
+    if scope == "global":
+        return ""
+    tenant, account = component_vars.get("tenant"), component_vars.get("account")
+    label = f"{tenant}-{account}" if tenant and account else stack
+    if scope == "region":
+        label += f"/{component_vars.get('region') or stack}"
+    return label
+
+
+def describe(owner: Owner, var: str) -> str:
+    """A user of a name, for messages"""
+    stack, component = owner
+    if component == STATE_BUCKET:
+        return f"the Terraform state of {stack}"
+    return f"{component} in {stack} ({var})"
+
+
+class NameIndex:
+    """Hash index over the resource names of every stack"""
+
+    def __init__(self, repo_root: str, cache_path: Optional[str] = None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.cache_path = cache_path or os.path.join(self.repo_root, ".cache", "name-index.json")
+        # (kind, scope, name) -> {(stack, component): var}
+        self.users = defaultdict(dict)  # type: Dict[Key, Dict[Owner, str]]
+        # name -> the (kind, scope, name) keys it is indexed under
+        self.keys: Dict[str, Set[Key]] = defaultdict(set)
+        # stack -> {"fingerprint", "names": [[kind, scope, name, component, var]]}
+        self.stacks = {}  # type: Dict[str, Dict[str, Any]]
+        self.updated: Set[str] = set()
+        self.errors = {}  # type: Dict[str, str]
+        self.resolved = 0
+        self.cached = 0
+
+    def load_cache(self) -> Dict[str, Any]:
+        """Cached names per stack, or none when recorded by another cache version"""
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("stacks") or {}
+
+    @staticmethod
+    def resolve_names(resolver: StackResolver, stack: str) -> List[List[str]]:
+        """[kind, scope, name, component, var] for every name a stack uses"""
+        names = []  # type: List[List[str]]
+        state_buckets: Set[str] = set()
+        terraform = resolver.resolve_stack(stack)["components"].get("terraform") or {}
+        declared = (resolver.resolve_manifest(stack).get("components") or {}).get("terraform") or {}
+        for component, config in sorted(terraform.items()):
+            component_vars = config.get("vars") or {}
+            if is_false(fill_placeholders(component_vars.get("enabled"), component_vars)):
+                continue
+            # Set by the component or its bases, not merged in from the stack's vars
+            own_vars: Set[str] = set()
+            for source in config["inheritance"] + [component]:
+                source_vars = (declared.get(source) or {}).get("vars")
+                if isinstance(source_vars, dict):
+                    own_vars.update(source_vars)
+            for var, kind in sorted(NAME_VARS.get(os.path.basename(config["component"]), {}).items()):
+                value = component_vars.get(var)
+                if var not in own_vars or not isinstance(value, str):
+                    continue
+                value = fill_placeholders(value, component_vars)
+                if value and not is_placeholder(value):
+                    names.append([kind, scope_label(kind, component_vars, stack), value, component, var])
+            backend_type, backend = resolver.backend_config(stack, component)
+            bucket = backend.get("bucket")
+            if backend_type == "s3" and isinstance(bucket, str) and not is_placeholder(bucket) \
+                    and bucket not in state_buckets:
+                state_buckets.add(bucket)
+                names.append(["s3-bucket", "", bucket, STATE_BUCKET, "backend.s3.bucket"])
+        return names
+
+    def stack_names(self, graph: StackGraph, resolver: Optional[StackResolver] = None,
+                    use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Per stack the names it uses, resolving only stacks changed since they were indexed or cached"""
+        cache = self.load_cache() if use_cache else {}
+        facts = {}  # type: Dict[str, Dict[str, Any]]
+        self.resolved = self.cached = 0
+        atmos_config = atmos_config_hash(graph.repo_root)
+        for stack in graph.stacks:
+            fingerprint = f"{graph.stack_fingerprint(stack)}:{atmos_config}"
+            entry = self.stacks.get(stack) or cache.get(stack)
+            if entry and entry["fingerprint"] == fingerprint:
+                facts[stack] = entry
+                self.cached += 1
+                continue
+            if resolver is None:
+                resolver = StackResolver(graph)
+            facts[stack] = {"fingerprint": fingerprint, "names": self.resolve_names(resolver, stack)}
+            self.resolved += 1
+        if resolver is not None:
+            self.errors = dict(resolver.errors)
+        if use_cache and self.resolved:
+            write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "stacks": facts})
+        return facts
+
+    def add_stack(self, stack: str, entry: Dict[str, Any]):
+        """Index the names of one stack"""
+        self.stacks[stack] = entry
+        for kind, scope, name, component, var in entry["names"]:
+            self.users[(kind, scope, name)][(stack, component)] = var
+            self.keys[name].add((kind, scope, name))
+
+    def remove_stack(self, stack: str):
+        """Drop the names of one stack from the index"""
+        entry = self.stacks.pop(stack, None)
+        if entry is None:
+            return
+        for kind, scope, name, component, _ in entry["names"]:
+            key = (kind, scope, name)
+            self.users[key].pop((stack, component), None)
+            if not self.users[key]:
+                del self.users[key]
+                self.keys[name].discard(key)
+                if not self.keys[name]:
+                    del self.keys[name]
+
+    def load(self, graph: Optional[StackGraph] = None, resolver: Optional[StackResolver] = None,
+             use_cache: bool = True) -> "NameIndex":
+        """Index the names of every stack, re-indexing only the stacks that changed.
+
+        The stacks re-indexed are left in self.updated. When reloading in the
+        same process, the resolver must have been invalidated for the changes.
+        """
+        graph = graph or (resolver.graph if resolver else StackGraph.from_atmos_config(self.repo_root).load())
+        facts = self.stack_names(graph, resolver, use_cache)
+        self.updated = set()
+        for stack in list(self.stacks):
+            if stack not in facts:
+                self.remove_stack(stack)
+                self.updated.add(stack)
+        for stack, entry in facts.items():
+            if self.stacks.get(stack) is not entry:
+                self.remove_stack(stack)
+                self.add_stack(stack, entry)
+                self.updated.add(stack)
+        return self
+
+    def query(self, name: str) -> List[Tuple[Key, Owner, str]]:
+        """Every use of a name, in any kind and scope"""
+        return [(key, owner, var) for key in sorted(self.keys.get(name, ()))
+                for owner, var in sorted(self.users[key].items())]
+
+    def duplicate(self, key: Key) -> Optional[Finding]:
+        """The collision on one name, if its users aren't all the same resource"""
+        users = self.users.get(key) or {}
+        if len(users) < 2:
+            return None
+        creators = {stack for stack, component in users if component != STATE_BUCKET}
+        # A state bucket created by a component of its own stack is the same bucket
+        parties = sorted(owner for owner in users if owner[1] != STATE_BUCKET or owner[0] not in creators)
+        if len(parties) < 2:
+            return None
+        kind, scope, name = key
+        listed = [describe(owner, users[owner]) for owner in parties[:MAX_LISTED]]
+        more = len(parties) - MAX_LISTED
+        where = f" in {scope}" if scope else ""
+        return {"kind": "duplicate", "level": "error", "stack": parties[0][0], "component": parties[0][1],
+                "stacks": sorted({stack for stack, _ in parties}),
+                "message": f"{NAME_RULES[kind]['label']} name {name!r}{where} is used {len(parties)} times: "
+                           + ", ".join(listed) + (f" and {more} more" if more > 0 else "")}
+
+    @staticmethod
+    def limit(key: Key, owner: Owner, var: str) -> Optional[Finding]:
+        """A name too long, too short or with characters AWS rejects"""
+        kind, _, name = key
+        rule = NAME_RULES[kind]
+        problem = None
+        if len(name) > rule["max_length"]:
+            problem = f"is {len(name)} characters, over the {rule['max_length']}-character limit"
+        elif len(name) < rule["min_length"]:
+            problem = f"is {len(name)} characters, under the {rule['min_length']}-character minimum"
+        elif not rule["pattern"].match(name):
+            problem = f"doesn't match {rule['pattern'].pattern}"
+        if problem is None:
+            return None
+        stack, component = owner
+        subject = describe(owner, var) if component == STATE_BUCKET else f"{component} in {stack}: {var}"
+        return {"kind": "limit", "level": "error", "stack": stack, "component": component,
+                "message": f"{subject} {rule['label']} name {name!r} {problem}"}
+
+    def findings(self, stacks: Optional[Iterable[str]] = None) -> List[Finding]:
+        """Every problem found with the names of the given stacks (all by default)"""
+        selected = None if stacks is None else set(stacks)
+        findings = []
+        for key in sorted(self.users):
+            users = self.users[key]
+            if selected is not None and not any(stack in selected for stack, _ in users):
+                continue
+            duplicate = self.duplicate(key)
+            if duplicate is not None:
+                # Recorded against the first selected stack involved
+                involved = [stack for stack in duplicate["stacks"] if selected is None or stack in selected]
+                if involved:
+                    duplicate["stack"] = involved[0]
+                    findings.append(duplicate)
+            for owner, var in sorted(users.items()):
+                if selected is None or owner[0] in selected:
+                    finding = self.limit(key, owner, var)
+                    if finding is not None:
+                        findings.append(finding)
+        return findings
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Check resource names across every stack for collisions and limits")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("--query", metavar="NAME", help="List the components using NAME")
+    parser.add_argument("--json", action="store_true", help="Print findings as JSON")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Resolve every stack, ignoring and not updating the cache")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = NameIndex(args.repo_root).load(use_cache=not args.no_cache)
+    loaded = time.perf_counter()
+
+    if args.query:
+        matches = index.query(args.query)
+        if args.json:
+            print(json.dumps([{"kind": kind, "scope": scope, "stack": stack, "component": component, "var": var}
+                              for (kind, scope, _), (stack, component), var in matches], indent=2))
+        else:
+            for (kind, scope, _), owner, var in matches:
+                print(f"{NAME_RULES[kind]['label']}{' in ' + scope if scope else ''}: {describe(owner, var)}")
+        sys.exit(0)
+
+    findings = index.findings()
+    elapsed = time.perf_counter() - loaded
+    if args.json:
+        print(json.dumps(findings, indent=2))
+    else:
+        for finding in findings:
+            print(f"{'❌' if finding['level'] == 'error' else '⚠️ '} {finding['message']}")
+
+    for key, error in sorted(index.errors.items()):
+        print(f"Error: {key}: {error}", file=sys.stderr)
+    errors = sum(1 for f in findings if f["level"] == "error")
+    print(f"{len(index.users)} names in {len(index.stacks)} stacks "
+          f"({index.resolved} resolved, {index.cached} cached): {errors} errors, {len(findings) - errors} warnings "
+          f"(loaded in {(loaded - start) * 1000:.0f}ms, checked in {elapsed * 1000:.0f}ms)", file=sys.stderr)
+    sys.exit(1 if errors or index.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
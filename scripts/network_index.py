@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Network Address Index
+
+Indexes the address space of every VPC component across the estate and
+checks it:
+
+- VPC ranges overlapping within a stack (vpc/main and vpc/services)
+- VPC ranges overlapping across stacks. Overlaps between VPCs attached to the
+  same transit gateway (enable_transit_gateway with a common
+  transit_gateway_id) are errors, others are warnings, since they rule out
+  peering the two later. Each overlapping pair is reported once.
+- subnets (private_subnets, public_subnets, database_subnets) outside every
+  range of their VPC, or overlapping another subnet of it
+- address exhaustion: VPCs whose subnets allocate EXHAUSTION_THRESHOLD of the
+  range or more, or that have no room left for another subnet of their
+  largest size
+- values that aren't valid CIDR blocks, e.g. with host bits set
+
+VPC components are the deployed, enabled instances of the Terraform
+components in VPC_COMPONENTS; their ranges come from `vpc_cidr` (and
+`ipv6_cidr_block`). Values still holding a template placeholder are skipped.
+
+Ranges are held in interval trees, one per IP version: the intervals sorted
+by first address form an implicit balanced tree in which every node records
+the highest last address below it. Building is O(n log n) and finding the
+ranges overlapping one range is O(log n + k), so checking the whole estate
+is O(n log n) plus the overlaps found.
+
+Only the VPC vars depend on the stacks. They are cached in
+.cache/network-index.json per stack, keyed by the manifests the stack is made
+of, so a rerun only resolves stacks whose manifests changed.
+
+Used by the network phase of validate_atmos.py; also runs on its own.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./network_index.py [options]
+    ./network_index.py --query CIDR [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --query CIDR          List the VPCs and subnets overlapping CIDR
+    --json                Print findings as JSON
+    --no-cache            Resolve every stack, ignoring and not updating the cache
+
+Exit code: 0 without errors, 1 when errors were found.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import ipaddress
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+from stack_graph import StackGraph, write_json_atomic
+from stack_resolver import StackResolver, fill_placeholders, is_false
+
+CACHE_VERSION = 2
+
+# Terraform components that create VPCs. Stack-level vars such as vpc_cidr are
+# merged into every component, so the vars alone don't identify one.
+VPC_COMPONENTS = ("vpc",)
+
+VPC_VARS = ("vpc_cidr", "ipv6_cidr_block")
+SUBNET_VARS = ("private_subnets", "public_subnets", "database_subnets")
+
+# Share of a VPC allocated to subnets at which it is reported as nearly exhausted
+EXHAUSTION_THRESHOLD = 0.9
+
+# Overlapping VPCs named per finding before the rest are counted
+MAX_LISTED = 5
+
+# (IP version, first address, last address, normalized CIDR text)
+Range = Tuple[int, int, int, str]
+Finding = Dict[str, Any]
+
+
+def is_placeholder(value: Any) -> bool:
+    """Whether a value is left for atmos or Terraform to fill in"""
+    return isinstance(value, str) and ("${" in value or "{{" in value)
+
+
+def vpc_record(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Address-related vars of a resolved VPC component, or None for other components"""
+    component_vars = config.get("vars") or {}
+    if config["component"] not in VPC_COMPONENTS or not any(component_vars.get(var) for var in VPC_VARS):
+        return None
+    if is_false(fill_placeholders(component_vars.get("enabled"), component_vars)):
+        return None
+    subnets = {}  # type: Dict[str, List[str]]
+    for var in SUBNET_VARS:
+        values = component_vars.get(var)
+        if isinstance(values, list) and values:
+            subnets[var] = [str(v) for v in values]
+    transit_gateway = component_vars.get("transit_gateway_id")
+    return {
+        "cidrs": [str(component_vars[var]) for var in VPC_VARS if component_vars.get(var)],
+        "subnets": subnets,
+        "transit_gateway": str(transit_gateway) if component_vars.get("enable_transit_gateway") is True
+        and transit_gateway and not is_placeholder(transit_gateway) else "",
+    }
+
+
+class IntervalTree:
+    """Static interval tree over closed integer intervals with attached items"""
+
+    def __init__(self, intervals: Iterable[Tuple[int, int, Any]]):
+        ordered = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in ordered]
+        self.ends = [interval[1] for interval in ordered]
+        self.items = [interval[2] for interval in ordered]
+        # Highest end within the subtree rooted at each node; node of [lo, hi) is (lo + hi) // 2
+        self.max_end = list(self.ends)
+        self._augment(0, len(ordered))
+
+    def _augment(self, lo: int, hi: int) -> int:
+        # Depth is log2(n), so recursion is safe
+        mid = (lo + hi) // 2
+        highest = self.ends[mid]
+        if lo < mid:
+            highest = max(highest, self._augment(lo, mid))
+        if mid + 1 < hi:
+            highest = max(highest, self._augment(mid + 1, hi))
+        self.max_end[mid] = highest
+        return highest
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlapping(self, start: int, end: int) -> List[Any]:
+        """Items of the intervals sharing at least one point with [start, end]"""
+        found = []
+        pending = [(0, len(self.starts))]
+        while pending:
+            lo, hi = pending.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] < start:
+                continue
+            pending.append((lo, mid))
+            if self.starts[mid] <= end:
+                if self.ends[mid] >= start:
+                    found.append(self.items[mid])
+                pending.append((mid + 1, hi))
+        return found
+
+
+@lru_cache(maxsize=None)
+def parse_cidr(value: str) -> Range:
+    """(IP version, first address, last address, normalized text) of a CIDR block.
+
+    Raises ValueError for values that aren't one, e.g. with host bits set.
+    Stacks share most of their ranges, so parsed values are memoized.
+    """
+    network = ipaddress.ip_network(value)
+    return network.version, int(network.network_address), int(network.broadcast_address), str(network)
+
+
+def largest_aligned_block(first: int, last: int) -> int:
+    """Size of the largest CIDR-aligned block within [first, last]"""
+    best = 0
+    while first <= last:
+        size = first & -first if first else 1 << 128
+        while first + size - 1 > last:
+            size >>= 1
+        best = max(best, size)
+        first += size
+    return best
+
+
+def merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sorted, non-overlapping union of closed intervals"""
+    merged = []  # type: List[Tuple[int, int]]
+    for first, last in sorted(spans):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+class NetworkIndex:
+    """Interval index over the VPC and subnet ranges of every stack"""
+
+    def __init__(self, repo_root: str, cache_path: Optional[str] = None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.cache_path = cache_path or os.path.join(self.repo_root, ".cache", "network-index.json")
+        # (stack, component) -> {"cidrs", "subnets", "transit_gateway"}
+        self.vpcs = {}  # type: Dict[Tuple[str, str], Dict[str, Any]]
+        # (stack, component) -> VPC ranges, and -> [(var, subnet range)]
+        self.ranges = {}  # type: Dict[Tuple[str, str], List[Range]]
+        self.subnets = {}  # type: Dict[Tuple[str, str], List[Tuple[str, Range]]]
+        # IP version -> tree of VPC ranges / subnet ranges
+        self.vpc_trees = {}  # type: Dict[int, IntervalTree]
+        self.subnet_trees = {}  # type: Dict[int, IntervalTree]
+        self.invalid = []  # type: List[Finding]
+        self.errors = {}  # type: Dict[str, str]
+        self.resolved = 0
+        self.cached = 0
+
+    def load_cache(self) -> Dict[str, Any]:
+        """Cached VPC vars per stack, or none when recorded by another cache version"""
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("stacks") or {}
+
+    def stack_vpcs(self, graph: StackGraph, resolver: Optional[StackResolver] = None,
+                   use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Per stack its VPC components' address vars, resolving only changed stacks"""
+        cache = self.load_cache() if use_cache else {}
+        facts = {}  # type: Dict[str, Dict[str, Any]]
+        self.resolved = self.cached = 0
+        for stack in graph.stacks:
+            fingerprint = graph.stack_fingerprint(stack)
+            entry = cache.get(stack)
+            if entry and entry["fingerprint"] == fingerprint:
+                facts[stack] = entry
+                self.cached += 1
+                continue
+            if resolver is None:
+                resolver = StackResolver(graph)
+            terraform = resolver.resolve_stack(stack)["components"].get("terraform") or {}
+            vpcs = {}  # type: Dict[str, Dict[str, Any]]
+            for name, config in sorted(terraform.items()):
+                record = vpc_record(config)
+                if record is not None:
+                    vpcs[name] = record
+            facts[stack] = {"fingerprint": fingerprint, "vpcs": vpcs}
+            self.resolved += 1
+        if resolver is not None:
+            self.errors = dict(resolver.errors)
+        if use_cache and self.resolved:
+            write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "stacks": facts})
+        return facts
+
+    def parse(self, value: str, stack: str, component: str, var: str) -> Optional[Range]:
+        """A CIDR block, recording values that aren't valid ones"""
+        if is_placeholder(value):
+            return None
+        try:
+            return parse_cidr(value)
+        except ValueError as e:
+            self.invalid.append({"kind": "invalid", "level": "error", "stack": stack, "component": component,
+                                 "message": f"{component} in {stack}: {var} {value!r} is not a valid CIDR block: {e}"})
+            return None
+
+    def load(self, graph: Optional[StackGraph] = None, resolver: Optional[StackResolver] = None,
+             use_cache: bool = True) -> "NetworkIndex":
+        """Collect and parse every VPC of the estate and build the interval trees"""
+        graph = graph or (resolver.graph if resolver else StackGraph.from_atmos_config(self.repo_root).load())
+        vpc_intervals = defaultdict(list)  # type: Dict[int, List[Tuple[int, int, Any]]]
+        subnet_intervals = defaultdict(list)  # type: Dict[int, List[Tuple[int, int, Any]]]
+        for stack, entry in self.stack_vpcs(graph, resolver, use_cache).items():
+            for component, record in entry["vpcs"].items():
+                key = (stack, component)
+                self.vpcs[key] = record
+                self.ranges[key] = []
+                for cidr in record["cidrs"]:
+                    parsed = self.parse(cidr, stack, component, "vpc_cidr")
+                    if parsed is not None:
+                        self.ranges[key].append(parsed)
+                        vpc_intervals[parsed[0]].append((parsed[1], parsed[2], (key, parsed[3])))
+                self.subnets[key] = []
+                for var, values in record["subnets"].items():
+                    for value in values:
+                        parsed = self.parse(value, stack, component, var)
+                        if parsed is not None:
+                            self.subnets[key].append((var, parsed))
+                            subnet_intervals[parsed[0]].append((parsed[1], parsed[2], (key, var, parsed[3])))
+        self.vpc_trees = {version: IntervalTree(i) for version, i in vpc_intervals.items()}
+        self.subnet_trees = {version: IntervalTree(i) for version, i in subnet_intervals.items()}
+        return self
+
+    def query(self, cidr: str) -> Dict[str, List[Tuple[Any, ...]]]:
+        """VPC ranges and subnets overlapping a CIDR block"""
+        version, start, end, _ = parse_cidr(str(ipaddress.ip_network(cidr, strict=False)))
+        vpc_tree = self.vpc_trees.get(version)
+        subnet_tree = self.subnet_trees.get(version)
+        return {
+            "vpcs": sorted(vpc_tree.overlapping(start, end), key=str) if vpc_tree else [],
+            "subnets": sorted(subnet_tree.overlapping(start, end), key=str) if subnet_tree else [],
+        }
+
+    def connected(self, a: Tuple[str, str], b: Tuple[str, str]) -> bool:
+        """Whether two VPCs are attached to the same transit gateway"""
+        gateway = self.vpcs[a]["transit_gateway"]
+        return bool(gateway) and gateway == self.vpcs[b]["transit_gateway"]
+
+    def vpc_overlaps(self, key: Tuple[str, str], selected: Optional[Set[str]] = None) -> List[Finding]:
+        """Other VPCs whose ranges overlap this one's, grouped by how serious the overlap is.
+
+        Each pair is reported by its first VPC only, unless that VPC's stack
+        isn't among `selected` ones being checked (all by default).
+        """
+        stack, component = key
+        same_stack = set()  # type: set
+        connected = set()  # type: set
+        other = set()  # type: set
+        for version, first, last, text in self.ranges[key]:
+            for other_key, other_text in self.vpc_trees[version].overlapping(first, last):
+                if other_key <= key and (other_key == key or selected is None or other_key[0] in selected):
+                    continue
+                label = (other_key, text, other_text)
+                if other_key[0] == stack:
+                    same_stack.add(label)
+                elif self.connected(key, other_key):
+                    connected.add(label)
+                else:
+                    other.add(label)
+
+        def names(labels: set, with_stack: bool) -> str:
+            ordered = sorted(labels)
+            listed = [f"{k[1]}{' in ' + k[0] if with_stack else ''} ({theirs})"
+                      for k, _, theirs in ordered[:MAX_LISTED]]
+            more = len(ordered) - MAX_LISTED
+            return ", ".join(listed) + (f" and {more} more" if more > 0 else "")
+
+        findings = []
+        if same_stack:
+            findings.append({"kind": "overlap", "level": "error", "stack": stack, "component": component,
+                             "message": f"{component} in {stack} ({', '.join(sorted({l[1] for l in same_stack}))}) "
+                                        f"overlaps {names(same_stack, False)} in the same stack"})
+        if connected:
+            findings.append({"kind": "overlap", "level": "error", "stack": stack, "component": component,
+                             "message": f"{component} in {stack} overlaps VPCs on transit gateway "
+                                        f"{self.vpcs[key]['transit_gateway']}: {names(connected, True)}"})
+        if other:
+            findings.append({"kind": "overlap", "level": "warning", "stack": stack, "component": component,
+                             "message": f"{component} in {stack} ({', '.join(sorted({l[1] for l in other}))}) "
+                                        f"overlaps VPCs in other stacks, ruling out peering with them: "
+                                        f"{names(other, True)}"})
+        return findings
+
+    def subnet_findings(self, key: Tuple[str, str]) -> List[Finding]:
+        """Subnets outside or overlapping within one VPC, and how much of the VPC they use"""
+        stack, component = key
+        findings = []
+        ranges = self.ranges[key]
+        subnets = self.subnets[key]
+        for var, (version, first, last, text) in subnets:
+            same_version = [r for r in ranges if r[0] == version]
+            if same_version and not any(r[1] <= first and last <= r[2] for r in same_version):
+                findings.append({"kind": "outside", "level": "error", "stack": stack, "component": component,
+                                 "message": f"{component} in {stack}: {var} {text} is outside the VPC range "
+                                            f"{', '.join(r[3] for r in same_version)}"})
+
+        # Sorted by first address, a subnet can only overlap the ones that follow it up to its last address
+        ordered = sorted(subnets, key=lambda subnet: subnet[1])
+        for i, (var, (version, first, last, text)) in enumerate(ordered):
+            for other_var, (other_version, other_first, _, other_text) in ordered[i + 1:]:
+                if other_version != version or other_first > last:
+                    break
+                findings.append({"kind": "overlap", "level": "error", "stack": stack, "component": component,
+                                 "message": f"{component} in {stack}: {var} {text} overlaps {other_var} {other_text}"})
+
+        for version, first, last, text in ranges:
+            inside = [r for _, r in subnets if r[0] == version and first <= r[1] and r[2] <= last]
+            if not inside:
+                continue
+            # Merged first so overlapping subnets aren't counted twice
+            allocated = merge_spans([(r[1], r[2]) for r in inside])
+            used = sum(b - a + 1 for a, b in allocated) / (last - first + 1)
+            largest = max(inside, key=lambda r: r[2] - r[1])
+            free = max([largest_aligned_block(a + 1, b - 1) for a, b in
+                        zip([first - 1] + [b for _, b in allocated], [a for a, _ in allocated] + [last + 1])])
+            full = free < largest[2] - largest[1] + 1
+            if used >= EXHAUSTION_THRESHOLD or full:
+                findings.append({"kind": "exhaustion", "level": "warning", "stack": stack, "component": component,
+                                 "message": f"{component} in {stack}: subnets allocate {used:.0%} of {text}"
+                                            + (f", no room for another /{largest[3].split('/')[1]}" if full else "")})
+        return findings
+
+    def findings(self, stacks: Optional[Iterable[str]] = None) -> List[Finding]:
+        """Every problem found for the VPCs of the given stacks (all by default)"""
+        selected = None if stacks is None else set(stacks)
+        findings = [f for f in self.invalid if selected is None or f["stack"] in selected]
+        for key in sorted(self.vpcs):
+            if selected is None or key[0] in selected:
+                findings.extend(self.vpc_overlaps(key, selected))
+                findings.extend(self.subnet_findings(key))
+        return findings
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Check VPC and subnet ranges across every stack")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("--query", metavar="CIDR", help="List the VPCs and subnets overlapping CIDR")
+    parser.add_argument("--json", action="store_true", help="Print findings as JSON")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Resolve every stack, ignoring and not updating the cache")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = NetworkIndex(args.repo_root).load(use_cache=not args.no_cache)
+    loaded = time.perf_counter()
+
+    if args.query:
+        try:
+            matches = index.query(args.query)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(2)
+        if args.json:
+            print(json.dumps({
+                "vpcs": [{"stack": k[0], "component": k[1], "cidr": cidr} for k, cidr in matches["vpcs"]],
+                "subnets": [{"stack": k[0], "component": k[1], "var": v, "cidr": cidr}
+                            for k, v, cidr in matches["subnets"]],
+            }, indent=2))
+        else:
+            for (stack, component), cidr in matches["vpcs"]:
+                print(f"{cidr}  {component} in {stack}")
+            for (stack, component), var, cidr in matches["subnets"]:
+                print(f"  {cidr}  {var} of {component} in {stack}")
+        sys.exit(0)
+
+    findings = index.findings()
+    elapsed = time.perf_counter() - loaded
+    if args.json:
+        print(json.dumps(findings, indent=2))
+    else:
+        for finding in findings:
+            print(f"{'❌' if finding['level'] == 'error' else '⚠️ '} {finding['message']}")
+
+    for key, error in sorted(index.errors.items()):
+        print(f"Error: {key}: {error}", file=sys.stderr)
+    errors = sum(1 for f in findings if f["level"] == "error")
+    print(f"{len(index.vpcs)} VPCs in {len(set(k[0] for k in index.vpcs))} stacks "
+          f"({index.resolved} resolved, {index.cached} cached): {errors} errors, {len(findings) - errors} warnings "
+          f"(loaded in {(loaded - start) * 1000:.0f}ms, checked in {elapsed * 1000:.0f}ms)", file=sys.stderr)
+    sys.exit(1 if errors or index.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
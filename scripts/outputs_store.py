@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Atmos Component Outputs Store
+
+Keeps the Terraform outputs of applied components in a local SQLite
+database (.cache/outputs.db) so scripts and cross-component
+`${output.<component>.<name>}` references can be answered without reading
+remote state or running `terraform output`.
+
+The post_apply hook in atmos.yaml writes `terraform output -json` to
+<component dir>/${TF_DATA_DIR}/outputs.json. Instances of one Terraform
+component share that directory, so the file is ingested right after each
+apply, keyed by stack and component instance. The pre_apply and post_apply
+hooks run `invalidate` and `ingest` with --workspace, which finds the
+instance from the component directory they run in and its selected
+Terraform workspace, so every `atmos terraform apply` keeps the store
+current. A directory or workspace no instance matches is only warned about,
+so the bookkeeping never fails an apply. stack_executor.py does the same
+around each apply it runs.
+
+When a component is re-applied its stored outputs are invalidated before
+the apply starts and replaced once it succeeds; after a failed apply they
+stay invalid until the next successful one. Sensitive outputs are recorded
+by name only, their values are never written to disk.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./outputs_store.py get <stack> <component> [<name>] [--json]
+    ./outputs_store.py list [<stack>]
+    ./outputs_store.py resolve <stack> <component>
+    ./outputs_store.py ingest <stack> <component> [<outputs.json>]
+    ./outputs_store.py invalidate <stack> <component>
+    ./outputs_store.py {ingest,invalidate} --workspace <workspace>
+
+    <stack> is a tenant-account-environment name (fnx-dev-testenv-01) or a
+    stack manifest (orgs/fnx/dev/eu-west-2/testenv-01).
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --db PATH             Database (default: .cache/outputs.db)
+    --workspace NAME      Instance applied in the current component directory
+                          with this Terraform workspace, instead of <stack> <component>
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+from stack_dag import ComponentDAG, find_stack
+from stack_resolver import StackResolver
+
+DEFAULT_DB_PATH = os.path.join(".cache", "outputs.db")
+
+# A ${output.<component>.<name>[.<key>|[<index>]...]} reference
+OUTPUT_PLACEHOLDER = re.compile(r"\$\{output\.([\w/-]+)\.([\w.\[\]-]+)\}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applies (
+    stack TEXT NOT NULL,
+    component TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    source TEXT,
+    PRIMARY KEY (stack, component)
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    stack TEXT NOT NULL,
+    component TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    type TEXT,
+    sensitive INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stack, component, name)
+);
+CREATE INDEX IF NOT EXISTS outputs_by_name ON outputs (name);
+"""
+
+
+def find_workspace(resolver: StackResolver, workdir: str, workspace: str) -> Optional[Tuple[ComponentDAG, str]]:
+    """Stack DAG and component instance that a component directory applies in a Terraform workspace.
+
+    Workspaces are named after the stack (tenant-account-environment), and
+    stack manifests after their environment, so only the stacks whose
+    manifest name is a dash-separated part of the workspace are resolved.
+    """
+    components_path = os.path.join(resolver.graph.repo_root, resolver.graph.components_base_path)
+    terraform_component = os.path.relpath(os.path.realpath(workdir), os.path.realpath(components_path))
+    for stack in sorted(resolver.graph.stacks):
+        if f"-{os.path.basename(stack)}-" not in f"-{workspace}-":
+            continue
+        dag = ComponentDAG.for_stack(resolver, stack)
+        for name, config in dag.deployed.items():
+            if config["component"] == terraform_component and dag.workspace(name) == workspace:
+                return dag, name
+    return None
+
+
+class OutputUnavailable(LookupError):
+    """An output that isn't stored, is invalidated or is sensitive"""
+
+
+class OutputsStore:
+    """SQLite-backed outputs of applied component instances"""
+
+    def __init__(self, repo_root: str, db_path: Optional[str] = None,
+                 components_path: str = "components/terraform"):
+        self.repo_root = os.path.abspath(repo_root)
+        self.db_path = db_path or os.path.join(self.repo_root, DEFAULT_DB_PATH)
+        self.components_path = os.path.join(self.repo_root, components_path)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self.connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        """Short-lived connection committing on success, safe to use from worker threads"""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def invalidate(self, stack: str, component: str):
+        """Mark a component's outputs as out of date, e.g. while it is being re-applied"""
+        with self.connect() as db:
+            db.execute("INSERT OR IGNORE INTO applies (stack, component, status, updated_at) VALUES (?, ?, '', 0)",
+                       (stack, component))
+            db.execute("UPDATE applies SET status = 'invalidated', updated_at = ? WHERE stack = ? AND component = ?",
+                       (time.time(), stack, component))
+
+    def ingest(self, stack: str, component: str, outputs: Dict[str, Any], source: Optional[str] = None):
+        """Replace a component's outputs with a `terraform output -json` document"""
+        rows = [
+            (stack, component, name, None if output.get("sensitive") else json.dumps(output.get("value")),
+             json.dumps(output.get("type")), 1 if output.get("sensitive") else 0)
+            for name, output in outputs.items()
+        ]
+        with self.connect() as db:
+            db.execute("DELETE FROM outputs WHERE stack = ? AND component = ?", (stack, component))
+            db.executemany("INSERT INTO outputs VALUES (?, ?, ?, ?, ?, ?)", rows)
+            db.execute("INSERT OR REPLACE INTO applies VALUES (?, ?, 'current', ?, ?)",
+                       (stack, component, time.time(), source))
+
+    def ingest_file(self, stack: str, component: str, path: str, stale_mtime: Optional[float] = None) -> bool:
+        """Ingest an outputs.json file unless it is missing or still has the modification time `stale_mtime`"""
+        if not os.path.exists(path) or os.path.getmtime(path) == stale_mtime:
+            return False
+        with open(path, "r") as f:
+            self.ingest(stack, component, json.load(f), source=os.path.relpath(path, self.repo_root))
+        return True
+
+    def outputs_file(self, terraform_component: str) -> str:
+        """outputs.json written by the post_apply hook for a Terraform component"""
+        data_dir = os.environ.get("TF_DATA_DIR", ".terraform")
+        return os.path.join(self.components_path, terraform_component, data_dir, "outputs.json")
+
+    def status(self, stack: str, component: str) -> Optional[Tuple[str, float]]:
+        """('current' or 'invalidated', time of the last change), or None if never ingested"""
+        with self.connect() as db:
+            return db.execute("SELECT status, updated_at FROM applies WHERE stack = ? AND component = ?",
+                              (stack, component)).fetchone()
+
+    def get(self, stack: str, component: str, name: Optional[str] = None) -> Any:
+        """One output value, or all non-sensitive output values of a component.
+
+        Raises OutputUnavailable when the outputs aren't current or the output
+        is missing or sensitive.
+        """
+        status = self.status(stack, component)
+        if status is None:
+            raise OutputUnavailable(f"no outputs stored for {stack}:{component}")
+        if status[0] != "current":
+            raise OutputUnavailable(f"outputs of {stack}:{component} are invalidated until its next successful apply")
+        with self.connect() as db:
+            if name is None:
+                rows = db.execute("SELECT name, value FROM outputs WHERE stack = ? AND component = ? AND sensitive = 0",
+                                  (stack, component)).fetchall()
+                return {row[0]: json.loads(row[1]) for row in rows}
+            row = db.execute("SELECT value, sensitive FROM outputs WHERE stack = ? AND component = ? AND name = ?",
+                             (stack, component, name)).fetchone()
+        if row is None:
+            raise OutputUnavailable(f"{stack}:{component} has no output {name}")
+        if row[1]:
+            raise OutputUnavailable(f"{stack}:{component} output {name} is sensitive and not stored")
+        return json.loads(row[0])
+
+    def lookup(self, stack: str, component: str, path: str) -> Any:
+        """Value at a path: the output name followed by .key or [index] steps"""
+        name, *keys = path.replace("[", ".").replace("]", "").split(".")
+        value = self.get(stack, component, name)
+        for key in keys:
+            try:
+                value = value[int(key)] if isinstance(value, list) else value[key]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise OutputUnavailable(f"{stack}:{component} output {path} has no {key}")
+        return value
+
+    def list(self, stack: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Stored components with their status and output names"""
+        query = ("SELECT a.stack, a.component, a.status, a.updated_at, a.source, "
+                 "GROUP_CONCAT(o.name || CASE o.sensitive WHEN 1 THEN ' (sensitive)' ELSE '' END, ', ') "
+                 "FROM applies a LEFT JOIN outputs o ON o.stack = a.stack AND o.component = a.component "
+                 + ("WHERE a.stack = ? " if stack else "") +
+                 "GROUP BY a.stack, a.component ORDER BY a.stack, a.component")
+        with self.connect() as db:
+            rows = db.execute(query, (stack,) if stack else ()).fetchall()
+        return [
+            {"stack": r[0], "component": r[1], "status": r[2], "updated_at": r[3], "source": r[4],
+             "outputs": r[5].split(", ") if r[5] else []}
+            for r in rows
+        ]
+
+    def resolve_references(self, dag: ComponentDAG, component: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Vars of a component with ${output...} references filled from the store, and the unresolved ones"""
+        stack = dag.name or dag.stack
+        missing = []  # type: List[str]
+
+        def fill(value: Any) -> Any:
+            if isinstance(value, dict):
+                return {k: fill(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [fill(v) for v in value]
+            if not isinstance(value, str):
+                return value
+            matches = list(OUTPUT_PLACEHOLDER.finditer(value))
+            if not matches:
+                return value
+            resolved = []
+            for match in matches:
+                instances = dag.match(match.group(1))
+                try:
+                    if len(instances) != 1:
+                        raise OutputUnavailable(f"{match.group(1)} matches {len(instances)} components of {stack}")
+                    resolved.append(self.lookup(stack, instances[0], match.group(2)))
+                except OutputUnavailable as e:
+                    missing.append(f"{match.group(0)}: {e}")
+                    resolved.append(match.group(0))
+            # A reference that is the whole value keeps the output's type
+            if len(matches) == 1 and matches[0].group(0) == value:
+                return resolved[0]
+            pieces = iter(resolved)
+            return OUTPUT_PLACEHOLDER.sub(lambda m: str(next(pieces)), value)
+
+        return fill(dag.deployed[component].get("vars") or {}), missing
+
+
+def main():
+    """Main entry point for the script"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    common.add_argument("--db", help="Database (default: .cache/outputs.db)")
+    parser = argparse.ArgumentParser(description="Local store of applied component outputs")
+    subparsers = parser.add_subparsers(dest="action")
+    get_parser = subparsers.add_parser("get", parents=[common], help="Outputs of a component")
+    get_parser.add_argument("stack")
+    get_parser.add_argument("component")
+    get_parser.add_argument("name", nargs="?", help="Output name, optionally followed by .key path")
+    get_parser.add_argument("--json", action="store_true", help="Print values as JSON")
+    list_parser = subparsers.add_parser("list", parents=[common], help="Stored components")
+    list_parser.add_argument("stack", nargs="?")
+    for action, help_text in (("resolve", "Component vars with output references filled in"),
+                              ("ingest", "Store a component's outputs.json"),
+                              ("invalidate", "Mark a component's outputs out of date")):
+        action_parser = subparsers.add_parser(action, parents=[common], help=help_text)
+        if action == "resolve":
+            action_parser.add_argument("stack")
+            action_parser.add_argument("component")
+            continue
+        action_parser.add_argument("stack", nargs="?")
+        action_parser.add_argument("component", nargs="?")
+        if action == "ingest":
+            action_parser.add_argument("file", nargs="?", help="outputs.json (default: the post_apply hook's file)")
+        action_parser.add_argument("--workspace", help="Instance applied in the current component directory "
+                                                       "with this Terraform workspace, instead of STACK COMPONENT")
+    args = parser.parse_args()
+
+    if not args.action:
+        parser.print_help()
+        sys.exit(1)
+
+    resolver = StackResolver.for_repo(args.repo_root)
+    store = OutputsStore(args.repo_root, args.db, components_path=resolver.graph.components_base_path)
+
+    dag, stack_key = None, None
+    if args.action in ("ingest", "invalidate"):
+        if args.workspace:
+            if args.stack:
+                parser.error("--workspace replaces <stack> <component>")
+            found = find_workspace(resolver, os.getcwd(), args.workspace)
+            if found is None:
+                # Run from the apply hooks, so an unmatched workdir or workspace mustn't fail the apply
+                print(f"Warning: no component instance of {os.getcwd()} uses workspace {args.workspace}, "
+                      f"nothing to {args.action}", file=sys.stderr)
+                sys.exit(0)
+            dag, args.component = found
+            stack_key = dag.name or dag.stack
+        elif not args.component:
+            parser.error(f"{args.action} needs <stack> <component> or --workspace")
+    if dag is None and getattr(args, "stack", None):
+        stack = find_stack(resolver, args.stack)
+        if stack is None:
+            print(f"Error: {args.stack} is not a stack", file=sys.stderr)
+            sys.exit(1)
+        dag = ComponentDAG.for_stack(resolver, stack)
+        stack_key = dag.name or dag.stack
+        if getattr(args, "component", None) and args.component not in dag.deployed:
+            print(f"Error: {stack_key} has no component {args.component}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.action == "list":
+        for entry in store.list(stack_key):
+            updated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["updated_at"]))
+            print(f"{entry['stack']}:{entry['component']}  {entry['status']}  {updated}")
+            if entry["outputs"]:
+                print(f"  {', '.join(entry['outputs'])}")
+
+    elif args.action == "get":
+        try:
+            value = (store.lookup(stack_key, args.component, args.name) if args.name
+                     else store.get(stack_key, args.component))
+        except OutputUnavailable as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if args.json or not isinstance(value, str):
+            print(json.dumps(value, indent=2))
+        else:
+            print(value)
+
+    elif args.action == "resolve":
+        resolved, missing = store.resolve_references(dag, args.component)
+        print(json.dumps(resolved, indent=2))
+        for reference in missing:
+            print(f"Unresolved: {reference}", file=sys.stderr)
+        sys.exit(1 if missing else 0)
+
+    elif args.action == "ingest":
+        path = args.file or store.outputs_file(dag.deployed[args.component]["component"])
+        if not store.ingest_file(stack_key, args.component, path):
+            print(f"Error: {path} does not exist", file=sys.stderr)
+            sys.exit(1)
+        print(f"Stored outputs of {stack_key}:{args.component} from {path}")
+
+    else:
+        store.invalidate(stack_key, args.component)
+        print(f"Invalidated outputs of {stack_key}:{args.component}")
+
+
+if __name__ == "__main__":
+    main()
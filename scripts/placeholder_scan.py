@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Placeholder Scanner
+
+Checks the ${var} template placeholders of every manifest against the vars in
+scope for each stack that imports it:
+
+- undefined: a placeholder without a default, e.g. ${tenant} rather than
+  ${log_retention_days | default(30)}, for which no manifest in the stack's
+  import closure defines the var. atmos leaves it in the value as-is.
+- unused: a stack-wide var (top-level `vars:`, merged into every component)
+  that no placeholder in any stack importing it reads and no Terraform
+  component under components/terraform declares. Component vars are inputs
+  of their component and left to the module checks.
+
+Scope is the whole stack: every key of a `vars:` section in any manifest the
+stack is made of (graph.stack_files). Manifests no stack imports aren't
+checked. ${output...}, ${env:...} and Terraform interpolations such as
+${var.x} aren't template placeholders and are ignored, as are placeholders in
+comments.
+
+The tree is scanned in a single pass. Each manifest is memory-mapped and run
+through one precompiled matcher that finds both the placeholders and the
+`vars:` headers; only the keys of the vars blocks found are read beyond that,
+without parsing YAML. Line numbers are only worked out for the findings.
+Results are memoized per file by mtime and size, so a scanner kept in memory
+(as by watch mode) only rescans the files that changed.
+
+Used by the placeholders phase of validate_atmos.py and by watch mode; also
+runs on its own, e.g. as a pre-commit hook.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./placeholder_scan.py [options] [FILE ...]
+
+With FILEs (repo-relative, as pre-commit passes them) the stacks they
+affect are checked, and only findings in the FILEs themselves are reported,
+so problems already in other manifests of those stacks don't block a commit.
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --json                Print findings as JSON
+    --no-unused           Only report undefined placeholders
+
+Exit code: 0 without errors, 1 when undefined placeholders were found.
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import argparse
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+from stack_graph import StackGraph
+
+# ${name} or ${name | filter(...)}, and a `vars:` key ending its line. Both
+# alternatives start with a literal, which keeps the scan fast.
+MATCHER = re.compile(rb"\$\{[ \t]*(?P<name>[A-Za-z_]\w*)[ \t]*(?P<filter>\|[^}\n]*)?\}"
+                     rb"|vars:[ \t]*(?:#[^\n]*)?\r?$", re.M)
+# First line of a block with content, a comment start, a Terraform variable
+CONTENT = re.compile(rb"^( *)[^ \r\n#]", re.M)
+COMMENT = re.compile(rb"(?:^|[ \t])#")
+VARIABLE = re.compile(rb"^variable[ \t]+\"([\w-]+)\"", re.M)
+
+# Filled in by atmos itself
+BUILTIN_VARS = frozenset((b"component", b"stack"))
+
+# Stacks named per finding before the rest are counted
+MAX_LISTED = 3
+
+# (name, offset, has a default)
+Use = Tuple[bytes, int, bool]
+# defines, stack_wide (name -> offset), uses, reads, requires (names read without a default)
+Manifest = Dict[str, Any]
+Finding = Dict[str, Any]
+
+
+# The block matchers start at a newline rather than ^, so that the regex
+# engine can skip ahead to candidates instead of trying every position.
+@lru_cache(maxsize=None)
+def block_end(indent: int) -> "re.Pattern":
+    """First line indented no deeper than a `vars:` key at `indent`, i.e. the end of its block"""
+    return re.compile(rb"\n {0,%d}[^ \r\n#]" % indent)
+
+
+@lru_cache(maxsize=None)
+def block_keys(indent: int) -> "re.Pattern":
+    """Mapping keys indented by exactly `indent`"""
+    return re.compile(rb"\n {%d}([A-Za-z_][\w-]*)[ \t]*:(?=[ \t\r\n]|$)" % indent, re.M)
+
+
+def map_file(path: str) -> Optional[mmap.mmap]:
+    """A read-only memory map of a file, or None when it is empty"""
+    with open(path, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+
+
+def manifest_scan(defines: Set[bytes], stack_wide: Dict[bytes, int], uses: List[Use]) -> Manifest:
+    """A manifest's scan, with the name sets the per-stack checks combine"""
+    return {
+        "defines": frozenset(defines).union(stack_wide),
+        "stack_wide": stack_wide,
+        "uses": uses,
+        "reads": frozenset(name for name, _, _ in uses),
+        "requires": frozenset(name for name, _, has_default in uses if not has_default),
+    }
+
+
+def scan_manifest(path: str) -> Manifest:
+    """The vars a manifest defines and the placeholders it uses.
+
+    Names stay bytes, as read from the map; only findings decode them.
+    """
+    defines = set()  # type: Set[bytes]
+    stack_wide = {}  # type: Dict[bytes, int]
+    uses = []  # type: List[Use]
+    data = map_file(path)
+    if data is not None:
+        with data:
+            blocks = []  # type: List[Tuple[int, int]]
+            for match in MATCHER.finditer(data):
+                start = match.start()
+                prefix = data[data.rfind(b"\n", 0, start) + 1:start]
+                name = match.group("name")
+                if name is not None:
+                    if not COMMENT.search(prefix):
+                        uses.append((name, start, match.group("filter") is not None))
+                elif not prefix.strip(b" -"):
+                    # `vars:` as a key of its own (not e.g. `tags_vars:`); `- vars:` nests it in a list item
+                    blocks.append((len(prefix), match.end()))
+            for indent, start in blocks:
+                child = CONTENT.search(data, start)
+                if child is None or len(child.group(1)) <= indent:
+                    continue
+                # From the newline before the block's first line to the one after its last
+                end = block_end(indent).search(data, child.start())
+                span = (child.start() - 1, end.start() if end else len(data))
+                keys = block_keys(len(child.group(1)))
+                if indent:
+                    defines.update(keys.findall(data, *span))
+                    continue
+                for key in keys.finditer(data, *span):
+                    stack_wide.setdefault(key.group(1), key.start(1))
+    return manifest_scan(defines, stack_wide, uses)
+
+
+def scan_variables(path: str) -> Set[bytes]:
+    """Variables a Terraform file declares"""
+    data = map_file(path)
+    if data is None:
+        return set()
+    with data:
+        return set(VARIABLE.findall(data))
+
+
+def line_numbers(path: str, offsets: Iterable[int]) -> Dict[int, int]:
+    """Line number of each offset in a file"""
+    lines = {}  # type: Dict[int, int]
+    data = map_file(path)
+    if data is None:
+        return lines
+    with data:
+        line, last = 1, 0
+        for offset in sorted(set(offsets)):
+            line += data[last:offset].count(b"\n")
+            lines[offset] = line
+            last = offset
+    return lines
+
+
+def listed(stacks: List[str]) -> str:
+    """Stacks for a message, the first few by name"""
+    more = len(stacks) - MAX_LISTED
+    return ", ".join(stacks[:MAX_LISTED]) + (f" and {more} more" if more > 0 else "")
+
+
+class PlaceholderScanner:
+    """Memoized scan of the manifests' placeholders and vars, checked per stack"""
+
+    def __init__(self, repo_root: str):
+        self.repo_root = os.path.abspath(repo_root)
+        # manifest key -> ((mtime_ns, size), scan)
+        self.manifests = {}  # type: Dict[str, Tuple[Tuple[int, int], Manifest]]
+        # Terraform file path -> ((mtime_ns, size), variables)
+        self.terraform = {}  # type: Dict[str, Tuple[Tuple[int, int], Set[bytes]]]
+        self.variables = frozenset()  # type: frozenset
+        self.graph = None  # type: Optional[StackGraph]
+        self.scanned = 0
+        self.unchanged = 0
+        self._findings = None  # type: Optional[List[Finding]]
+        self._by_stack = {}  # type: Dict[str, List[int]]
+
+    def scan_terraform(self, components_path: str) -> bool:
+        """Rescan changed .tf files; whether the declared variables may have changed"""
+        seen = set()  # type: Set[str]
+        changed = False
+        for directory, dirs, files in os.walk(components_path):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if not name.endswith(".tf"):
+                    continue
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                version = (stat.st_mtime_ns, stat.st_size)
+                seen.add(path)
+                cached = self.terraform.get(path)
+                if cached is None or cached[0] != version:
+                    self.terraform[path] = (version, scan_variables(path))
+                    changed = True
+        for path in set(self.terraform) - seen:
+            del self.terraform[path]
+            changed = True
+        if changed:
+            self.variables = frozenset(v for _, variables in self.terraform.values() for v in variables)
+        return changed
+
+    def scan(self, graph: Optional[StackGraph] = None) -> "PlaceholderScanner":
+        """Scan every manifest of the import graph, skipping the ones unchanged since the last scan"""
+        graph = graph or StackGraph.from_atmos_config(self.repo_root).load()
+        changed = graph is not self.graph
+        self.graph = graph
+        self.scanned = self.unchanged = 0
+        for key, node in graph.nodes.items():
+            version = (node["mtime_ns"], node["size"])
+            cached = self.manifests.get(key)
+            if cached is not None and cached[0] == version:
+                self.unchanged += 1
+                continue
+            try:
+                self.manifests[key] = (version, scan_manifest(os.path.join(graph.stacks_path, node["path"])))
+            except OSError:
+                self.manifests[key] = (version, manifest_scan(set(), {}, []))
+            self.scanned += 1
+            changed = True
+        for key in set(self.manifests) - set(graph.nodes):
+            del self.manifests[key]
+            changed = True
+        if self.scan_terraform(os.path.join(self.repo_root, graph.components_base_path)) or changed:
+            self._findings = None
+        return self
+
+    def path_of(self, key: str) -> str:
+        """Repo-relative path of a manifest"""
+        return f"{self.graph.base_path}/{self.graph.nodes[key]['path']}"
+
+    def check(self) -> List[Finding]:
+        """Undefined placeholders and unused vars across every stack, memoized until a file changes"""
+        if self._findings is not None:
+            return self._findings
+        graph = self.graph
+        scans = {key: scan for key, (_, scan) in self.manifests.items()}
+        # Stack-wide vars of each manifest that neither Terraform nor a placeholder has been seen to read yet
+        unread = {key: set(scan["stack_wide"]) - self.variables - BUILTIN_VARS
+                  for key, scan in scans.items() if scan["stack_wide"]}
+        # manifest key -> stacks importing it
+        importers = defaultdict(list)  # type: Dict[str, List[str]]
+        undefined = defaultdict(list)  # type: Dict[Tuple[str, int, bytes], List[str]]
+        for stack in graph.stacks:
+            files = graph.stack_files(stack)
+            for key in files:
+                importers[key].append(stack)
+            missing = frozenset().union(*(scans[key]["requires"] for key in files)) - BUILTIN_VARS \
+                - frozenset().union(*(scans[key]["defines"] for key in files))
+            for key in files:
+                if missing and scans[key]["requires"] & missing:
+                    for name, offset, has_default in scans[key]["uses"]:
+                        if not has_default and name in missing:
+                            undefined[(key, offset, name)].append(stack)
+                if unread.get(key):
+                    unread[key] -= frozenset().union(*(scans[k]["reads"] for k in files))
+
+        lines = defaultdict(list)  # type: Dict[str, List[int]]
+        for key, offset, _ in undefined:
+            lines[key].append(offset)
+        for key, names in unread.items():
+            if key in importers:
+                lines[key].extend(scans[key]["stack_wide"][name] for name in names)
+        numbers = {key: line_numbers(os.path.join(graph.stacks_path, graph.nodes[key]["path"]), offsets)
+                   for key, offsets in lines.items()}
+
+        findings = []  # type: List[Finding]
+        for (key, offset, name), stacks in sorted(undefined.items()):
+            line = numbers[key].get(offset, 0)
+            var = name.decode()
+            findings.append({"kind": "undefined", "level": "error", "file": key, "stacks": stacks, "line": line,
+                             "message": f"{self.path_of(key)}:{line}: ${{{var}}} has no default and {var} isn't a "
+                                        f"var of {'stack ' + stacks[0] if stacks == [key] else listed(stacks)}"})
+        for key, names in sorted(unread.items()):
+            if key not in importers:
+                continue
+            for name in sorted(names, key=scans[key]["stack_wide"].get):
+                line = numbers[key].get(scans[key]["stack_wide"][name], 0)
+                findings.append({"kind": "unused", "level": "warning", "file": key, "stacks": importers[key][:1],
+                                 "line": line,
+                                 "message": f"{self.path_of(key)}:{line}: var {name.decode()} is read by no "
+                                            f"placeholder and no Terraform component"})
+        # stack -> positions of the findings it is involved in
+        self._by_stack = defaultdict(list)
+        for i, finding in enumerate(findings):
+            for stack in finding["stacks"] if finding["kind"] == "undefined" else importers[finding["file"]]:
+                self._by_stack[stack].append(i)
+        self._findings = findings
+        return findings
+
+    def findings(self, stacks: Optional[Iterable[str]] = None, unused: bool = True) -> List[Finding]:
+        """Findings involving the given stacks (all by default), each recorded against one of them.
+
+        Unused vars are reported for every stack importing the manifest that defines them.
+        """
+        findings = self.check()
+        if stacks is None:
+            chosen = {i: finding["stacks"][0] for i, finding in enumerate(findings)}
+        else:
+            chosen = {}  # type: Dict[int, str]
+            for stack in sorted(set(stacks)):
+                for i in self._by_stack.get(stack, ()):
+                    chosen.setdefault(i, stack)
+        return [dict(findings[i], stack=stack) for i, stack in sorted(chosen.items())
+                if unused or findings[i]["kind"] != "unused"]
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Check stack placeholders against the vars in scope")
+    parser.add_argument("files", nargs="*", metavar="FILE", help="Only report findings in these files")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("--json", action="store_true", help="Print findings as JSON")
+    parser.add_argument("--no-unused", action="store_true", help="Only report undefined placeholders")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = StackGraph.from_atmos_config(args.repo_root).load()
+    scanner = PlaceholderScanner(args.repo_root).scan(graph)
+    scanned = time.perf_counter()
+    stacks = sorted(graph.affected_stacks(args.files)) if args.files else None
+    findings = scanner.findings(stacks, unused=not args.no_unused)
+    if args.files:
+        passed = {os.path.normpath(path) for path in args.files}
+        findings = [f for f in findings if scanner.path_of(f["file"]) in passed]
+    elapsed = time.perf_counter() - scanned
+
+    if args.json:
+        print(json.dumps(findings, indent=2))
+    else:
+        for finding in findings:
+            print(f"{'❌' if finding['level'] == 'error' else '⚠️ '} {finding['message']}")
+
+    errors = sum(1 for f in findings if f["level"] == "error")
+    print(f"{scanner.scanned} manifests scanned, {len(scanner.variables)} Terraform variables, "
+          f"{len(graph.stacks) if stacks is None else len(stacks)} stacks checked: {errors} errors, "
+          f"{len(findings) - errors} warnings (scanned in {(scanned - start) * 1000:.0f}ms, "
+          f"checked in {elapsed * 1000:.0f}ms)", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Terraform Provider Cache Manager
+
+Shares one Terraform plugin cache between every component and library module
+so providers are downloaded once instead of into each `.terraform`:
+
+1. Provider requirements are read from the `required_providers` blocks of
+   every root module under components/terraform, together with the local
+   modules it calls (`source = "../s3"`).
+2. `warm` runs one `terraform init -backend=false` per distinct requirement
+   set in a scratch directory, so each version the components will select
+   is in the cache before any component runs.
+3. Terraform doesn't support concurrent writes to the plugin cache. `warm`
+   holds an exclusive lock on the cache and component runs hold a shared one,
+   so parallel runs only ever read a warmed cache.
+4. A component's init fingerprint covers its lock file, its provider and
+   module requirements and its resolved backend configuration. While the
+   fingerprint recorded at the last successful run still matches and
+   `.terraform` exists, stack_executor.py passes `--skip-init` to atmos.
+
+The cache lives in $TF_PLUGIN_CACHE_DIR or ~/.terraform.d/plugin-cache. The
+repository has no .terraform.lock.hcl files, so runs set
+TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE=true to let Terraform use
+cached providers that no lock file vouches for yet.
+
+Requirements:
+    - Python 3.6+ on Linux or macOS (fcntl)
+    - PyYAML: pip install pyyaml
+    - terraform (for warm)
+
+Usage:
+    ./provider_cache.py scan [--json]   Provider requirements and the modules declaring them
+    ./provider_cache.py warm            Download every required provider version into the cache
+    ./provider_cache.py status          Cached providers and warmed requirement sets
+    ./provider_cache.py env             Shell exports for using the cache (eval "$(./provider_cache.py env)")
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --cache-dir DIR       Plugin cache directory (default: $TF_PLUGIN_CACHE_DIR or ~/.terraform.d/plugin-cache)
+    --terraform PATH      terraform binary for warm (default: terraform)
+"""
+
+import os
+import re
+import sys
+import json
+import fcntl
+import shutil
+import hashlib
+import argparse
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, List, Set, Any, Tuple, Optional, FrozenSet
+
+from stack_graph import write_json_atomic
+from stack_resolver import StackResolver
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".terraform.d", "plugin-cache")
+DEFAULT_REGISTRY = "registry.terraform.io"
+INIT_STATE_PATH = os.path.join(".cache", "terraform-init.json")
+
+# Directories that are never root modules of their own
+SKIPPED_DIRS = {".terraform", ".terragrunt-cache", "examples", "modules", "test", "tests"}
+
+COMMENT = re.compile(r'"(?:\\.|[^"\\])*"|/\*.*?\*/|(?:#|//)[^\n]*', re.S)
+REQUIRED_PROVIDERS = re.compile(r"\brequired_providers\s*\{")
+MODULE_BLOCK = re.compile(r'\bmodule\s+"[^"]*"\s*\{')
+BACKEND_BLOCK = re.compile(r'\bbackend\s+"[^"]*"\s*\{')
+PROVIDER_ENTRY = re.compile(r'([\w-]+)\s*=\s*(?:\{([^{}]*)\}|"([^"]*)")')
+ATTRIBUTE = re.compile(r'\b(source|version)\s*=\s*"([^"]*)"')
+LOCKED_PROVIDER = re.compile(r'provider\s+"([^"]+)"\s*\{[^}]*?\bversion\s*=\s*"([^"]+)"', re.S)
+
+Requirements = Dict[str, Set[str]]
+
+
+def strip_comments(text: str) -> str:
+    """Remove HCL comments, keeping string literals intact"""
+    return COMMENT.sub(lambda m: m.group(0) if m.group(0).startswith('"') else "", text)
+
+
+def block_bodies(text: str, opening: "re.Pattern") -> List[str]:
+    """Bodies of every block whose header matches `opening` (which ends at the `{`)"""
+    bodies = []
+    for match in opening.finditer(text):
+        depth, start = 1, match.end()
+        for index in range(start, len(text)):
+            if text[index] == "{":
+                depth += 1
+            elif text[index] == "}":
+                depth -= 1
+                if depth == 0:
+                    bodies.append(text[start:index])
+                    break
+    return bodies
+
+
+def provider_address(name: str, source: Optional[str]) -> str:
+    """Fully qualified provider address (aws -> registry.terraform.io/hashicorp/aws)"""
+    source = source or f"hashicorp/{name}"
+    return source if source.count("/") == 2 else f"{DEFAULT_REGISTRY}/{source}"
+
+
+def read_module(path: str) -> Tuple[Requirements, List[str], str]:
+    """Provider requirements, local module sources and init-relevant text of one module directory"""
+    requirements = {}  # type: Requirements
+    local_sources = []  # type: List[str]
+    init_text = []  # type: List[str]
+    for name in sorted(os.listdir(path)):
+        if not name.endswith(".tf"):
+            continue
+        with open(os.path.join(path, name), "r", errors="replace") as f:
+            text = strip_comments(f.read())
+        for body in block_bodies(text, REQUIRED_PROVIDERS):
+            init_text.append(body)
+            for provider, attributes, legacy_version in PROVIDER_ENTRY.findall(body):
+                values = dict(ATTRIBUTE.findall(attributes)) if attributes else {"version": legacy_version}
+                constraints = requirements.setdefault(provider_address(provider, values.get("source")), set())
+                if values.get("version"):
+                    constraints.add(values["version"])
+        for body in block_bodies(text, MODULE_BLOCK):
+            values = dict(ATTRIBUTE.findall(body))
+            init_text.append(json.dumps(values, sort_keys=True))
+            if values.get("source", "").startswith(("./", "../")):
+                local_sources.append(values["source"])
+        init_text.extend(block_bodies(text, BACKEND_BLOCK))
+    return requirements, local_sources, "\n".join(init_text)
+
+
+class ProviderCache:
+    """Shared plugin cache, its warm-up and the init fingerprints of component directories"""
+
+    def __init__(self, resolver: StackResolver, cache_dir: Optional[str] = None):
+        self.resolver = resolver
+        self.repo_root = resolver.graph.repo_root
+        self.components_path = os.path.join(self.repo_root, resolver.graph.components_base_path)
+        self.cache_dir = os.path.abspath(os.path.expanduser(
+            cache_dir or os.environ.get("TF_PLUGIN_CACHE_DIR") or DEFAULT_CACHE_DIR
+        ))
+        self.warm_dir = os.path.join(self.cache_dir, ".warm")
+        self.init_state_path = os.path.join(self.repo_root, INIT_STATE_PATH)
+
+        self._modules = {}  # type: Dict[str, Tuple[Requirements, List[str], str]]
+        self._init_state = None  # type: Optional[Dict[str, str]]
+        self._init_state_lock = threading.Lock()
+
+    # -- Requirements ------------------------------------------------------
+
+    def module(self, path: str) -> Tuple[Requirements, List[str], str]:
+        """Parsed module directory, memoized"""
+        path = os.path.normpath(path)
+        if path not in self._modules:
+            self._modules[path] = read_module(path) if os.path.isdir(path) else ({}, [], "")
+        return self._modules[path]
+
+    def requirements(self, path: str, _trail: Optional[Set[str]] = None) -> Requirements:
+        """Provider requirements of a root module including the local modules it calls"""
+        trail = (_trail or set()) | {os.path.normpath(path)}
+        own, local_sources, _ = self.module(path)
+        merged = {address: set(constraints) for address, constraints in own.items()}
+        for source in local_sources:
+            child = os.path.normpath(os.path.join(path, source))
+            if child in trail:
+                continue
+            for address, constraints in self.requirements(child, trail).items():
+                merged.setdefault(address, set()).update(constraints)
+        return merged
+
+    def root_modules(self) -> List[str]:
+        """Component and library module directories under the components base path"""
+        roots = []
+        for root, dirs, files in os.walk(self.components_path):
+            dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+            if any(name.endswith(".tf") for name in files):
+                roots.append(root)
+        return roots
+
+    def requirement_sets(self, roots: Optional[List[str]] = None) -> Dict[FrozenSet[Tuple[str, str]], List[str]]:
+        """Distinct combined requirement sets, each with the root modules that share it"""
+        sets = {}  # type: Dict[FrozenSet[Tuple[str, str]], List[str]]
+        for root in roots if roots is not None else self.root_modules():
+            requirements = self.requirements(root)
+            if not requirements:
+                continue
+            key = frozenset((address, ", ".join(sorted(c))) for address, c in requirements.items())
+            sets.setdefault(key, []).append(os.path.relpath(root, self.repo_root))
+        return sets
+
+    # -- Cache -------------------------------------------------------------
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """Hold the cache lock: exclusive while writing, shared while terraform reads from it"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def environment(self, cached: bool = True) -> Dict[str, str]:
+        """Environment for terraform processes using the cache.
+
+        Without `cached` the cache is left out, for inits of modules whose
+        requirement set failed to warm: they would write to it while holding
+        only the shared lock.
+        """
+        if not cached:
+            return {k: v for k, v in os.environ.items() if k != "TF_PLUGIN_CACHE_DIR"}
+        return dict(
+            os.environ,
+            TF_PLUGIN_CACHE_DIR=self.cache_dir,
+            TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE="true",
+        )
+
+    def cached_providers(self) -> Dict[str, List[str]]:
+        """Provider address -> versions present in the cache"""
+        found = {}  # type: Dict[str, List[str]]
+        for root, dirs, files in os.walk(self.cache_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            relative = os.path.relpath(root, self.cache_dir).split(os.sep)
+            if len(relative) == 5:  # hostname/namespace/type/version/os_arch
+                found.setdefault("/".join(relative[:3]), [])
+                if relative[3] not in found["/".join(relative[:3])]:
+                    found["/".join(relative[:3])].append(relative[3])
+                dirs[:] = []
+        return found
+
+    def warm_index(self) -> Dict[str, Any]:
+        """Requirement sets already warmed and the versions they selected"""
+        try:
+            with open(os.path.join(self.warm_dir, "index.json"), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def warm(self, roots: Optional[List[str]] = None, terraform: str = "terraform",
+             log=print) -> Dict[str, Any]:
+        """Download every provider version the root modules will select into the cache"""
+        sets = self.requirement_sets(roots)
+        results = {"warmed": 0, "already_cached": 0, "failed": []}  # type: Dict[str, Any]
+        with self.locked(exclusive=True):
+            index = self.warm_index()
+            cached = self.cached_providers()
+            for requirement_set, modules in sorted(sets.items(), key=lambda item: sorted(item[0])):
+                key = hashlib.sha256(json.dumps(sorted(requirement_set)).encode()).hexdigest()[:16]
+                selected = (index.get(key) or {}).get("selected") or {}
+                if selected and all(v in cached.get(a, []) for a, v in selected.items()):
+                    results["already_cached"] += 1
+                    continue
+
+                scratch = os.path.join(self.warm_dir, key)
+                os.makedirs(scratch, exist_ok=True)
+                entries = []
+                for address, constraint in sorted(requirement_set):
+                    local_name = address.rsplit("/", 1)[1]
+                    version = f', version = "{constraint}"' if constraint else ""
+                    entries.append(f'    {local_name} = {{ source = "{address}"{version} }}')
+                with open(os.path.join(scratch, "versions.tf"), "w") as f:
+                    f.write("terraform {\n  required_providers {\n" + "\n".join(entries) + "\n  }\n}\n")
+
+                log(f"Warming {', '.join(f'{a} {c}'.strip() for a, c in sorted(requirement_set))} "
+                    f"({len(modules)} modules)")
+                try:
+                    process = subprocess.run(
+                        [terraform, "init", "-backend=false", "-input=false", "-no-color"],
+                        cwd=scratch, env=self.environment(), stdout=subprocess.PIPE,
+                        stderr=subprocess.STDOUT, text=True
+                    )
+                    exit_code, output = process.returncode, process.stdout
+                except OSError as e:
+                    exit_code, output = 127, str(e)
+                if exit_code != 0:
+                    results["failed"].append({"requirements": sorted(requirement_set), "modules": modules,
+                                              "output": output.strip()})
+                    continue
+
+                with open(os.path.join(scratch, ".terraform.lock.hcl"), "r") as f:
+                    selected = dict(LOCKED_PROVIDER.findall(f.read()))
+                shutil.rmtree(os.path.join(scratch, ".terraform"), ignore_errors=True)
+                index[key] = {"requirements": sorted(requirement_set), "selected": selected, "modules": modules}
+                write_json_atomic(os.path.join(self.warm_dir, "index.json"), index, indent=1)
+                results["warmed"] += 1
+        return results
+
+    # -- Init fingerprints -------------------------------------------------
+
+    def workdir(self, stack: str, component: str) -> str:
+        """Terraform component directory of a component instance"""
+        config = self.resolver.resolve_component(stack, component)
+        return os.path.join(self.components_path, config["component"] if config else component)
+
+    def init_fingerprint(self, stack: str, component: str) -> str:
+        """Hash of everything `terraform init` depends on for a component instance"""
+        workdir = self.workdir(stack, component)
+        digest = hashlib.sha256()
+        lock_file = os.path.join(workdir, ".terraform.lock.hcl")
+        if os.path.exists(lock_file):
+            with open(lock_file, "rb") as f:
+                digest.update(f.read())
+        roots = [workdir] + [
+            os.path.normpath(os.path.join(workdir, s)) for s in self.module(workdir)[1]
+        ]
+        for root in roots:
+            digest.update(self.module(root)[2].encode())
+        backend_type, backend = self.resolver.backend_config(stack, component)
+        digest.update(json.dumps([backend_type, backend, self.cache_dir], sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def init_state(self) -> Dict[str, str]:
+        """Fingerprint of the last successful init per component directory"""
+        if self._init_state is None:
+            try:
+                with open(self.init_state_path, "r") as f:
+                    self._init_state = json.load(f)
+            except (OSError, ValueError):
+                self._init_state = {}
+        return self._init_state
+
+    def can_skip_init(self, stack: str, component: str, fingerprint: str) -> bool:
+        """Whether the component directory is already initialized for this fingerprint"""
+        workdir = self.workdir(stack, component)
+        data_dir = os.path.join(workdir, os.environ.get("TF_DATA_DIR", ".terraform"))
+        relative = os.path.relpath(workdir, self.repo_root)
+        with self._init_state_lock:
+            return os.path.isdir(data_dir) and self.init_state().get(relative) == fingerprint
+
+    def record_init(self, stack: str, component: str, fingerprint: str):
+        """Remember that the component directory was initialized with this fingerprint"""
+        relative = os.path.relpath(self.workdir(stack, component), self.repo_root)
+        with self._init_state_lock:
+            self.init_state()[relative] = fingerprint
+            write_json_atomic(self.init_state_path, self._init_state, indent=1, sort_keys=True)
+
+    def forget_init(self, stack: str, component: str):
+        """Drop the component directory's fingerprint before an init re-initializes it.
+
+        A failed or interrupted init can leave .terraform set up for another
+        instance's backend, so the old fingerprint must not survive it.
+        """
+        relative = os.path.relpath(self.workdir(stack, component), self.repo_root)
+        with self._init_state_lock:
+            if self.init_state().pop(relative, None) is not None:
+                write_json_atomic(self.init_state_path, self._init_state, indent=1, sort_keys=True)
+
+
+def main():
+    """Main entry point for the script"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    common.add_argument("--cache-dir", help="Plugin cache directory")
+    parser = argparse.ArgumentParser(description="Manage the shared Terraform provider plugin cache")
+    subparsers = parser.add_subparsers(dest="command")
+    scan_parser = subparsers.add_parser("scan", parents=[common], help="Provider requirements across modules")
+    scan_parser.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    warm_parser = subparsers.add_parser("warm", parents=[common], help="Download required providers into the cache")
+    warm_parser.add_argument("--terraform", default="terraform", help="terraform binary (default: terraform)")
+    subparsers.add_parser("status", parents=[common], help="Cached providers and warmed requirement sets")
+    subparsers.add_parser("env", parents=[common], help="Shell exports for using the cache")
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    cache = ProviderCache(StackResolver.for_repo(args.repo_root), args.cache_dir)
+
+    if args.command == "scan":
+        sets = cache.requirement_sets()
+        if args.json:
+            print(json.dumps([{"requirements": dict(sorted(s)), "modules": m} for s, m in sets.items()], indent=2))
+            return
+        for requirement_set, modules in sorted(sets.items(), key=lambda item: -len(item[1])):
+            print(", ".join(f"{a} {c}".strip() for a, c in sorted(requirement_set)) + f"  ({len(modules)} modules)")
+            for module in modules:
+                print(f"  {module}")
+        print(f"\n{len(sets)} distinct requirement sets")
+
+    elif args.command == "warm":
+        results = cache.warm(terraform=args.terraform)
+        print(f"{results['warmed']} requirement sets warmed, {results['already_cached']} already cached, "
+              f"{len(results['failed'])} failed ({cache.cache_dir})")
+        for failure in results["failed"]:
+            print(f"Error: {failure['requirements']}:\n{failure['output']}")
+        sys.exit(1 if results["failed"] else 0)
+
+    elif args.command == "status":
+        print(f"Cache: {cache.cache_dir}")
+        for address, versions in sorted(cache.cached_providers().items()):
+            print(f"  {address}: {', '.join(sorted(versions))}")
+        index = cache.warm_index()
+        print(f"{len(index)} warmed requirement sets, {len(cache.requirement_sets())} needed")
+
+    else:
+        print(f"export TF_PLUGIN_CACHE_DIR='{cache.cache_dir}'")
+        print("export TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE=true")
+
+
+if __name__ == "__main__":
+    main()
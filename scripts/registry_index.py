@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Module Registry Index
+
+Compiles the module registry (components/terraform/_catalog/module-registry.yaml)
+into a SQLite index (.cache/registry.db) and answers faceted searches from it
+without parsing the YAML again:
+
+- tags, category, maturity and complexity have their own indexes (tags as an
+  inverted tag -> module table)
+- estimated monthly cost and setup time are indexed for range queries
+- dependencies, compatibility declarations and module paths are stored as
+  relations, for tools that evaluate them (see registry_resolver.py)
+- every entry is also kept as JSON for `show`
+
+The index records the SHA-256 of the registry it was built from and is
+rebuilt only when that hash changes. A rebuild writes a new database next to
+the old one and renames it into place, so concurrent readers never see a
+partial index.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./registry_index.py search [TEXT] [filters] [--facets] [--json]
+    ./registry_index.py show MODULE [--json]
+    ./registry_index.py build [--force]
+
+Filters:
+    --tag TAG             Modules with this tag (repeatable, all must match)
+    --category CATEGORY   Category or parent category, e.g. compute or compute/serverless
+    --maturity LEVEL      Maturity level (repeatable, any may match)
+    --complexity LEVEL    beginner, intermediate or advanced (repeatable)
+    --min-cost/--max-cost USD   Estimated monthly cost range
+    --max-setup MINUTES   Setup time at most
+    --sort FIELD          name, cost, setup or rating (default: name)
+    --limit N             At most N results
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --registry PATH       Registry (default: components/terraform/_catalog/module-registry.yaml)
+    --db PATH             Index database (default: .cache/registry.db)
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+from typing import Dict, List, Any, Optional, Tuple
+
+import yaml
+
+from stack_graph import load_yaml_file
+
+DEFAULT_REGISTRY_PATH = os.path.join("components", "terraform", "_catalog", "module-registry.yaml")
+DEFAULT_DB_PATH = os.path.join(".cache", "registry.db")
+
+# Bump when the tables change so existing indexes are rebuilt
+INDEX_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE modules (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT,
+    maturity TEXT,
+    complexity TEXT,
+    category TEXT,
+    subcategory TEXT,
+    path TEXT,
+    description TEXT,
+    cost_usd REAL,
+    cost_category TEXT,
+    setup_minutes INTEGER,
+    rating REAL,
+    replaced_by TEXT,
+    search_text TEXT NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE TABLE tags (tag TEXT NOT NULL, module TEXT NOT NULL, PRIMARY KEY (tag, module)) WITHOUT ROWID;
+CREATE TABLE paths (path TEXT NOT NULL, module TEXT NOT NULL, PRIMARY KEY (path, module)) WITHOUT ROWID;
+CREATE TABLE relations (module TEXT NOT NULL, kind TEXT NOT NULL, target TEXT NOT NULL,
+                        PRIMARY KEY (module, kind, target)) WITHOUT ROWID;
+CREATE INDEX modules_by_category ON modules (category);
+CREATE INDEX modules_by_maturity ON modules (maturity);
+CREATE INDEX modules_by_complexity ON modules (complexity);
+CREATE INDEX modules_by_cost ON modules (cost_usd);
+CREATE INDEX modules_by_setup ON modules (setup_minutes);
+CREATE INDEX relations_by_target ON relations (kind, target);
+"""
+
+# Registry list fields stored as relations: kind -> getter
+RELATIONS = {
+    "requires": lambda m: (m.get("dependencies") or {}).get("required_modules"),
+    "compatible": lambda m: m.get("compatible_with"),
+    "incompatible": lambda m: m.get("incompatible_with"),
+    "replaces": lambda m: m.get("replaces"),
+}
+
+SORT_COLUMNS = {
+    "name": "m.id",
+    "cost": "m.cost_usd IS NULL, m.cost_usd, m.id",
+    "setup": "m.setup_minutes IS NULL, m.setup_minutes, m.id",
+    "rating": "m.rating IS NULL, m.rating DESC, m.id",
+}
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's contents"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def as_list(value: Any) -> List[str]:
+    """A registry list field as strings, treating null and scalars sensibly"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if v is not None]
+    return [str(value)]
+
+
+def like_literal(text: str) -> str:
+    """Text with the LIKE wildcards escaped, for use with ESCAPE '\\'"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class RegistryIndex:
+    """SQLite index of the module registry, rebuilt when the registry's hash changes"""
+
+    def __init__(self, repo_root: str, registry_path: Optional[str] = None, db_path: Optional[str] = None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.registry_path = os.path.join(self.repo_root, registry_path or DEFAULT_REGISTRY_PATH)
+        self.db_path = db_path or os.path.join(self.repo_root, DEFAULT_DB_PATH)
+        self.rebuilt = False
+        self.checked = False
+
+    def connect(self) -> sqlite3.Connection:
+        """Read-only connection to the current index, building it first if it is missing or stale"""
+        if not self.checked:
+            self.ensure()
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+
+    def indexed_hash(self) -> Optional[str]:
+        """Source hash recorded in the index, or None when there is no usable index"""
+        if not os.path.exists(self.db_path):
+            return None
+        try:
+            db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                meta = dict(db.execute("SELECT key, value FROM meta").fetchall())
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return None
+        if meta.get("version") != str(INDEX_VERSION):
+            return None
+        return meta.get("source_hash")
+
+    def ensure(self, force: bool = False) -> bool:
+        """Rebuild the index when the registry changed since it was built; returns whether it was rebuilt"""
+        source_hash = file_hash(self.registry_path)
+        self.checked = True
+        if not force and self.indexed_hash() == source_hash:
+            return False
+        self.build(source_hash)
+        self.rebuilt = True
+        return True
+
+    def build(self, source_hash: str):
+        """Compile the registry into a new database and rename it over the current one"""
+        registry = load_yaml_file(self.registry_path) or {}
+        modules = registry.get("modules") or []
+        if isinstance(modules, dict):
+            modules = [dict(entry or {}, id=entry_id) for entry_id, entry in modules.items()]
+
+        directory = os.path.dirname(self.db_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".registry-", suffix=".db")
+        os.close(fd)
+        try:
+            db = sqlite3.connect(tmp_path)
+            try:
+                db.executescript(SCHEMA)
+                with db:
+                    self.insert(db, modules)
+                    db.executemany("INSERT INTO meta VALUES (?, ?)", [
+                        ("version", str(INDEX_VERSION)),
+                        ("source_hash", source_hash),
+                        ("source", os.path.relpath(self.registry_path, self.repo_root)),
+                        ("registry_version", str(registry.get("version") or "")),
+                        ("built_at", str(time.time())),
+                    ])
+                db.execute("ANALYZE")
+            finally:
+                db.close()
+            os.replace(tmp_path, self.db_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def insert(db: sqlite3.Connection, modules: List[Dict[str, Any]]):
+        """Rows of every registry entry"""
+        rows, tags, paths, relations = [], set(), set(), set()
+        for module in modules:
+            if not isinstance(module, dict) or not module.get("id"):
+                continue
+            module_id = str(module["id"])
+            cost = module.get("cost") or {}
+            metrics = module.get("metrics") or {}
+            module_tags = [t.lower() for t in as_list(module.get("tags"))]
+            text = " ".join([module_id]
+                            + [str(module.get(k) or "") for k in ("name", "description", "long_description")]
+                            + module_tags + as_list(module.get("use_cases")))
+            rows.append((
+                module_id, str(module.get("name") or module_id), module.get("version"), module.get("maturity"),
+                module.get("complexity"), module.get("category"), module.get("subcategory"), module.get("path"),
+                module.get("description"), cost.get("estimated_monthly_usd"), cost.get("cost_category"),
+                module.get("setup_time_minutes"), metrics.get("rating"), module.get("replaced_by"),
+                text.lower(), json.dumps(module, default=str),
+            ))
+            tags.update((tag, module_id) for tag in module_tags)
+            module_paths = as_list(module.get("path")) + as_list(module.get("alternate_paths"))
+            paths.update((path, module_id) for path in module_paths)
+            for kind, getter in RELATIONS.items():
+                relations.update((module_id, kind, target) for target in as_list(getter(module)))
+        db.executemany(f"INSERT OR REPLACE INTO modules VALUES ({', '.join('?' * 16)})", rows)
+        db.executemany("INSERT INTO tags VALUES (?, ?)", sorted(tags))
+        db.executemany("INSERT INTO paths VALUES (?, ?)", sorted(paths))
+        db.executemany("INSERT INTO relations VALUES (?, ?, ?)", sorted(relations))
+
+    def search(self, text: Optional[str] = None, tags: Optional[List[str]] = None, category: Optional[str] = None,
+               maturity: Optional[List[str]] = None, complexity: Optional[List[str]] = None,
+               min_cost: Optional[float] = None, max_cost: Optional[float] = None,
+               max_setup: Optional[int] = None, sort: str = "name",
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Modules matching every given filter"""
+        where, params = self.filters(text, tags, category, maturity, complexity, min_cost, max_cost, max_setup)
+        query = ("SELECT m.id, m.name, m.version, m.maturity, m.complexity, m.category, m.cost_usd, "
+                 "m.setup_minutes, m.rating, m.description, "
+                 "(SELECT GROUP_CONCAT(tag, ',') FROM (SELECT tag FROM tags t WHERE t.module = m.id ORDER BY tag)) "
+                 f"FROM modules m {where} ORDER BY {SORT_COLUMNS[sort]}")
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        db = self.connect()
+        try:
+            rows = db.execute(query, params).fetchall()
+        finally:
+            db.close()
+        columns = ("id", "name", "version", "maturity", "complexity", "category", "cost_usd", "setup_minutes",
+                   "rating", "description")
+        return [dict(zip(columns, row[:-1]), tags=row[-1].split(",") if row[-1] else []) for row in rows]
+
+    def facets(self, text: Optional[str] = None, tags: Optional[List[str]] = None, category: Optional[str] = None,
+               maturity: Optional[List[str]] = None, complexity: Optional[List[str]] = None,
+               min_cost: Optional[float] = None, max_cost: Optional[float] = None,
+               max_setup: Optional[int] = None) -> Dict[str, List[Tuple[str, int]]]:
+        """Counts per category, maturity, complexity, cost category and tag among the matching modules"""
+        where, params = self.filters(text, tags, category, maturity, complexity, min_cost, max_cost, max_setup)
+        matching = f"SELECT m.id FROM modules m {where}"
+        queries = {
+            column: f"SELECT {column}, COUNT(*) FROM modules WHERE id IN ({matching}) GROUP BY 1 ORDER BY 2 DESC, 1"
+            for column in ("category", "maturity", "complexity", "cost_category")
+        }
+        queries["tag"] = f"SELECT tag, COUNT(*) FROM tags WHERE module IN ({matching}) GROUP BY 1 ORDER BY 2 DESC, 1"
+        db = self.connect()
+        try:
+            return {facet: db.execute(query, params).fetchall() for facet, query in queries.items()}
+        finally:
+            db.close()
+
+    @staticmethod
+    def filters(text: Optional[str], tags: Optional[List[str]], category: Optional[str],
+                maturity: Optional[List[str]], complexity: Optional[List[str]], min_cost: Optional[float],
+                max_cost: Optional[float], max_setup: Optional[int]) -> Tuple[str, List[Any]]:
+        """WHERE clause and parameters for a set of search filters"""
+        clauses = []  # type: List[str]
+        params = []  # type: List[Any]
+        for word in (text or "").lower().split():
+            clauses.append("m.search_text LIKE ? ESCAPE '\\'")
+            params.append(f"%{like_literal(word)}%")
+        for tag in tags or []:
+            clauses.append("m.id IN (SELECT module FROM tags WHERE tag = ?)")
+            params.append(tag.lower())
+        if category:
+            clauses.append("(m.category = ? OR m.category LIKE ? ESCAPE '\\')")
+            params += [category.strip("/"), like_literal(category.strip("/")) + "/%"]
+        for column, values in (("maturity", maturity), ("complexity", complexity)):
+            if values:
+                clauses.append(f"m.{column} IN ({', '.join('?' * len(values))})")
+                params += values
+        for clause, value in (("m.cost_usd >= ?", min_cost), ("m.cost_usd <= ?", max_cost),
+                              ("m.setup_minutes <= ?", max_setup)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def module(self, module_id: str) -> Optional[Dict[str, Any]]:
+        """A registry entry by id or by one of its paths"""
+        db = self.connect()
+        try:
+            row = db.execute("SELECT document FROM modules WHERE id = ? UNION ALL "
+                             "SELECT m.document FROM paths p JOIN modules m ON m.id = p.module "
+                             "WHERE p.path = ? LIMIT 1",
+                             (module_id, module_id)).fetchone()
+        finally:
+            db.close()
+        return json.loads(row[0]) if row else None
+
+    def all_modules(self) -> Dict[str, Dict[str, Any]]:
+        """Every registry entry by id"""
+        db = self.connect()
+        try:
+            return {row[0]: json.loads(row[1]) for row in db.execute("SELECT id, document FROM modules")}
+        finally:
+            db.close()
+
+
+def print_results(results: List[Dict[str, Any]]):
+    """One line per module with its facets"""
+    for module in results:
+        cost = "-" if module["cost_usd"] is None else f"${module['cost_usd']:g}/mo"
+        setup = "-" if module["setup_minutes"] is None else f"{module['setup_minutes']}m"
+        print(f"{module['id']:<28} {module['maturity'] or '-':<8} {module['complexity'] or '-':<12} "
+              f"{cost:>10} {setup:>5}  {module['category'] or '-'}")
+        if module["description"]:
+            print(f"    {module['description']}")
+
+
+def main():
+    """Main entry point for the script"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    common.add_argument("--registry", help="Registry (default: components/terraform/_catalog/module-registry.yaml)")
+    common.add_argument("--db", help="Index database (default: .cache/registry.db)")
+    parser = argparse.ArgumentParser(description="Indexed search of the module registry")
+    subparsers = parser.add_subparsers(dest="action")
+
+    search_parser = subparsers.add_parser("search", parents=[common], help="Faceted module search")
+    search_parser.add_argument("text", nargs="*",
+                               help="Words that must all appear in the id, name, description, tags or use cases")
+    search_parser.add_argument("--tag", action="append", help="Required tag (repeatable)")
+    search_parser.add_argument("--category", help="Category or parent category")
+    search_parser.add_argument("--maturity", action="append", help="Maturity level (repeatable)")
+    search_parser.add_argument("--complexity", action="append", help="Complexity level (repeatable)")
+    search_parser.add_argument("--min-cost", type=float, help="Minimum estimated monthly cost in USD")
+    search_parser.add_argument("--max-cost", type=float, help="Maximum estimated monthly cost in USD")
+    search_parser.add_argument("--max-setup", type=int, help="Maximum setup time in minutes")
+    search_parser.add_argument("--sort", choices=sorted(SORT_COLUMNS), default="name",
+                               help="Result order (default: name)")
+    search_parser.add_argument("--limit", type=int, help="At most N results")
+    search_parser.add_argument("--facets", action="store_true", help="Also print counts per facet of the results")
+    search_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    show_parser = subparsers.add_parser("show", parents=[common], help="A module's registry entry")
+    show_parser.add_argument("module", help="Module id or path")
+    show_parser.add_argument("--json", action="store_true", help="Print the entry as JSON")
+
+    build_parser = subparsers.add_parser("build", parents=[common], help="Rebuild the index if the registry changed")
+    build_parser.add_argument("--force", action="store_true", help="Rebuild even if the registry is unchanged")
+    args = parser.parse_args()
+
+    if not args.action:
+        parser.print_help()
+        sys.exit(1)
+
+    index = RegistryIndex(args.repo_root, args.registry, args.db)
+    if not os.path.exists(index.registry_path):
+        print(f"Error: {index.registry_path} does not exist", file=sys.stderr)
+        sys.exit(1)
+
+    if args.action == "build":
+        start = time.perf_counter()
+        rebuilt = index.ensure(force=args.force)
+        print(f"{'Rebuilt' if rebuilt else 'Up to date:'} {os.path.relpath(index.db_path, index.repo_root)} "
+              f"({time.perf_counter() - start:.3f}s)")
+
+    elif args.action == "show":
+        module = index.module(args.module)
+        if module is None:
+            print(f"Error: no module {args.module} in the registry", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(module, indent=2) if args.json
+              else yaml.safe_dump(module, sort_keys=False, default_flow_style=False).rstrip())
+
+    else:
+        start = time.perf_counter()
+        filters = dict(text=" ".join(args.text), tags=args.tag, category=args.category, maturity=args.maturity,
+                       complexity=args.complexity, min_cost=args.min_cost, max_cost=args.max_cost,
+                       max_setup=args.max_setup)
+        results = index.search(sort=args.sort, limit=args.limit, **filters)
+        facets = index.facets(**filters) if args.facets else None
+        elapsed = time.perf_counter() - start
+        if args.json:
+            print(json.dumps(dict(results=results, facets=facets) if facets else results, indent=2))
+        else:
+            print_results(results)
+            for facet, counts in (facets or {}).items():
+                print(f"\n{facet}: " + ", ".join(f"{value} ({count})" for value, count in counts))
+        print(f"{len(results)} modules ({elapsed * 1000:.1f}ms{', index rebuilt' if index.rebuilt else ''})",
+              file=sys.stderr)
+        sys.exit(0 if results else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Module Registry Dependency Resolver
+
+Evaluates the dependency and compatibility declarations of the module
+registry together:
+
+- dependencies.required_modules: every module needs one module matching each
+  entry. Entries may be globs (vpc-*) and may carry a remark in parentheses.
+- incompatible_with: the two modules can't be in one composition.
+- replaces: a module and the one it replaces shouldn't both be used.
+- compatible_with: a dependency the dependent doesn't declare compatible
+  (and that doesn't declare the dependent) is reported as a warning.
+
+For a requested set of modules the resolver computes the transitive closure
+of their requirements. A requirement that the set doesn't meet yet is filled
+by the best candidate: declared compatible with the dependent, not in
+conflict with the set, then most mature. The result is the proposed
+consistent set, along with the modules it added and any conflicts or
+requirements it couldn't meet.
+
+The compositions in stacks/catalog/templates are checked the same way.
+Their Terraform components are mapped to registry modules by path
+(`path` and `alternate_paths`). A template is consistent when resolving its
+modules adds nothing and finds no conflicts.
+
+Registry entries come from the index of registry_index.py, so the YAML is
+only parsed when it changed. Pattern matches, candidate lists, pairwise
+conflicts and whole resolutions are memoized, so checking every template is
+a single pass that shares these sub-results.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./registry_resolver.py resolve MODULE... [--json]
+    ./registry_resolver.py templates [TEMPLATE...] [--json]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --registry PATH       Registry (default: components/terraform/_catalog/module-registry.yaml)
+    --db PATH             Index database (default: .cache/registry.db)
+
+Exit code: 0 when every set is consistent, 1 on conflicts, unmet
+requirements or templates missing a dependency.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from fnmatch import fnmatchcase
+from itertools import combinations
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+import yaml
+
+from registry_index import RegistryIndex, as_list
+from stack_graph import StackGraph, YAML_LOADER, YAML_EXTENSIONS, extract_components
+
+# Best candidates first
+MATURITY_ORDER = ("mature", "stable", "beta", "alpha", "experimental", "deprecated")
+
+# compatible_with entries meaning every module
+ANY_MODULE = {"all modules", "all", "*"}
+
+REMARK = re.compile(r"\s*\(.*\)\s*$")
+
+Resolution = Dict[str, Any]
+
+
+class RegistryResolver:
+    """Dependency closure and conflict detection over registry modules"""
+
+    def __init__(self, modules: Dict[str, Dict[str, Any]]):
+        self.modules = modules
+        self.ids = sorted(modules)
+        self.by_path = {}  # type: Dict[str, str]
+        for module_id in self.ids:
+            module = modules[module_id]
+            for path in as_list(module.get("path")) + as_list(module.get("alternate_paths")):
+                self.by_path.setdefault(path.strip("/"), module_id)
+
+        self._matches = {}  # type: Dict[str, Tuple[str, ...]]
+        self._declares = {}  # type: Dict[Tuple[str, str, str], bool]
+        self._conflicts = {}  # type: Dict[Tuple[str, str], Optional[str]]
+        self._candidates = {}  # type: Dict[Tuple[str, str], Tuple[str, ...]]
+        self._resolutions = {}  # type: Dict[frozenset, Resolution]
+
+    @classmethod
+    def for_repo(cls, repo_root: str, registry_path: Optional[str] = None,
+                 db_path: Optional[str] = None) -> "RegistryResolver":
+        """Resolver over the registry index of a repository"""
+        return cls(RegistryIndex(repo_root, registry_path, db_path).all_modules())
+
+    # -- Declarations ------------------------------------------------------
+
+    @staticmethod
+    def pattern(entry: str) -> str:
+        """A declaration entry without its remark, e.g. 's3-bucket (source)' -> 's3-bucket'"""
+        return REMARK.sub("", entry).strip().lower()
+
+    def matches(self, entry: str) -> Tuple[str, ...]:
+        """Registry modules matching a declaration entry, memoized"""
+        pattern = self.pattern(entry)
+        if pattern not in self._matches:
+            if pattern in ANY_MODULE:
+                self._matches[pattern] = tuple(self.ids)
+            else:
+                self._matches[pattern] = tuple(m for m in self.ids if fnmatchcase(m, pattern))
+        return self._matches[pattern]
+
+    def requirements(self, module_id: str) -> List[str]:
+        """Required module entries of a module"""
+        return as_list((self.modules[module_id].get("dependencies") or {}).get("required_modules"))
+
+    def declares(self, module_id: str, field: str, other: str) -> bool:
+        """Whether a module's `field` list has an entry matching `other`, memoized"""
+        key = (module_id, field, other)
+        if key not in self._declares:
+            self._declares[key] = any(other in self.matches(entry)
+                                      for entry in as_list(self.modules[module_id].get(field)))
+        return self._declares[key]
+
+    def conflict(self, a: str, b: str) -> Optional[str]:
+        """Why two modules can't be combined, or None, memoized per pair"""
+        key = (a, b) if a < b else (b, a)
+        if key not in self._conflicts:
+            reason = None
+            for x, y in (key, key[::-1]):
+                if self.declares(x, "incompatible_with", y):
+                    reason = f"{x} is incompatible with {y}"
+                elif self.declares(x, "replaces", y) or self.modules[y].get("replaced_by") == x:
+                    reason = f"{x} replaces {y}"
+                if reason:
+                    break
+            self._conflicts[key] = reason
+        return self._conflicts[key]
+
+    def compatible(self, dependent: str, dependency: str) -> bool:
+        """Whether either module declares the other compatible, or the dependent declares nothing"""
+        declared = as_list(self.modules[dependent].get("compatible_with"))
+        return (not declared or self.declares(dependent, "compatible_with", dependency)
+                or self.declares(dependency, "compatible_with", dependent))
+
+    def candidates(self, entry: str, dependent: str) -> Tuple[str, ...]:
+        """Modules that could meet a requirement of `dependent`, best first, memoized"""
+        key = (self.pattern(entry), dependent)
+        if key not in self._candidates:
+            def rank(module_id: str) -> Tuple[int, int, int, str]:
+                module = self.modules[module_id]
+                maturity = module.get("maturity")
+                return (
+                    0 if self.declares(dependent, "compatible_with", module_id) else 1,
+                    1 if module.get("replaced_by") else 0,
+                    MATURITY_ORDER.index(maturity) if maturity in MATURITY_ORDER else len(MATURITY_ORDER),
+                    module_id,
+                )
+            self._candidates[key] = tuple(sorted((m for m in self.matches(entry) if m != dependent), key=rank))
+        return self._candidates[key]
+
+    # -- Resolution --------------------------------------------------------
+
+    def resolve(self, requested: Iterable[str]) -> Resolution:
+        """Transitive closure of a module set with the modules it adds, conflicts and warnings, memoized per set"""
+        key = frozenset(requested)
+        if key in self._resolutions:
+            return self._resolutions[key]
+
+        unknown = sorted(m for m in key if m not in self.modules)
+        selected = sorted(m for m in key if m in self.modules)
+        added = {}  # type: Dict[str, str]
+        unresolved = [f"{m} is not in the registry" for m in unknown]
+        warnings = []  # type: List[str]
+
+        queue = list(selected)
+        while queue:
+            module_id = queue.pop(0)
+            for entry in self.requirements(module_id):
+                matching = self.matches(entry)
+                present = [m for m in selected if m in matching and m != module_id]
+                if present:
+                    dependency = present[0]
+                else:
+                    if not matching:
+                        unresolved.append(f"{module_id} requires {entry}, which matches no registry module")
+                        continue
+                    options = [c for c in self.candidates(entry, module_id)
+                               if not any(self.conflict(c, m) for m in selected)]
+                    if not options:
+                        unresolved.append(f"{module_id} requires {entry}, but every match conflicts with the set")
+                        continue
+                    dependency = options[0]
+                    added[dependency] = f"required by {module_id} ({entry})"
+                    selected.append(dependency)
+                    queue.append(dependency)
+                if not self.compatible(module_id, dependency):
+                    warnings.append(f"{module_id} depends on {dependency}, which it doesn't declare compatible")
+
+        conflicts = [reason for a, b in combinations(sorted(selected), 2) for reason in [self.conflict(a, b)] if reason]
+        # A replaced module is dropped from the proposal in favour of its replacement
+        replaced = {b for a in selected for b in selected if a != b and self.conflict(a, b) == f"{a} replaces {b}"}
+        resolution = {
+            "requested": sorted(key),
+            "modules": sorted(set(selected) - replaced),
+            "added": dict(sorted(added.items())),
+            "dropped": sorted(replaced),
+            "conflicts": conflicts,
+            "unresolved": unresolved,
+            "warnings": sorted(set(warnings)),
+        }
+        resolution["consistent"] = not (conflicts or unresolved)
+        self._resolutions[key] = resolution
+        return resolution
+
+    # -- Templates ---------------------------------------------------------
+
+    def module_for_component(self, component: str) -> Optional[str]:
+        """Registry module of a Terraform component, by module path"""
+        return self.by_path.get(component.strip("/"))
+
+    def check_template(self, path: str) -> Dict[str, Any]:
+        """Registry modules of a template's components and the resolution of that set"""
+        result = {"template": path, "components": {}, "unregistered": [], "error": None}  # type: Dict[str, Any]
+        try:
+            with open(path, "r") as f:
+                documents = [d for d in yaml.load_all(f, Loader=YAML_LOADER) if isinstance(d, dict)]
+        except (yaml.YAMLError, OSError) as e:
+            result["error"] = str(e)
+            return result
+        for document in documents:
+            for name, component in sorted(extract_components(document).get("terraform", {}).items()):
+                if component["abstract"]:
+                    continue
+                module_id = self.module_for_component(component["component"])
+                if module_id:
+                    result["components"][name] = module_id
+                else:
+                    result["unregistered"].append(f"{name} ({component['component']})")
+        resolution = self.resolve(result["components"].values())
+        result.update(resolution=resolution, consistent=resolution["consistent"] and not resolution["added"])
+        return result
+
+
+def template_paths(repo_root: str, names: List[str]) -> List[str]:
+    """Template files to check: the given names or paths, or every template under catalog/templates"""
+    templates_dir = os.path.join(StackGraph.from_atmos_config(repo_root).stacks_path, "catalog", "templates")
+    if not names:
+        return sorted(os.path.join(templates_dir, f) for f in os.listdir(templates_dir)
+                      if f.endswith(YAML_EXTENSIONS))
+    paths = []
+    for name in names:
+        if os.path.exists(name):
+            paths.append(os.path.abspath(name))
+        else:
+            paths.append(os.path.join(templates_dir, name if name.endswith(YAML_EXTENSIONS) else name + ".yaml"))
+    return paths
+
+
+def print_resolution(resolution: Resolution, indent: str = "  "):
+    """Added, dropped, conflicting and unmet modules of a resolution"""
+    for module_id, reason in resolution["added"].items():
+        print(f"{indent}+ {module_id}: {reason}")
+    for module_id in resolution["dropped"]:
+        print(f"{indent}- {module_id}: replaced in the proposed set")
+    for conflict in resolution["conflicts"]:
+        print(f"{indent}❌ conflict: {conflict}")
+    for unmet in resolution["unresolved"]:
+        print(f"{indent}❌ {unmet}")
+    for warning in resolution["warnings"]:
+        print(f"{indent}⚠️  {warning}")
+
+
+def main():
+    """Main entry point for the script"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    common.add_argument("--registry", help="Registry (default: components/terraform/_catalog/module-registry.yaml)")
+    common.add_argument("--db", help="Index database (default: .cache/registry.db)")
+    common.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser = argparse.ArgumentParser(description="Resolve module registry dependencies and check compositions")
+    subparsers = parser.add_subparsers(dest="action")
+    resolve_parser = subparsers.add_parser("resolve", parents=[common], help="Consistent set for the given modules")
+    resolve_parser.add_argument("modules", nargs="+", help="Registry module ids")
+    templates_parser = subparsers.add_parser("templates", parents=[common], help="Check catalog template compositions")
+    templates_parser.add_argument("templates", nargs="*", help="Template names or files (default: every template)")
+    args = parser.parse_args()
+
+    if not args.action:
+        parser.print_help()
+        sys.exit(1)
+
+    start = time.perf_counter()
+    resolver = RegistryResolver.for_repo(args.repo_root, args.registry, args.db)
+
+    if args.action == "resolve":
+        resolution = resolver.resolve(args.modules)
+        if args.json:
+            print(json.dumps(resolution, indent=2))
+        else:
+            print(f"{'✅' if resolution['consistent'] else '❌'} {', '.join(resolution['modules'])}")
+            print_resolution(resolution)
+        sys.exit(0 if resolution["consistent"] else 1)
+
+    results = [resolver.check_template(path) for path in template_paths(args.repo_root, args.templates)]
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            name = os.path.relpath(result["template"], os.path.abspath(args.repo_root))
+            if result["error"]:
+                print(f"❌ {name}: invalid YAML: {result['error']}")
+                continue
+            components = sorted(set(result["components"].values()))
+            print(f"{'✅' if result['consistent'] else '❌'} {name}: {', '.join(components)}")
+            print_resolution(result["resolution"])
+            if result["unregistered"]:
+                print(f"  not in the registry: {', '.join(result['unregistered'])}")
+    failed = [r for r in results if r["error"] or not r["consistent"]]
+    print(f"{len(results) - len(failed)} of {len(results)} templates consistent ({elapsed * 1000:.0f}ms)",
+          file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
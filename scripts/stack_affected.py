@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Atmos Affected Components
+
+Works out which stack/component pairs a change actually affects, so CI
+plans those and nothing else. Every deployed component instance of every
+stack gets a fingerprint made of:
+
+- its resolved configuration (vars, settings, env, backend, metadata), which
+  is where every transitive stack import, mixin and inherited catalog base
+  ends up; a manifest edit that doesn't change the result affects nothing
+- its backend configuration with the atmos.yaml defaults merged in, and the
+  components.terraform section of atmos.yaml, so a backend pattern or
+  Terraform setting changed there affects every instance it applies to
+- the source of its Terraform component directory (examples and tests
+  excluded)
+- the source of every local module it calls, transitively, which covers
+  shared modules such as those under components/terraform/_library
+
+The fingerprints of the working tree are compared with those of the merge
+base of --base and HEAD, extracted with `git archive`. Component instances
+whose fingerprint changed or that are new are affected; instances that no
+longer exist are listed as removed.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+    - git
+
+Usage:
+    ./stack_affected.py --base origin/main [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --base REV            Compare with the merge base of REV and HEAD (default: origin/main)
+    -f, --format FORMAT   text (default), json, atlantis (repo config with one project per
+                          affected component) or args (one line per stack: <stack> -c <component>...,
+                          for stack_executor.py)
+    -o, --output FILE     Write to FILE instead of stdout
+
+Exit code: 0, also when nothing is affected; 1 on errors.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import tarfile
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Any, Optional, Tuple
+
+import yaml
+
+from provider_cache import read_module
+from stack_dag import stack_name
+from stack_graph import StackGraph, git_changed_files, hash_tree
+from stack_resolver import StackResolver
+
+FORMATS = ("text", "json", "atlantis", "args")
+
+# Component subdirectories Terraform never loads unless a module calls them
+NON_SOURCE_DIRS = ("examples", "test", "tests")
+
+InstanceKey = Tuple[str, str]
+
+
+class TreeFingerprints:
+    """Fingerprints of every deployed component instance in one checkout"""
+
+    def __init__(self, repo_root: str, resolver: Optional[StackResolver] = None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.resolver = resolver or StackResolver(StackGraph.from_atmos_config(self.repo_root).load())
+        self.components_path = os.path.join(self.repo_root, self.resolver.graph.components_base_path)
+        self._sources = {}  # type: Dict[str, Tuple[str, List[str]]]
+        terraform_settings = self.resolver.component_defaults.get("terraform") or {}
+        self.settings = json.dumps(terraform_settings, sort_keys=True, default=str)
+
+    def module_source(self, module_dir: str) -> Tuple[str, List[str]]:
+        """Hash of a module and the local modules it calls, with those modules' repo-relative paths"""
+        module_dir = os.path.normpath(module_dir)
+        if module_dir not in self._sources:
+            self._sources[module_dir] = ("missing", [])  # guards against module cycles
+            if os.path.isdir(module_dir):
+                digest = hashlib.sha256(hash_tree(module_dir, NON_SOURCE_DIRS).encode())
+                modules = set()
+                for source in read_module(module_dir)[1]:
+                    child = os.path.normpath(os.path.join(module_dir, source))
+                    child_hash, child_modules = self.module_source(child)
+                    digest.update(os.path.relpath(child, self.repo_root).encode() + child_hash.encode())
+                    modules.update(child_modules)
+                    modules.add(os.path.relpath(child, self.repo_root))
+                self._sources[module_dir] = (digest.hexdigest(), sorted(modules))
+        return self._sources[module_dir]
+
+    def collect(self) -> Dict[InstanceKey, Dict[str, Any]]:
+        """Fingerprint of every deployed component instance, keyed by (stack name, component)"""
+        instances = {}  # type: Dict[InstanceKey, Dict[str, Any]]
+        for stack in self.resolver.graph.stacks:
+            resolved = self.resolver.resolve_stack(stack)
+            name = stack_name(resolved) or stack
+            for component, config in sorted(resolved["components"].get("terraform", {}).items()):
+                source, modules = self.module_source(os.path.join(self.components_path, config["component"]))
+                backend = self.resolver.backend_config(stack, component)
+                fingerprint = json.dumps([config, backend], sort_keys=True, default=str) + self.settings
+                instances[(name, component)] = {
+                    "stack": name,
+                    "manifest": stack,
+                    "component": component,
+                    "terraform_component": config["component"],
+                    "account": (config.get("vars") or {}).get("account"),
+                    "config": hashlib.sha256(fingerprint.encode()).hexdigest(),
+                    "source": source,
+                    "modules": modules,
+                }
+        return instances
+
+
+class AffectedEngine:
+    """Diff of component fingerprints between a base revision and the working tree"""
+
+    def __init__(self, repo_root: str, base: str = "origin/main"):
+        self.repo_root = os.path.abspath(repo_root)
+        self.base = base
+        self.revision: Optional[str] = None
+        self.changed_files = []  # type: List[str]
+        self.affected = []  # type: List[Dict[str, Any]]
+        self.removed = []  # type: List[Dict[str, Any]]
+        self.total = 0
+        self.stacks_base_path = "stacks"
+        self.components_base_path = "components/terraform"
+
+    def git(self, *args: str) -> str:
+        """Run a git command in the repository and return its output"""
+        return subprocess.run(
+            ["git", "-C", self.repo_root] + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+        ).stdout
+
+    def extract_base(self, destination: str, paths: List[str]):
+        """Write the files under `paths` at the base revision to `destination`"""
+        existing = [p for p in paths if self.git("ls-tree", "--name-only", self.revision, "--", p).strip()]
+        if not existing:
+            return
+        archive = subprocess.Popen(["git", "-C", self.repo_root, "archive", self.revision, "--"] + existing,
+                                   stdout=subprocess.PIPE)
+        with tarfile.open(fileobj=archive.stdout, mode="r|") as tar:
+            tar.extractall(destination)
+        if archive.wait() != 0:
+            raise RuntimeError(f"git archive {self.revision} failed")
+
+    def run(self) -> "AffectedEngine":
+        """Compute the affected and removed component instances"""
+        self.revision = self.git("merge-base", self.base, "HEAD").strip()
+        self.changed_files = git_changed_files(self.repo_root, self.base)
+
+        head = TreeFingerprints(self.repo_root)
+        graph = head.resolver.graph
+        self.stacks_base_path, self.components_base_path = graph.base_path, graph.components_base_path
+        inputs = ["atmos.yaml", graph.base_path, graph.components_base_path]
+        head_instances = head.collect()
+        self.total = len(head_instances)
+        relevant = [p for p in self.changed_files if any(p == i or p.startswith(i + "/") for i in inputs)]
+        if not relevant:
+            return self
+
+        with tempfile.TemporaryDirectory(prefix="atmos-affected-") as base_root:
+            self.extract_base(base_root, inputs)
+            base_instances = TreeFingerprints(base_root).collect()
+
+        for key, instance in sorted(head_instances.items()):
+            previous = base_instances.get(key)
+            if previous is None:
+                reasons = ["added"]
+            else:
+                reasons = [part for part in ("config", "source") if instance[part] != previous[part]]
+            if reasons:
+                self.affected.append(dict(instance, reasons=reasons))
+        self.removed = [base_instances[key] for key in sorted(set(base_instances) - set(head_instances))]
+        return self
+
+    def report(self) -> Dict[str, Any]:
+        """Machine-readable result"""
+        fields = ("stack", "manifest", "component", "terraform_component")
+        return {
+            "base": self.base,
+            "revision": self.revision,
+            "changed_files": self.changed_files,
+            "total": self.total,
+            "affected": [
+                dict({f: a[f] for f in fields}, reasons=a["reasons"], modules=a["modules"]) for a in self.affected
+            ],
+            "removed": [{f: r[f] for f in fields} for r in self.removed],
+        }
+
+    def atlantis_config(self) -> Dict[str, Any]:
+        """Atlantis repo config with one project per affected component instance.
+
+        Project names are <stack>/<component>; the atmos workflows split them
+        back into STACK and COMPONENT. Production accounts use the production
+        workflow. Instances that share a component directory (vpc/main and
+        vpc/services) share its .terraform, so each repeat of a directory goes
+        into the next execution_order_group and never runs alongside another.
+        """
+        projects = []
+        seen = {}  # type: Dict[str, int]
+        for instance in self.affected:
+            directory = f"{self.components_base_path}/{instance['terraform_component']}"
+            to_root = os.path.relpath(".", directory)
+            seen[directory] = seen.get(directory, -1) + 1
+            projects.append({
+                "name": f"{instance['stack']}/{instance['component']}",
+                "dir": directory,
+                "execution_order_group": seen[directory],
+                "workflow": "production" if instance["account"] == "prod" else "atmos",
+                "autoplan": {
+                    "enabled": True,
+                    "when_modified": ["**/*"] + [f"{to_root}/{m}/**/*" for m in instance["modules"]] + [
+                        f"{to_root}/{self.stacks_base_path}/**/*.yaml", f"{to_root}/atmos.yaml",
+                    ],
+                },
+            })
+        return {"version": 3, "automerge": True, "parallel_plan": True, "parallel_apply": True, "projects": projects}
+
+    def executor_args(self) -> List[str]:
+        """One `<stack> -c <component>...` line per stack for stack_executor.py"""
+        by_stack = {}  # type: Dict[str, List[str]]
+        for instance in self.affected:
+            by_stack.setdefault(instance["stack"], []).append(instance["component"])
+        return [" ".join([stack] + [f"-c {c}" for c in components]) for stack, components in sorted(by_stack.items())]
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="List the stack/component pairs affected by a change")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("--base", default="origin/main",
+                        help="Compare with the merge base of REV and HEAD (default: origin/main)")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="text", help="Output format (default: text)")
+    parser.add_argument("-o", "--output", metavar="FILE", help="Write to FILE instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        engine = AffectedEngine(args.repo_root, args.base).run()
+    except (subprocess.CalledProcessError, RuntimeError) as e:
+        detail = e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) and e.stderr else str(e)
+        print(f"Error: could not compare with {args.base}: {detail}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.format == "json":
+        output = json.dumps(engine.report(), indent=2) + "\n"
+    elif args.format == "atlantis":
+        output = yaml.safe_dump(engine.atlantis_config(), sort_keys=False, default_flow_style=False)
+    elif args.format == "args":
+        output = "".join(line + "\n" for line in engine.executor_args())
+    else:
+        lines = [f"{len(engine.affected)} of {engine.total} components affected by "
+                 f"{len(engine.changed_files)} changed files since {args.base} ({(engine.revision or '')[:12]})"]
+        for instance in engine.affected:
+            lines.append(f"  {instance['stack']}:{instance['component']}  ({', '.join(instance['reasons'])})")
+        for instance in engine.removed:
+            lines.append(f"  {instance['stack']}:{instance['component']}  (removed)")
+        output = "\n".join(lines) + "\n"
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+    main()
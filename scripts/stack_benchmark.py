@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Stack Tooling Benchmarks
+
+Times every phase of the stack tooling on synthetic estates from
+estate_generator.py and tracks its peak memory:
+
+    graph-build        import graph from scratch (stack_graph.py)
+    graph-load         import graph from the serialized index
+    resolve            every stack resolved natively (stack_resolver.py)
+    dag                dependency graph and waves of every stack (stack_dag.py)
+    validate:<phase>   each phase of validate_atmos.py except the atmos CLI
+    fingerprints       affected-component fingerprints (stack_affected.py)
+    catalog-tenant     tenant check of every catalog file (catalog_rewrite.py)
+
+Each preset is generated once in a temporary directory. Times are the median
+of --repeat runs after an untimed warm-up run; peak memory is measured with tracemalloc in a separate run,
+so it doesn't slow the timed ones, and is the most a phase allocated on top
+of what was live when it started.
+
+Results are compared with scripts/benchmark-baselines.json. Before each
+preset a fixed pure-Python workload is timed, and baseline times are scaled
+by how much slower or faster it ran than when the baseline was recorded, so
+a slower machine or a busy one isn't taken for a regression. A phase
+regresses when it is more than --tolerance slower (and at least 100ms, so
+the run-to-run jitter of phases that take a tenth of a second or less never
+counts) or uses more than --tolerance more memory (and at least 1MB).
+Memory doesn't depend on the machine; times still do beyond what the
+calibration captures, so record baselines with --save-baseline on the
+machine that checks them where that's possible.
+
+Requirements:
+    - Python 3.6+ (per-phase peaks need 3.9+; earlier versions report the peak of the run so far)
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./stack_benchmark.py [options]
+
+Options:
+    -r, --repo-root PATH  Repository providing the templates (default: current directory)
+    --preset NAME         small, medium, large or xlarge (repeatable; default: small and medium)
+    --repeat N            Timed runs per preset (default: 5)
+    --baseline FILE       Baselines (default: scripts/benchmark-baselines.json)
+    --save-baseline       Store these results as the baselines of the presets that were run
+    --check               Exit 1 when a phase regressed against its baseline
+    --json FILE           Write the results as JSON
+    --keep DIR            Generate estates under DIR and keep them
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from statistics import median
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from catalog_rewrite import CatalogRewriter
+from estate_generator import generate_estate
+from network_index import NetworkIndex
+from name_index import NameIndex
+from stack_affected import TreeFingerprints
+from stack_dag import ComponentDAG
+from stack_graph import StackGraph, load_yaml_file
+from stack_resolver import StackResolver
+from validate_atmos import AtmosValidator
+
+# tenants, accounts per tenant, regions per account, environments per region
+PRESETS = {
+    "small": (1, 3, 1, 1),
+    "medium": (2, 3, 2, 4),
+    "large": (4, 6, 3, 8),
+    "xlarge": (10, 6, 4, 10),
+}
+DEFAULT_PRESETS = ("small", "medium")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark-baselines.json")
+
+# Validator phases in run order, without the atmos CLI phase
+VALIDATOR_PHASES = (
+    ("catalog-yaml", "validate_catalog_yaml"),
+    ("catalog-structure", "validate_catalog_structure"),
+    ("environments", "validate_environments"),
+    ("placeholders", "validate_placeholders"),
+    ("schema", "validate_schema"),
+    ("resolution", "validate_resolved_stacks"),
+    ("network", "validate_network"),
+    ("names", "validate_names"),
+    ("dependencies", "validate_dependencies"),
+    ("dependency-graph", "validate_dependency_graph"),
+)
+
+# Timed runs per preset
+DEFAULT_REPEAT = 5
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.1
+MIN_PEAK_MB = 1.0
+
+Phase = Tuple[str, Callable[[Dict[str, Any]], None]]
+
+
+def graph_build(ctx: Dict[str, Any]):
+    ctx["graph"] = StackGraph.from_atmos_config(ctx["root"]).load(rebuild=True)
+
+
+def graph_load(ctx: Dict[str, Any]):
+    ctx["graph"] = StackGraph.from_atmos_config(ctx["root"]).load()
+
+
+def resolve(ctx: Dict[str, Any]):
+    ctx["resolver"] = StackResolver(ctx["graph"])
+    ctx["resolver"].resolve_all()
+
+
+def dag(ctx: Dict[str, Any]):
+    for stack in ctx["graph"].stacks:
+        ComponentDAG.for_stack(ctx["resolver"], stack).waves()
+
+
+def validator_phase(phase: str, method: str) -> Callable[[Dict[str, Any]], None]:
+    def run(ctx: Dict[str, Any]):
+        if "validator" not in ctx:
+            ctx["validator"] = AtmosValidator(ctx["root"])
+        cache_path = {"schema": ctx["validator"].schema.cache_path,
+                      "network": NetworkIndex(ctx["root"]).cache_path,
+                      "names": NameIndex(ctx["root"]).cache_path}.get(phase)
+        if cache_path and os.path.exists(cache_path):
+            os.remove(cache_path)  # time a full check, not cache hits
+        ctx["validator"].run_phase(phase, getattr(ctx["validator"], method))
+    return run
+
+
+def fingerprints(ctx: Dict[str, Any]):
+    TreeFingerprints(ctx["root"]).collect()
+
+
+def catalog_tenant(ctx: Dict[str, Any]):
+    CatalogRewriter(ctx["root"], jobs=1).run()
+
+
+PHASES = [
+    ("graph-build", graph_build),
+    ("graph-load", graph_load),
+    ("resolve", resolve),
+    ("dag", dag),
+] + [(f"validate:{name}", validator_phase(name, method)) for name, method in VALIDATOR_PHASES] + [
+    ("fingerprints", fingerprints),
+    ("catalog-tenant", catalog_tenant),
+]  # type: List[Phase]
+
+
+def run_timed(root: str) -> Dict[str, float]:
+    """Seconds per phase for one run"""
+    ctx = {"root": root}  # type: Dict[str, Any]
+    timings = {}
+    for name, phase in PHASES:
+        start = time.perf_counter()
+        phase(ctx)
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def run_traced(root: str) -> Dict[str, float]:
+    """Peak MB allocated by each phase above what was live when it started"""
+    ctx = {"root": root}  # type: Dict[str, Any]
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for name, phase in PHASES:
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            live = tracemalloc.get_traced_memory()[0]
+            phase(ctx)
+            peaks[name] = (tracemalloc.get_traced_memory()[1] - live) / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Median time of a fixed workload shaped like the tooling's: dict merging, sorting and JSON"""
+    def workload():
+        merged = {}  # type: Dict[str, Any]
+        for i in range(9000):
+            merged = dict(merged, **{f"key-{i % 500}": {"vars": {"n": i, "name": f"stack-{i}"}}})
+            json.loads(json.dumps(merged["key-0"], sort_keys=True))
+        sorted(merged, key=lambda k: merged[k]["vars"]["name"])
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+
+def speed_ratio(result: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> float:
+    """How much slower this run's machine was than the baseline's, from the calibration workload"""
+    now, then = result.get("calibration_seconds"), (baseline or {}).get("calibration_seconds")
+    return now / then if now and then else 1.0
+
+
+def benchmark(repo_root: str, preset: str, repeat: int, workdir: str) -> Dict[str, Any]:
+    """Generate a preset's estate and measure every phase on it"""
+    root = os.path.join(workdir, preset)
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    estate = generate_estate(repo_root, root, *PRESETS[preset])
+
+    calibration = calibrate()
+    run_timed(root)  # warm-up: the first run pays for cold OS and tooling caches
+    runs = [run_timed(root) for _ in range(max(1, repeat))]
+    peaks = run_traced(root)
+    phases = {
+        name: {"seconds": round(median(run[name] for run in runs), 4), "peak_mb": round(peaks[name], 2)}
+        for name, _ in PHASES
+    }
+    return {
+        "estate": estate,
+        "calibration_seconds": round(calibration, 4),
+        "total_seconds": round(sum(p["seconds"] for p in phases.values()), 4),
+        "peak_mb": round(max(p["peak_mb"] for p in phases.values()), 2),
+        "phases": phases,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Optional[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Regressions of a preset's phases against its baseline"""
+    regressions = []
+    ratio = speed_ratio(result, baseline)
+    for name, current in result["phases"].items():
+        previous = ((baseline or {}).get("phases") or {}).get(name)
+        if not previous:
+            continue
+        for metric, floor, unit in (("seconds", MIN_SECONDS, "s"), ("peak_mb", MIN_PEAK_MB, "MB")):
+            before, after = previous[metric] * (ratio if metric == "seconds" else 1), current[metric]
+            if after > before * (1 + tolerance) and after - before >= floor:
+                regressions.append(f"{name}: {metric} {before:.3f}{unit} -> {after:.3f}{unit} "
+                                   f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def print_result(preset: str, result: Dict[str, Any], baseline: Optional[Dict[str, Any]]):
+    """Table of a preset's phases with the change against its baseline"""
+    estate = result["estate"]
+    print(f"\n{preset}: {estate['stacks']} stacks ({estate['tenants']} tenants x {estate['accounts']} accounts x "
+          f"{estate['regions']} regions x {estate['environments']} environments, "
+          f"{estate['generated_manifests']} generated manifests)")
+    print(f"  {'phase':<28} {'seconds':>9} {'vs base':>9} {'peak MB':>9} {'vs base':>9}")
+    base_phases = (baseline or {}).get("phases") or {}
+    ratio = speed_ratio(result, baseline)
+    for name, current in result["phases"].items():
+        previous = base_phases.get(name)
+
+        def change(metric: str) -> str:
+            if not previous or not previous[metric]:
+                return "-"
+            before = previous[metric] * (ratio if metric == "seconds" else 1)
+            return f"{(current[metric] / before - 1) * 100:+.0f}%"
+
+        print(f"  {name:<28} {current['seconds']:>9.3f} {change('seconds'):>9} "
+              f"{current['peak_mb']:>9.2f} {change('peak_mb'):>9}")
+    print(f"  {'total':<28} {result['total_seconds']:>9.3f}")
+    if ratio != 1.0:
+        print(f"  (baseline times scaled by {ratio:.2f} for this machine's calibration run)")
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Benchmark the stack tooling on synthetic estates")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Repository providing the templates (default: current directory)")
+    parser.add_argument("--preset", action="append", choices=sorted(PRESETS),
+                        help="Estate size (repeatable; default: small and medium)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Timed runs per preset (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Baselines (default: scripts/benchmark-baselines.json)")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown or memory growth (default: 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baselines")
+    parser.add_argument("--check", action="store_true", help="Exit 1 when a phase regressed against its baseline")
+    parser.add_argument("--json", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--keep", metavar="DIR", help="Generate estates under DIR and keep them")
+    args = parser.parse_args()
+
+    baselines = {}  # type: Dict[str, Any]
+    if os.path.exists(args.baseline):
+        baselines = (load_yaml_file(args.baseline) or {}).get("presets") or {}
+
+    results, regressions = {}, {}
+    workdir = args.keep or tempfile.mkdtemp(prefix="atmos-estates-")
+    try:
+        for preset in args.preset or DEFAULT_PRESETS:
+            results[preset] = benchmark(args.repo_root, preset, args.repeat, workdir)
+            print_result(preset, results[preset], baselines.get(preset))
+            regressions[preset] = compare(results[preset], baselines.get(preset), args.tolerance)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "presets": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(dict(report, regressions=regressions), f, indent=2)
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(dict(report, presets=dict(sorted(baselines.items()))), f, indent=2)
+            f.write("\n")
+        print(f"\nSaved baselines of {', '.join(results)} to {args.baseline}")
+
+    failed = {preset: found for preset, found in regressions.items() if found}
+    if failed:
+        print(f"\nRegressions (tolerance {args.tolerance:.0%}):")
+        for preset, found in failed.items():
+            for regression in found:
+                print(f"  {preset} {regression}")
+    sys.exit(1 if failed and args.check else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Fleet-wide Cost Rollup
+
+Estimates the monthly cost of every stack from the module registry
+(components/terraform/_catalog/module-registry.yaml) and rolls it up per
+stack, tenant, account, region, environment, component or module.
+
+Every deployed Terraform component of a resolved stack is mapped to its
+registry module by path (`path` and `alternate_paths`, e.g. components/
+terraform/vpc -> vpc-standard) and priced at the module's
+cost.estimated_monthly_usd. Components whose `vars.enabled` is false cost
+nothing; components without a registry entry are reported as unpriced.
+
+NAT gateways are priced per gateway. For components that configure NAT
+(nat_gateway_strategy, enable_nat_gateway or single_nat_gateway in their
+vars) the NAT part of the module's cost_breakdown is replaced by a unit price
+times the number of gateways the component actually creates: none when
+enable_nat_gateway is false, one for the `single` strategy, one per
+availability zone otherwise. A `nat_gateways` breakdown is taken to cover
+three availability zones, a `nat_gateway` breakdown a single gateway.
+
+What-if scenarios are evaluated over the same data:
+
+- --disable: turn the named components off, as their
+  catalog/<component>/disabled.yaml variant would
+- --nat-mode: switch every NAT-configuring component to `single` or
+  `one_per_az`
+
+Only the per-component facts depend on the stacks. They are cached in
+.cache/stack-costs.json per stack, keyed by the mtime and size of every
+manifest the stack is made of, so a rerun only resolves stacks whose
+manifests changed. Prices are joined from the registry index on every run
+and held in columnar arrays (one entry per stack component), so rollups and
+scenarios over thousands of stacks are a few linear passes.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./stack_costs.py [options]
+
+Options:
+    -r, --repo-root PATH     Path to repository root (default: current directory)
+    --by DIMENSION           Roll up per stack, tenant, account, region, environment,
+                             component or module (default: stack)
+    --disable COMPONENT...   Scenario: disable these components
+    --nat-mode MODE          Scenario: NAT gateways per VPC, single or one_per_az
+    --json                   Print the rollup as JSON
+    --no-cache               Resolve every stack, ignoring and not updating the cache
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from array import array
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from registry_index import RegistryIndex
+from registry_resolver import RegistryResolver
+from stack_graph import StackGraph, write_json_atomic
+from stack_resolver import StackResolver, fill_placeholders, is_false
+
+CACHE_VERSION = 1
+
+STACK_DIMENSIONS = ("stack", "tenant", "account", "region", "environment")
+COMPONENT_DIMENSIONS = ("component", "module")
+DIMENSIONS = STACK_DIMENSIONS + COMPONENT_DIMENSIONS
+
+NAT_MODES = ("single", "one_per_az")
+
+# Availability zones a `nat_gateways` cost breakdown is quoted for
+BREAKDOWN_NAT_AZS = 3
+
+# Vars that mark a component as managing NAT gateways
+NAT_VARS = ("nat_gateway_strategy", "enable_nat_gateway", "single_nat_gateway")
+
+# Cached facts of one component: name, Terraform component, enabled,
+# NAT gateways (-1 when the component doesn't manage NAT), availability zones
+Row = Tuple[str, str, bool, int, int]
+
+
+def component_row(name: str, config: Dict[str, Any]) -> Row:
+    """Cost-relevant facts of one resolved component"""
+    component_vars = config.get("vars") or {}
+    enabled = not is_false(fill_placeholders(component_vars.get("enabled"), component_vars))
+    zones = component_vars.get("azs") or component_vars.get("availability_zones")
+    az_count = len(zones) if isinstance(zones, list) and zones else BREAKDOWN_NAT_AZS
+    if not any(var in component_vars for var in NAT_VARS):
+        nat_count = -1
+    elif is_false(component_vars.get("enable_nat_gateway")):
+        nat_count = 0
+    elif component_vars.get("nat_gateway_strategy") == "single" or component_vars.get("single_nat_gateway") is True:
+        nat_count = 1
+    else:
+        nat_count = az_count
+    return name, config["component"], enabled, nat_count, az_count
+
+
+def module_prices(module: Dict[str, Any]) -> Tuple[float, float, float]:
+    """(monthly cost, cost without NAT gateways, price per NAT gateway) of a registry module"""
+    cost = module.get("cost") or {}
+    total = cost.get("estimated_monthly_usd")
+    total = float(total) if isinstance(total, (int, float)) else 0.0
+    breakdown = cost.get("cost_breakdown") or {}
+    if isinstance(breakdown.get("nat_gateways"), (int, float)):
+        nat = float(breakdown["nat_gateways"])
+        return total, total - nat, nat / BREAKDOWN_NAT_AZS
+    if isinstance(breakdown.get("nat_gateway"), (int, float)):
+        nat = float(breakdown["nat_gateway"])
+        return total, total - nat, nat
+    return total, total, 0.0
+
+
+class CostTable:
+    """Columnar cost data of every stack component, with rollups and scenarios"""
+
+    def __init__(self, repo_root: str, cache_path: Optional[str] = None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.cache_path = cache_path or os.path.join(self.repo_root, ".cache", "stack-costs.json")
+        self.stacks = []  # type: List[str]
+        # dimension -> labels, and per stack the label index of each stack dimension
+        self.labels = {d: [] for d in DIMENSIONS}  # type: Dict[str, List[str]]
+        self.stack_labels = {d: array("I") for d in STACK_DIMENSIONS}  # type: Dict[str, array]
+        # One entry per deployed stack component
+        self.stack_index = array("I")
+        self.component_index = array("I")
+        self.module_index = array("i")  # -1 when the component has no registry entry
+        self.base_cost = array("d")  # monthly cost without NAT gateways
+        self.nat_price = array("d")  # per NAT gateway
+        self.nat_count = array("i")  # -1 when the component doesn't manage NAT
+        self.az_count = array("H")
+        self.enabled = array("b")
+        self.errors = {}  # type: Dict[str, str]
+        self.resolved = 0
+        self.cached = 0
+
+    def load_cache(self) -> Dict[str, Any]:
+        """Cached stack facts, or none when recorded by another cache version"""
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("stacks") or {}
+
+    def stack_facts(self, graph: StackGraph, use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Per stack its dimension labels and component rows, resolving only changed stacks"""
+        cache = self.load_cache() if use_cache else {}
+        resolver = None  # type: Optional[StackResolver]
+        facts = {}  # type: Dict[str, Dict[str, Any]]
+        self.resolved = self.cached = 0
+        for stack in graph.stacks:
+            fingerprint = graph.stack_fingerprint(stack)
+            entry = cache.get(stack)
+            if entry and entry["fingerprint"] == fingerprint:
+                facts[stack] = entry
+                self.cached += 1
+                continue
+            if resolver is None:
+                resolver = StackResolver(graph)
+            resolved = resolver.resolve_stack(stack)
+            self.resolved += 1
+            stack_vars = resolved["vars"]
+            parts = stack.split("/")
+            facts[stack] = {
+                "fingerprint": fingerprint,
+                "tenant": str(stack_vars.get("tenant") or (parts[1] if len(parts) > 4 else "")),
+                "account": str(stack_vars.get("account") or stack_vars.get("stage") or ""),
+                "region": str(stack_vars.get("region") or ""),
+                "environment": str(stack_vars.get("environment") or parts[-1]),
+                "rows": [component_row(name, config) for name, config in
+                         sorted((resolved["components"].get("terraform") or {}).items())],
+            }
+        if resolver is not None:
+            self.errors = dict(resolver.errors)
+        if use_cache and self.resolved:
+            write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "stacks": facts})
+        return facts
+
+    def load(self, use_cache: bool = True, registry: Optional[RegistryResolver] = None) -> "CostTable":
+        """Build the columns from the stacks and the registry"""
+        graph = StackGraph.from_atmos_config(self.repo_root).load()
+        registry = registry or RegistryResolver(RegistryIndex(self.repo_root).all_modules())
+        facts = self.stack_facts(graph, use_cache)
+
+        lookup = {d: {} for d in DIMENSIONS}  # type: Dict[str, Dict[str, int]]
+
+        def index(dimension: str, label: str) -> int:
+            labels = lookup[dimension]
+            if label not in labels:
+                labels[label] = len(labels)
+                self.labels[dimension].append(label)
+            return labels[label]
+
+        module_ids = registry.ids
+        module_lookup = {module_id: index("module", module_id) for module_id in module_ids}
+        prices = [module_prices(registry.modules[module_id]) for module_id in module_ids]
+        component_modules = {}  # type: Dict[str, int]
+
+        self.stacks = list(graph.stacks)
+        for stack_number, stack in enumerate(self.stacks):
+            entry = facts[stack]
+            self.stack_labels["stack"].append(index("stack", stack))
+            for dimension in STACK_DIMENSIONS[1:]:
+                self.stack_labels[dimension].append(index(dimension, entry[dimension]))
+            for name, component, enabled, nat_count, az_count in entry["rows"]:
+                if component not in component_modules:
+                    module_id = registry.module_for_component(component)
+                    component_modules[component] = module_lookup[module_id] if module_id else -1
+                module = component_modules[component]
+                total, base, nat = prices[module] if module >= 0 else (0.0, 0.0, 0.0)
+                if nat_count < 0:
+                    # The module's NAT estimate stays part of its flat price
+                    base, nat = total, 0.0
+                self.stack_index.append(stack_number)
+                self.component_index.append(index("component", component))
+                self.module_index.append(module)
+                self.base_cost.append(base)
+                self.nat_price.append(nat)
+                self.nat_count.append(nat_count)
+                self.az_count.append(az_count)
+                self.enabled.append(enabled)
+        return self
+
+    def __len__(self) -> int:
+        return len(self.stack_index)
+
+    def evaluate(self, disable: Optional[Iterable[str]] = None, nat_mode: Optional[str] = None) -> array:
+        """Monthly cost of every stack component under a scenario.
+
+        `disable` turns components off by Terraform component name.
+        `nat_mode` sets the NAT gateways of every component that has them
+        enabled: one (`single`) or one per availability zone (`one_per_az`).
+        """
+        enabled = self.enabled
+        if disable:
+            names = set(disable)
+            off = {i for i, label in enumerate(self.labels["component"]) if label in names}
+            enabled = array("b", [e and c not in off for e, c in zip(enabled, self.component_index)])
+
+        nat_count = self.nat_count
+        if nat_mode == "single":
+            nat_count = array("i", [1 if n > 0 else n for n in nat_count])
+        elif nat_mode == "one_per_az":
+            nat_count = array("i", [z if n > 0 else n for n, z in zip(nat_count, self.az_count)])
+        elif nat_mode is not None:
+            raise ValueError(f"unknown NAT mode {nat_mode!r}, expected one of {', '.join(NAT_MODES)}")
+
+        return array("d", [(b + p * n if n > 0 else b) if e else 0.0
+                           for b, p, n, e in zip(self.base_cost, self.nat_price, nat_count, enabled)])
+
+    def rollup(self, costs: array, by: str = "stack") -> Dict[str, float]:
+        """Total of `costs` per label of a dimension"""
+        if by in COMPONENT_DIMENSIONS:
+            totals = [0.0] * len(self.labels[by])
+            keys = self.component_index if by == "component" else self.module_index
+            for key, cost in zip(keys, costs):
+                if key >= 0:
+                    totals[key] += cost
+            return dict(zip(self.labels[by], totals))
+        if by not in STACK_DIMENSIONS:
+            raise ValueError(f"unknown dimension {by!r}, expected one of {', '.join(DIMENSIONS)}")
+
+        per_stack = [0.0] * len(self.stacks)
+        for stack, cost in zip(self.stack_index, costs):
+            per_stack[stack] += cost
+        totals = [0.0] * len(self.labels[by])
+        for label, cost in zip(self.stack_labels[by], per_stack):
+            totals[label] += cost
+        return dict(zip(self.labels[by], totals))
+
+    def unpriced(self) -> Dict[str, int]:
+        """Components without a registry entry, with the number of stack components using them"""
+        counts = {}  # type: Dict[str, int]
+        for component, module in zip(self.component_index, self.module_index):
+            if module < 0:
+                name = self.labels["component"][component]
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Roll up estimated monthly costs from the module registry")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("--by", choices=DIMENSIONS, default="stack", help="Dimension to roll up per (default: stack)")
+    parser.add_argument("--disable", nargs="+", metavar="COMPONENT", help="Scenario: disable these components")
+    parser.add_argument("--nat-mode", choices=NAT_MODES, help="Scenario: NAT gateways per VPC")
+    parser.add_argument("--json", action="store_true", help="Print the rollup as JSON")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Resolve every stack, ignoring and not updating the cache")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = CostTable(args.repo_root).load(use_cache=not args.no_cache)
+    loaded = time.perf_counter()
+
+    baseline = table.rollup(table.evaluate(), args.by)
+    scenario = args.disable is not None or args.nat_mode is not None
+    if scenario:
+        whatif = table.rollup(table.evaluate(args.disable, args.nat_mode), args.by)
+    elapsed = time.perf_counter() - loaded
+
+    if args.json:
+        result = {label: {"baseline": round(cost, 2)} for label, cost in baseline.items()}
+        if scenario:
+            for label, cost in whatif.items():
+                result[label]["scenario"] = round(cost, 2)
+        print(json.dumps({"by": args.by, "rollup": result, "unpriced": table.unpriced()}, indent=2))
+    else:
+        width = max([len(label) for label in baseline] + [len(args.by)])
+        header = f"{args.by:<{width}}  {'baseline':>10}"
+        print(header + (f"  {'scenario':>10}  {'delta':>10}" if scenario else ""))
+        for label, cost in sorted(baseline.items(), key=lambda item: (-item[1], item[0])):
+            line = f"{label:<{width}}  {cost:>10.2f}"
+            if scenario:
+                line += f"  {whatif[label]:>10.2f}  {whatif[label] - cost:>+10.2f}"
+            print(line)
+        total = sum(baseline.values())
+        line = f"{'total':<{width}}  {total:>10.2f}"
+        if scenario:
+            line += f"  {sum(whatif.values()):>10.2f}  {sum(whatif.values()) - total:>+10.2f}"
+        print(line)
+        unpriced = table.unpriced()
+        if unpriced:
+            print(f"\nNot in the registry (unpriced): {', '.join(sorted(unpriced))}")
+
+    for key, error in sorted(table.errors.items()):
+        print(f"Error: {key}: {error}", file=sys.stderr)
+    print(f"{len(table)} components of {len(table.stacks)} stacks ({table.resolved} resolved, {table.cached} cached) "
+          f"loaded in {(loaded - start) * 1000:.0f}ms, rolled up in {elapsed * 1000:.1f}ms (USD per month)",
+          file=sys.stderr)
+    sys.exit(1 if table.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Atmos Component Dependency DAG
+
+Builds the dependency graph of the Terraform components in a stack from its
+natively resolved configuration and orders them into deployment waves: every
+component in a wave depends only on components in earlier waves, so each wave
+can be applied concurrently.
+
+Dependencies are collected from:
+1. `depends_on` on the component (a list of component names)
+2. `settings.depends_on` in the atmos format ({1: {component: vpc}, ...});
+   entries pointing at another tenant/environment/stage/stack are reported
+   as external and don't order anything within the stack
+3. `depends_on` declared on the abstract catalog base named after the
+   component's Terraform component (catalog/ec2/defaults declares the
+   dependencies of every ec2 instance)
+4. ${output.<component>.<attribute>} references in the component's config
+
+A dependency name matches the component instance of that name, or every
+instance of that Terraform component (`vpc` matches vpc/main and vpc/services).
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./stack_dag.py [options]          Summarize every stack
+    ./stack_dag.py [options] <stack>  Waves and critical path of one stack
+
+    <stack> is a stack manifest (orgs/fnx/dev/eu-west-2/testenv-01) or a
+    tenant-account-environment name (fnx-dev-testenv-01).
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --durations FILE      JSON map of component to seconds used to weight the critical path
+    --json                Print machine-readable JSON
+    --waves               Print one wave per line, components separated by spaces
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from typing import Dict, List, Set, Any, Tuple, Optional
+
+from stack_resolver import StackResolver
+
+# ${output.vpc/main.vpc_id} -> vpc/main; ${output.vpc_id} refers to the component itself
+OUTPUT_REFERENCE = re.compile(r"\$\{output\.([\w/-]+)\.")
+
+# settings.depends_on keys that place a dependency in another stack
+CONTEXT_KEYS = ("namespace", "tenant", "environment", "stage", "stack")
+
+
+def iter_strings(value: Any):
+    """Yield every string nested in a configuration value"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_strings(item)
+
+
+def stack_name(resolved: Dict[str, Any]) -> Optional[str]:
+    """tenant-account-environment name of a resolved stack, as used by the workflows"""
+    stack_vars = resolved.get("vars") or {}
+    parts = [stack_vars.get(k) for k in ("tenant", "account", "environment")]
+    return "-".join(str(p) for p in parts) if all(parts) else None
+
+
+def find_stack(resolver: StackResolver, name: str) -> Optional[str]:
+    """Stack manifest key for a manifest path or tenant-account-environment name"""
+    key = resolver.graph.key_for_path(name)
+    if key is not None and key in resolver.graph.nodes and resolver.graph.is_stack(key):
+        return key
+    for stack in resolver.graph.stacks:
+        if stack_name(resolver.resolve_stack(stack)) == name:
+            return stack
+    return None
+
+
+class ComponentDAG:
+    """Dependency graph of the Terraform components deployed by one stack"""
+
+    def __init__(self, stack: str, resolved: Dict[str, Any]):
+        self.stack = stack
+        self.name = stack_name(resolved)
+        self.stack_vars = resolved.get("vars") or {}
+        terraform = resolved["components"].get("terraform", {})
+        self.abstract = {name: c for name, c in terraform.items() if c["abstract"]}
+        self.deployed = {name: c for name, c in terraform.items() if not c["abstract"]}
+        self.components = sorted(self.deployed)
+
+        # component -> dependency -> sources it was declared by
+        self.dependencies = {name: {} for name in self.components}  # type: Dict[str, Dict[str, List[str]]]
+        self.unresolved = {}  # type: Dict[str, List[str]]
+        self.external = {}  # type: Dict[str, List[Dict[str, Any]]]
+        for name in self.components:
+            self._collect(name)
+
+        self._cycles = None  # type: Optional[List[List[str]]]
+
+    @classmethod
+    def for_stack(cls, resolver: StackResolver, stack: str) -> "ComponentDAG":
+        """Build the DAG of a stack from the resolver, including abstract bases"""
+        return cls(stack, resolver.resolve_stack(stack, include_abstract=True))
+
+    def match(self, reference: str) -> List[str]:
+        """Deployed components a dependency name refers to"""
+        if reference in self.deployed:
+            return [reference]
+        return sorted(name for name, c in self.deployed.items() if c["component"] == reference)
+
+    def workspace(self, name: str) -> str:
+        """Terraform workspace atmos selects for a deployed component: the stack
+        name, suffixed with the component for derived ones, unless the metadata
+        sets terraform_workspace"""
+        config = self.deployed[name]
+        if config["metadata"].get("terraform_workspace"):
+            return config["metadata"]["terraform_workspace"]
+        return self.name if config["component"] == name else f"{self.name}-{name.replace('/', '-')}"
+
+    def _add(self, name: str, reference: str, source: str):
+        """Record that `name` depends on whatever `reference` matches"""
+        targets = [t for t in self.match(reference) if t != name]
+        if not targets:
+            # Referencing your own Terraform component (vpc/main -> vpc) is not a dependency
+            if reference != self.deployed[name]["component"] and reference not in self.unresolved.get(name, []):
+                self.unresolved.setdefault(name, []).append(reference)
+            return
+        for target in targets:
+            sources = self.dependencies[name].setdefault(target, [])
+            if source not in sources:
+                sources.append(source)
+
+    def _collect(self, name: str):
+        """Gather the dependencies of one component from every source"""
+        config = self.deployed[name]
+
+        for reference in config.get("depends_on") or []:
+            if isinstance(reference, str):
+                self._add(name, reference, "depends_on")
+
+        declared = (config.get("settings") or {}).get("depends_on") or {}
+        entries = list(declared.values()) if isinstance(declared, dict) else declared
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, str):
+                self._add(name, entry, "settings.depends_on")
+            elif isinstance(entry, dict) and entry.get("component"):
+                if any(k in entry and entry[k] != self.stack_vars.get(k) for k in CONTEXT_KEYS):
+                    self.external.setdefault(name, []).append(entry)
+                else:
+                    self._add(name, entry["component"], "settings.depends_on")
+
+        base = self.abstract.get(config["component"])
+        if base is not None and config["component"] not in config["inheritance"]:
+            for reference in base.get("depends_on") or []:
+                if isinstance(reference, str):
+                    self._add(name, reference, "catalog")
+
+        for value in iter_strings({k: v for k, v in config.items() if k != "metadata"}):
+            for reference in OUTPUT_REFERENCE.findall(value):
+                self._add(name, reference, "output")
+
+    @property
+    def dependents(self) -> Dict[str, Set[str]]:
+        """Reverse edges: component -> components that depend on it"""
+        reverse = {name: set() for name in self.components}  # type: Dict[str, Set[str]]
+        for name, deps in self.dependencies.items():
+            for dep in deps:
+                reverse[dep].add(name)
+        return reverse
+
+    @property
+    def cycles(self) -> List[List[str]]:
+        """One dependency cycle per strongly connected component (Tarjan)"""
+        if self._cycles is not None:
+            return self._cycles
+
+        index = {}  # type: Dict[str, int]
+        lowlink = {}  # type: Dict[str, int]
+        on_stack = set()  # type: Set[str]
+        stack = []  # type: List[str]
+        groups = []  # type: List[List[str]]
+
+        def connect(node: str):
+            index[node] = lowlink[node] = len(index)
+            stack.append(node)
+            on_stack.add(node)
+            for dep in sorted(self.dependencies[node]):
+                if dep not in index:
+                    connect(dep)
+                    lowlink[node] = min(lowlink[node], lowlink[dep])
+                elif dep in on_stack:
+                    lowlink[node] = min(lowlink[node], index[dep])
+            if lowlink[node] == index[node]:
+                group = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    group.append(member)
+                    if member == node:
+                        break
+                if len(group) > 1:
+                    groups.append(sorted(group))
+
+        for name in self.components:
+            if name not in index:
+                connect(name)
+
+        self._cycles = [self._cycle_path(group) for group in sorted(groups)]
+        return self._cycles
+
+    def _cycle_path(self, group: List[str]) -> List[str]:
+        """A concrete path around a strongly connected group, starting and ending at its first member"""
+        members = set(group)
+        start = group[0]
+        path = [start]
+        seen = {start}
+
+        def walk(node: str) -> bool:
+            for dep in sorted(self.dependencies[node]):
+                if dep == start:
+                    path.append(start)
+                    return True
+                if dep in members and dep not in seen:
+                    seen.add(dep)
+                    path.append(dep)
+                    if walk(dep):
+                        return True
+                    path.pop()
+            return False
+
+        walk(start)
+        return path
+
+    @property
+    def blocked(self) -> List[str]:
+        """Components in a cycle and everything that depends on them"""
+        dependents = self.dependents
+        blocked = set()  # type: Set[str]
+        pending = [name for cycle in self.cycles for name in cycle]
+        while pending:
+            name = pending.pop()
+            if name not in blocked:
+                blocked.add(name)
+                pending.extend(dependents[name])
+        return sorted(blocked)
+
+    def waves(self) -> List[List[str]]:
+        """Topologically ordered groups of components that can be applied concurrently"""
+        blocked = set(self.blocked)
+        remaining = {name: set(deps) for name, deps in self.dependencies.items() if name not in blocked}
+        waves = []
+        while remaining:
+            wave = sorted(name for name, deps in remaining.items() if not deps)
+            waves.append(wave)
+            for name in wave:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(wave)
+        return waves
+
+    def critical_path(self, durations: Optional[Dict[str, float]] = None) -> Tuple[List[str], float]:
+        """Longest dependency chain, weighted by `durations` (one unit per component by default)"""
+        durations = durations or {}
+        finish = {}  # type: Dict[str, float]
+        previous = {}  # type: Dict[str, Optional[str]]
+        for wave in self.waves():
+            for name in wave:
+                deps = self.dependencies[name]
+                before = max(deps, key=lambda d: (finish[d], d)) if deps else None
+                previous[name] = before
+                finish[name] = (finish[before] if before else 0.0) + float(durations.get(name, 1.0))
+        if not finish:
+            return [], 0.0
+
+        node = max(finish, key=lambda n: (finish[n], n))  # type: Optional[str]
+        total = finish[node]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], total
+
+    def to_dict(self, durations: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Machine-readable description of the DAG"""
+        path, total = self.critical_path(durations)
+        return {
+            "stack": self.stack,
+            "name": self.name,
+            "components": self.components,
+            "dependencies": {name: deps for name, deps in self.dependencies.items() if deps},
+            "waves": self.waves(),
+            "critical_path": {"components": path, "duration": total},
+            "cycles": self.cycles,
+            "blocked": self.blocked,
+            "unresolved": self.unresolved,
+            "external": self.external,
+        }
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Order the components of Atmos stacks into deployment waves")
+    parser.add_argument("stack", nargs="?", help="Stack manifest or tenant-account-environment name")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("--durations", metavar="FILE",
+                        help="JSON map of component to seconds used to weight the critical path")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    output.add_argument("--waves", action="store_true", help="Print one wave per line, components separated by spaces")
+    args = parser.parse_args()
+
+    durations = None
+    if args.durations:
+        with open(args.durations, "r") as f:
+            durations = json.load(f)
+
+    resolver = StackResolver.for_repo(args.repo_root)
+    if args.stack:
+        stack = find_stack(resolver, args.stack)
+        if stack is None:
+            print(f"Error: {args.stack} is not a stack", file=sys.stderr)
+            sys.exit(1)
+        stacks = [stack]
+    else:
+        stacks = resolver.graph.stacks
+
+    dags = [ComponentDAG.for_stack(resolver, stack) for stack in stacks]
+    failed = any(dag.cycles for dag in dags)
+
+    if args.json:
+        result = [dag.to_dict(durations) for dag in dags]
+        print(json.dumps(result[0] if args.stack else result, indent=2))
+    elif args.waves:
+        if len(dags) != 1:
+            print("Error: --waves needs a stack", file=sys.stderr)
+            sys.exit(1)
+        for cycle in dags[0].cycles:
+            print(f"Error: dependency cycle: {' -> '.join(cycle)}", file=sys.stderr)
+        for wave in dags[0].waves():
+            print(" ".join(wave))
+    else:
+        for dag in dags:
+            path, total = dag.critical_path(durations)
+            print(f"{dag.stack} ({dag.name})")
+            for number, wave in enumerate(dag.waves(), 1):
+                print(f"  Wave {number}: {', '.join(wave)}")
+            print(f"  Critical path ({total:g}): {' -> '.join(path)}")
+            for cycle in dag.cycles:
+                print(f"  Cycle: {' -> '.join(cycle)}")
+            if dag.blocked:
+                print(f"  Blocked by cycles: {', '.join(dag.blocked)}")
+            for name, references in sorted(dag.unresolved.items()):
+                print(f"  Unresolved: {name} depends on {', '.join(references)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
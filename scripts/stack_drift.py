@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Atmos Drift Detection Engine
+
+Plans every component of one or more stacks with `-detailed-exitcode` on a
+bounded worker pool (see stack_executor.py) and caches each result. A plan
+exit code of 0 means the infrastructure matches the configuration, 2 means
+it has drifted.
+
+A result is reused instead of re-planning while all of these are unchanged:
+
+1. the version of the component's remote state object in S3 (VersionId, or
+   the ETag when the bucket is not versioned)
+2. a hash of the Terraform component source directory and of the local
+   modules it calls, transitively (as computed by stack_affected.py)
+3. a hash of the component's resolved vars, env and backend configuration
+
+Changes made outside Terraform don't touch the state, so cached results
+expire after --max-age hours (default 168) to catch them. Components whose
+state version can't be read are always planned. Errors are never cached.
+
+The state object is located from the component's backend configuration as
+resolved by StackResolver.backend_config (components.terraform.backend.s3 in
+atmos.yaml merged with the component's own backend section, ${var}
+placeholders filled from its vars). Atmos runs each component
+in the workspace named after the stack (stack-component for derived
+components, or metadata.terraform_workspace), which the S3 backend stores
+under <workspace_key_prefix>/<workspace>/<key>. Unless the backend sets
+workspace_key_prefix, atmos sets it to the Terraform component with / replaced
+by -.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+    - atmos, and either boto3 (pip install boto3) or the AWS CLI
+
+Usage:
+    ./stack_drift.py [options] [<stack>...]
+
+    Without stacks every stack is checked. <stack> is a stack manifest
+    (orgs/fnx/dev/eu-west-2/testenv-01) or a tenant-account-environment
+    name (fnx-dev-testenv-01).
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -j, --jobs N          Concurrent plans and state lookups (default: 8)
+    --cache PATH          Result cache (default: .cache/drift-cache.json)
+    --max-age HOURS       Re-plan cached results older than this (default: 168, 0 disables the cache)
+    --log-dir DIR         Write each plan's output to DIR/<stack>/<component>.log
+    --report FILE         Write the drift report as JSON
+    --atmos PATH          atmos binary (default: atmos)
+    --plugin-cache        Plan with the shared provider cache (see provider_cache.py)
+    --dry-run             Show which components would be planned without running atmos
+
+Exit codes: 0 no drift, 1 drift detected, 2 errors.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple, Optional
+
+from stack_dag import ComponentDAG, find_stack
+from provider_cache import ProviderCache
+from stack_affected import TreeFingerprints
+from stack_executor import StackExecutor
+from stack_graph import write_json_atomic
+from stack_resolver import StackResolver
+
+try:
+    import boto3
+    from botocore.exceptions import BotoCoreError, ClientError
+except ImportError:
+    boto3 = None
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(".cache", "drift-cache.json")
+DEFAULT_MAX_AGE_HOURS = 168
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """Hash of the resolved inputs that change what a plan does"""
+    inputs = {section: config.get(section) for section in ("vars", "env", "backend", "backend_type")}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class DriftEngine:
+    """Cached, parallel drift detection over the components of many stacks"""
+
+    def __init__(self, repo_root: str, jobs: int = 8, cache_path: Optional[str] = None,
+                 max_age_hours: float = DEFAULT_MAX_AGE_HOURS, atmos: str = "atmos",
+                 log_dir: Optional[str] = None, dry_run: bool = False, plugin_cache: bool = False):
+        self.repo_root = os.path.abspath(repo_root)
+        self.jobs = jobs
+        self.cache_path = cache_path or os.path.join(self.repo_root, DEFAULT_CACHE_PATH)
+        self.max_age = max_age_hours * 3600
+        self.atmos = atmos
+        self.log_dir = log_dir
+        self.dry_run = dry_run
+
+        self.resolver = StackResolver.for_repo(self.repo_root)
+        self.components_path = os.path.join(self.repo_root, self.resolver.graph.components_base_path)
+        self.provider_cache = ProviderCache(self.resolver) if plugin_cache else None
+
+        self.cache = self.load_cache()
+        self.fingerprints = TreeFingerprints(self.repo_root, self.resolver)
+        self.s3_clients = {}  # type: Dict[Optional[str], Any]
+        self.s3_clients_lock = threading.Lock()
+        self.checks = []  # type: List[Dict[str, Any]]
+
+    def load_cache(self) -> Dict[str, Dict[str, Any]]:
+        """Cached results keyed by "<stack>:<component>"; an unreadable cache is ignored"""
+        if self.max_age <= 0 or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get("entries", {}) if data.get("version") == CACHE_VERSION else {}
+
+    def save_cache(self):
+        """Write the cache atomically"""
+        write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "entries": self.cache}, indent=1)
+
+    def source_hash(self, component: str) -> str:
+        """Hash of a Terraform component directory and the local modules it calls, computed once per run"""
+        return self.fingerprints.module_source(os.path.join(self.components_path, component))[0]
+
+    def state_location(self, dag: ComponentDAG, name: str) -> Optional[Tuple[str, str, Optional[str]]]:
+        """S3 bucket, object key and region of a component's state, or None for other backends"""
+        config = dag.deployed[name]
+        backend_type, backend = self.resolver.backend_config(dag.stack, name)
+        if backend_type != "s3":
+            return None
+        if not backend.get("bucket") or not backend.get("key") or "${" in backend["bucket"] + backend["key"]:
+            return None
+
+        prefix = backend.get("workspace_key_prefix") or config["component"].replace("/", "-")
+        key = f"{prefix}/{dag.workspace(name)}/{backend['key']}"
+        return backend["bucket"], key, backend.get("region")
+
+    def state_version(self, location: Optional[Tuple[str, str, Optional[str]]]) -> Optional[str]:
+        """VersionId or ETag of a state object, or None if it can't be read"""
+        if location is None:
+            return None
+        bucket, key, region = location
+        if boto3 is not None:
+            try:
+                # Clients are thread-safe but creating them from the default session is not
+                with self.s3_clients_lock:
+                    if region not in self.s3_clients:
+                        self.s3_clients[region] = boto3.client("s3", region_name=region)
+                head = self.s3_clients[region].head_object(Bucket=bucket, Key=key)
+            except (BotoCoreError, ClientError):
+                return None
+        else:
+            cmd = ["aws", "s3api", "head-object", "--bucket", bucket, "--key", key, "--output", "json"]
+            if region:
+                cmd += ["--region", region]
+            try:
+                process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                head = json.loads(process.stdout) if process.returncode == 0 else None
+            except (OSError, ValueError):
+                head = None
+            if not head:
+                return None
+        version = head.get("VersionId")
+        if version and version != "null":
+            return f"version:{version}"
+        return f"etag:{head.get('ETag', '').strip(chr(34))}" if head.get("ETag") else None
+
+    def collect(self, dags: List[ComponentDAG]):
+        """Compute the cache key of every component and decide which need a plan"""
+        entries = [(dag, name) for dag in dags for name in dag.components]
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            versions = list(pool.map(lambda e: self.state_version(self.state_location(*e)), entries))
+
+        now = time.time()
+        for (dag, name), state in zip(entries, versions):
+            config = dag.deployed[name]
+            key = None
+            if state is not None:
+                key = hashlib.sha256("\0".join(
+                    [state, self.source_hash(config["component"]), config_hash(config)]
+                ).encode()).hexdigest()
+            cached = self.cache.get(f"{dag.stack}:{name}")
+            fresh = (
+                key is not None and cached is not None and cached.get("key") == key
+                and now - cached.get("checked_at", 0) < self.max_age
+            )
+            self.checks.append({
+                "dag": dag, "stack": dag.stack, "name": dag.name, "component": name,
+                "key": key, "state_version": state,
+                "result": dict(cached, cached=True) if fresh else None,
+            })
+
+    def run(self, dags: List[ComponentDAG]) -> Dict[str, Any]:
+        """Plan every component without a fresh cached result and return the report"""
+        self.collect(dags)
+        to_plan = [c for c in self.checks if c["result"] is None]
+        print(f"Checking {len(self.checks)} components: {len(self.checks) - len(to_plan)} cached, "
+              f"{len(to_plan)} to plan", flush=True)
+
+        executor = StackExecutor(
+            self.repo_root, "plan", jobs=self.jobs, atmos=self.atmos,
+            extra_args=["-detailed-exitcode", "-lock=false"], log_dir=self.log_dir, dry_run=self.dry_run,
+            provider_cache=self.provider_cache
+        )
+        for dag in dags:
+            selected = [c["component"] for c in to_plan if c["stack"] == dag.stack]
+            if selected:
+                executor.add_stack(dag, selected, ordered=False)
+        results = executor.run() if executor.tasks else {}
+        if executor.tasks:
+            executor.print_summary()
+
+        for check in to_plan:
+            result = results.get((check["stack"], check["component"]), {"status": "not run"})
+            status = {"succeeded": "in_sync", "changes": "drifted", "dry-run": "pending"}.get(result["status"], "error")
+            check["result"] = {
+                "status": status, "exit_code": result.get("exit_code"), "checked_at": time.time(),
+                "duration": result.get("duration"), "key": check["key"], "cached": False,
+            }
+            cache_key = f"{check['stack']}:{check['component']}"
+            if status in ("in_sync", "drifted") and check["key"] is not None:
+                self.cache[cache_key] = {k: v for k, v in check["result"].items() if k != "cached"}
+            elif status == "error":
+                self.cache.pop(cache_key, None)
+        if not self.dry_run and self.max_age > 0:
+            self.save_cache()
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        """Drift report in the format of workflows/drift-detection.yaml, per stack and overall"""
+        def summarize(checks: List[Dict[str, Any]], qualify: bool = False) -> Dict[str, Any]:
+            def label(check: Dict[str, Any]) -> str:
+                return f"{check['name'] or check['stack']}:{check['component']}" if qualify else check["component"]
+
+            by_status = {"in_sync": [], "drifted": [], "error": [], "pending": []}  # type: Dict[str, List[str]]
+            for check in checks:
+                by_status.setdefault(check["result"]["status"], []).append(label(check))
+            return {
+                "drift_detected": bool(by_status["drifted"]),
+                "summary": {
+                    "total_components": len(checks),
+                    "no_drift_count": len(by_status["in_sync"]),
+                    "drift_count": len(by_status["drifted"]),
+                    "error_count": len(by_status["error"]),
+                    "cached_count": sum(1 for c in checks if c["result"].get("cached")),
+                    "pending_count": len(by_status["pending"]),
+                },
+                "components": {
+                    "no_drift": by_status["in_sync"],
+                    "drifted": by_status["drifted"],
+                    "errors": by_status["error"],
+                    "cached": [label(c) for c in checks if c["result"].get("cached")],
+                },
+            }
+
+        stacks = {}
+        for stack in dict.fromkeys(c["stack"] for c in self.checks):
+            checks = [c for c in self.checks if c["stack"] == stack]
+            stacks[checks[0]["name"] or stack] = dict(summarize(checks), stack=stack)
+        return dict(
+            summarize(self.checks, qualify=True),
+            report_id=time.strftime("%Y%m%d-%H%M%S"),
+            timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            stacks=stacks,
+        )
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Detect drift across Atmos stacks with cached, parallel plans")
+    parser.add_argument("stacks", nargs="*", help="Stack manifests or tenant-account-environment names (default: all)")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="Concurrent plans and state lookups (default: 8)")
+    parser.add_argument("--cache", help="Result cache (default: .cache/drift-cache.json)")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE_HOURS,
+                        help="Re-plan cached results older than this many hours (0 disables the cache)")
+    parser.add_argument("--log-dir", metavar="DIR", help="Write each plan's output to DIR/<stack>/<component>.log")
+    parser.add_argument("--report", metavar="FILE", help="Write the drift report as JSON")
+    parser.add_argument("--atmos", default="atmos", help="atmos binary (default: atmos)")
+    parser.add_argument("--plugin-cache", action="store_true", help="Plan with the shared provider cache")
+    parser.add_argument("--dry-run", action="store_true", help="Show which components would be planned")
+    args = parser.parse_args()
+
+    engine = DriftEngine(args.repo_root, jobs=args.jobs, cache_path=args.cache, max_age_hours=args.max_age,
+                         atmos=args.atmos, log_dir=args.log_dir, dry_run=args.dry_run,
+                         plugin_cache=args.plugin_cache)
+    stacks = []
+    for name in args.stacks or engine.resolver.graph.stacks:
+        stack = find_stack(engine.resolver, name)
+        if stack is None:
+            print(f"Error: {name} is not a stack", file=sys.stderr)
+            sys.exit(2)
+        stacks.append(stack)
+
+    report = engine.run([ComponentDAG.for_stack(engine.resolver, stack) for stack in stacks])
+    if args.report:
+        write_json_atomic(args.report, report, indent=2)
+
+    print("\n=== Drift Detection Summary ===")
+    for name, stack_report in report["stacks"].items():
+        summary = stack_report["summary"]
+        print(f"{name}: {summary['drift_count']} drifted, {summary['no_drift_count']} in sync, "
+              f"{summary['error_count']} errors ({summary['cached_count']} from cache)"
+              + (f", {summary['pending_count']} would be planned" if summary["pending_count"] else ""))
+        for component in stack_report["components"]["drifted"]:
+            print(f"  ⚠️  {component}")
+        for component in stack_report["components"]["errors"]:
+            print(f"  ❌ {component}")
+
+    if report["drift_detected"]:
+        sys.exit(1)
+    sys.exit(2 if report["summary"]["error_count"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Atmos Stack Executor
+
+Runs `atmos terraform plan` or `atmos terraform apply` for the components of
+one or more stacks on a bounded worker pool, in dependency order (see
+stack_dag.py):
+
+- a component starts as soon as every component it depends on has succeeded
+- when a component fails, everything depending on it is skipped while
+  independent components carry on
+- instances of the same Terraform component (vpc/main, vpc/services) share a
+  working directory, so they never run at the same time
+- among ready components, the ones heading the longest remaining chain start
+  first
+- output is streamed line by line with a [stack:component] prefix
+
+At the end the time spent per component and the critical path of the run
+are reported.
+
+With --plugin-cache every run shares one Terraform provider cache, warmed
+before the first component starts, and components whose lock file, provider
+requirements and backend are unchanged since their last successful run skip
+`terraform init` (see provider_cache.py). Components whose providers failed
+to warm run without the cache, so their inits never write to it.
+
+Applies keep the local outputs store (see outputs_store.py) current: a
+component's stored outputs are invalidated when its apply starts and
+replaced with the outputs.json written by the post_apply hook once it
+succeeds.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+    - atmos
+
+Usage:
+    ./stack_executor.py plan <stack>... [options]
+    ./stack_executor.py apply <stack>... --auto-approve [options]
+
+    <stack> is a stack manifest (orgs/fnx/dev/eu-west-2/testenv-01) or a
+    tenant-account-environment name (fnx-dev-testenv-01).
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -j, --jobs N          Concurrent atmos processes (default: 4)
+    -c, --component NAME  Only run this component or Terraform component (repeatable);
+                          dependencies outside the selection are assumed to be in place
+    --auto-approve        Required for apply
+    --detailed-exitcode   Plan with -detailed-exitcode; exits 2 when any plan has changes
+    --plan-dir DIR        Save plans to DIR/<stack>/<component>.tfplan
+    --log-dir DIR         Also write each component's output to DIR/<stack>/<component>.log
+    --durations FILE      JSON map of component to seconds from a previous run, used for scheduling
+    --report FILE         Write per-component status and timing as JSON
+    --atmos PATH          atmos binary (default: atmos)
+    --plugin-cache        Warm and use the shared provider cache; skip init where it is current
+    --dry-run             Print the order components would start in without running atmos
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Set, Any, Tuple, Optional
+
+from outputs_store import OutputsStore
+from provider_cache import ProviderCache
+from stack_dag import ComponentDAG, find_stack
+from stack_resolver import StackResolver
+
+COMMANDS = ("plan", "apply")
+
+# Component results that let dependents go ahead; "changes" is a plan with -detailed-exitcode exit 2
+SUCCEEDED = ("succeeded", "changes", "dry-run")
+
+TaskKey = Tuple[str, str]
+
+
+def flat_name(component: str) -> str:
+    """File name for a component instance (vpc/main -> vpc_main)"""
+    return component.replace("/", "_")
+
+
+class StackExecutor:
+    """Dependency-aware, concurrent runner of atmos terraform commands"""
+
+    def __init__(self, repo_root: str, command: str, jobs: int = 4, atmos: str = "atmos",
+                 extra_args: Optional[List[str]] = None, plan_dir: Optional[str] = None,
+                 log_dir: Optional[str] = None, durations: Optional[Dict[str, float]] = None,
+                 dry_run: bool = False, stream=None, provider_cache: Optional[ProviderCache] = None,
+                 outputs_store: Optional[OutputsStore] = None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.command = command
+        self.jobs = max(1, jobs)
+        self.atmos = atmos
+        self.extra_args = extra_args or []
+        # terraform runs in the component directory, so plan paths must be absolute
+        self.plan_dir = os.path.abspath(plan_dir) if plan_dir else None
+        self.log_dir = log_dir
+        self.durations = durations or {}
+        self.dry_run = dry_run
+        self.stream = stream or sys.stdout
+        self.provider_cache = provider_cache
+        self.outputs_store = outputs_store if command == "apply" else None
+        # Repo-relative component directories whose requirement set failed to warm
+        self.unwarmed = set()  # type: Set[str]
+
+        self.dags = {}  # type: Dict[str, ComponentDAG]
+        self.tasks = {}  # type: Dict[TaskKey, Dict[str, Any]]
+        self.results = {}  # type: Dict[TaskKey, Dict[str, Any]]
+        self.order = []  # type: List[TaskKey]
+        self.output_lock = threading.Lock()
+        self.processes = {}  # type: Dict[TaskKey, subprocess.Popen]
+        self.interrupted = False
+        self.started_at = None  # type: Optional[float]
+        self.finished_at = None  # type: Optional[float]
+
+    def log(self, message: str):
+        """Print an executor status line"""
+        with self.output_lock:
+            print(message, file=self.stream, flush=True)
+
+    def emit(self, key: TaskKey, line: str):
+        """Print one line of component output with its prefix"""
+        with self.output_lock:
+            print(f"[{self.tasks[key]['name']}:{key[1]}] {line}", file=self.stream, flush=True)
+
+    def add_stack(self, dag: ComponentDAG, components: Optional[List[str]] = None, ordered: bool = True):
+        """Queue the components of a stack, optionally only a selection of them.
+
+        With `ordered` false dependencies are ignored (read-only plans).
+        """
+        self.dags[dag.stack] = dag
+        selected = set(dag.components)
+        if components:
+            selected = set()
+            for reference in components:
+                matches = dag.match(reference)
+                if not matches:
+                    self.log(f"Warning: no component of {dag.stack} matches {reference}")
+                selected.update(matches)
+
+        blocked = set(dag.blocked)
+        for component in sorted(selected):
+            key = (dag.stack, component)
+            self.tasks[key] = {
+                "name": dag.name or dag.stack,
+                "component": component,
+                "workdir": dag.deployed[component]["component"],
+                "depends_on": {(dag.stack, d) for d in dag.dependencies[component] if ordered and d in selected},
+                "dependents": set(),
+            }
+            if ordered and component in blocked:
+                self.results[key] = {"status": "skipped", "reason": "dependency cycle"}
+        for key, task in self.tasks.items():
+            if key[0] == dag.stack:
+                for dep in task["depends_on"]:
+                    self.tasks[dep]["dependents"].add(key)
+
+    def priorities(self) -> Dict[TaskKey, float]:
+        """Length of the longest chain of dependents starting at each task"""
+        memo = {}  # type: Dict[TaskKey, float]
+
+        def rank(key: TaskKey, trail: Set[TaskKey]) -> float:
+            if key not in memo:
+                following = [rank(d, trail | {key}) for d in self.tasks[key]["dependents"] if d not in trail]
+                memo[key] = float(self.durations.get(key[1], 1.0)) + max(following, default=0.0)
+            return memo[key]
+
+        return {key: rank(key, set()) for key in self.tasks}
+
+    def build_command(self, key: TaskKey, skip_init: bool = False) -> List[str]:
+        """atmos command line for one component"""
+        task = self.tasks[key]
+        cmd = [self.atmos, "terraform", self.command, key[1], "-s", task["name"]]
+        if skip_init:
+            cmd.append("--skip-init")
+        if self.command == "apply":
+            cmd.append("-auto-approve")
+        if self.plan_dir and self.command == "plan":
+            cmd.append(f"-out={os.path.join(self.plan_dir, task['name'], flat_name(key[1]) + '.tfplan')}")
+        return cmd + self.extra_args
+
+    def run_task(self, key: TaskKey) -> Dict[str, Any]:
+        """Run one component, streaming its output, and return its result"""
+        fingerprint, env = None, None
+        if self.provider_cache:
+            workdir = os.path.join(self.provider_cache.components_path, self.tasks[key]["workdir"])
+            env = self.provider_cache.environment(
+                cached=os.path.relpath(workdir, self.provider_cache.repo_root) not in self.unwarmed)
+            fingerprint = self.provider_cache.init_fingerprint(*key)
+        skip_init = fingerprint is not None and self.provider_cache.can_skip_init(key[0], key[1], fingerprint)
+        cmd = self.build_command(key, skip_init)
+        started = time.time()
+        start = time.perf_counter()
+        if self.dry_run:
+            self.emit(key, "would run: " + " ".join(cmd))
+            return {"status": "dry-run", "exit_code": 0, "started_at": started, "duration": 0.0}
+
+        self.emit(key, "running: " + " ".join(cmd))
+        if fingerprint and not skip_init:
+            self.provider_cache.forget_init(*key)
+        if self.outputs_store:
+            self.outputs_store.invalidate(self.tasks[key]["name"], key[1])
+            # The hook's file from an earlier apply of another instance mustn't be taken for this one's
+            outputs_file = self.outputs_store.outputs_file(self.tasks[key]["workdir"])
+            stale_mtime = os.path.getmtime(outputs_file) if os.path.exists(outputs_file) else None
+        log_file = None
+        if self.plan_dir and self.command == "plan":
+            os.makedirs(os.path.join(self.plan_dir, self.tasks[key]["name"]), exist_ok=True)
+        if self.log_dir:
+            log_path = os.path.join(self.log_dir, self.tasks[key]["name"], flat_name(key[1]) + ".log")
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            log_file = open(log_path, "w")
+        try:
+            process = subprocess.Popen(cmd, cwd=self.repo_root, env=env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, text=True, bufsize=1)
+            self.processes[key] = process
+            for line in process.stdout:
+                self.emit(key, line.rstrip("\n"))
+                if log_file:
+                    log_file.write(line)
+            exit_code = process.wait()
+        except OSError as e:
+            self.emit(key, f"failed to start: {e}")
+            exit_code = 127
+        finally:
+            self.processes.pop(key, None)
+            if log_file:
+                log_file.close()
+
+        if self.interrupted:
+            status = "interrupted"
+        elif exit_code == 0:
+            status = "succeeded"
+        elif exit_code == 2 and "-detailed-exitcode" in self.extra_args:
+            status = "changes"
+        else:
+            status = "failed"
+        if fingerprint and status in SUCCEEDED:
+            self.provider_cache.record_init(key[0], key[1], fingerprint)
+        if self.outputs_store and status == "succeeded":
+            if not self.outputs_store.ingest_file(self.tasks[key]["name"], key[1], outputs_file, stale_mtime):
+                self.emit(key, f"warning: no outputs.json from the post_apply hook at {outputs_file}")
+        duration = time.perf_counter() - start
+        self.emit(key, f"{status} in {duration:.1f}s (exit code {exit_code})")
+        return {"status": status, "exit_code": exit_code, "started_at": started, "duration": duration,
+                "init_skipped": skip_init}
+
+    def warm_provider_cache(self):
+        """Download the providers of every queued component into the shared cache"""
+        workdirs = sorted({task["workdir"] for task in self.tasks.values()})
+        roots = [os.path.join(self.provider_cache.components_path, w) for w in workdirs]
+        results = self.provider_cache.warm(roots, log=self.log)
+        self.log(f"Provider cache {self.provider_cache.cache_dir}: {results['warmed']} requirement sets warmed, "
+                 f"{results['already_cached']} already cached")
+        for failure in results["failed"]:
+            self.unwarmed.update(failure["modules"])
+            self.log(f"Warning: could not warm {failure['requirements']}, terraform init will download them "
+                     f"without the cache:\n{failure['output']}")
+
+    def skip_dependents(self, key: TaskKey):
+        """Mark everything depending on a failed component as skipped"""
+        pending = list(self.tasks[key]["dependents"])
+        while pending:
+            dependent = pending.pop()
+            if dependent not in self.results:
+                self.results[dependent] = {"status": "skipped", "reason": f"{key[1]} did not succeed"}
+                self.log(f"[{self.tasks[dependent]['name']}:{dependent[1]}] skipped: depends on {key[1]}")
+                pending.extend(self.tasks[dependent]["dependents"])
+
+    def run(self) -> Dict[TaskKey, Dict[str, Any]]:
+        """Run every queued component and return the results"""
+        priority = self.priorities()
+        # Components blocked by a dependency cycle were recorded by add_stack
+        for key in list(self.results):
+            self.skip_dependents(key)
+        waiting = {key: set(task["depends_on"]) for key, task in self.tasks.items() if key not in self.results}
+        ready = [key for key, deps in waiting.items() if not deps]
+        for key in ready:
+            del waiting[key]
+        busy = set()  # type: Set[str]
+        running = {}  # type: Dict[Any, TaskKey]
+
+        self.started_at = time.perf_counter()
+        cache_lock = contextlib.ExitStack()
+        if self.provider_cache and not self.dry_run:
+            self.warm_provider_cache()
+            # Readers share the cache; a concurrent warm waits until the run is over
+            cache_lock.enter_context(self.provider_cache.locked())
+        with cache_lock, ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            try:
+                while ready or running:
+                    ready.sort(key=lambda k: (-priority[k], k))
+                    for key in list(ready):
+                        if len(running) >= self.jobs:
+                            break
+                        if self.tasks[key]["workdir"] in busy:
+                            continue
+                        ready.remove(key)
+                        busy.add(self.tasks[key]["workdir"])
+                        self.order.append(key)
+                        running[pool.submit(self.run_task, key)] = key
+
+                    done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key = running.pop(future)
+                        busy.discard(self.tasks[key]["workdir"])
+                        self.results[key] = future.result()
+                        if self.results[key]["status"] not in SUCCEEDED:
+                            self.skip_dependents(key)
+                            continue
+                        for dependent in self.tasks[key]["dependents"]:
+                            if dependent in waiting:
+                                waiting[dependent].discard(key)
+                                if not waiting[dependent]:
+                                    del waiting[dependent]
+                                    ready.append(dependent)
+            except KeyboardInterrupt:
+                self.interrupted = True
+                self.log("Interrupted, stopping running components...")
+                for process in list(self.processes.values()):
+                    process.terminate()
+                for future, key in running.items():
+                    self.results[key] = future.result()
+
+        for key in self.tasks:
+            self.results.setdefault(key, {"status": "not run"})
+        self.finished_at = time.perf_counter()
+        return self.results
+
+    def critical_path(self, stack: str) -> Tuple[List[str], float]:
+        """Critical path of a stack weighted by the measured component durations"""
+        durations = {c: 0.0 for c in self.dags[stack].components}
+        for (task_stack, component), result in self.results.items():
+            if task_stack == stack:
+                durations[component] = result.get("duration", 0.0)
+        return self.dags[stack].critical_path(durations)
+
+    def report(self) -> Dict[str, Any]:
+        """Machine-readable results grouped by stack"""
+        stacks = {}  # type: Dict[str, Any]
+        for stack, dag in self.dags.items():
+            components = {key[1]: result for key, result in self.results.items() if key[0] == stack}
+            path, total = self.critical_path(stack)
+            stacks[stack] = {
+                "name": dag.name,
+                "components": components,
+                "durations": {c: r["duration"] for c, r in components.items() if "duration" in r},
+                "critical_path": {"components": path, "duration": round(total, 3)},
+            }
+        return {
+            "command": self.command,
+            "duration": round((self.finished_at or 0.0) - (self.started_at or 0.0), 3),
+            "stacks": stacks,
+        }
+
+    def print_summary(self):
+        """Print time spent per component, in start order, and each stack's critical path"""
+        self.log("\n" + "=" * 80)
+        self.log(f"atmos terraform {self.command}: {len(self.tasks)} components on {self.jobs} workers")
+        self.log("=" * 80)
+        started = self.order + [key for key in sorted(self.tasks) if key not in self.order]
+        for key in started:
+            result = self.results[key]
+            timing = f"{result['duration']:8.1f}s" if "duration" in result else " " * 9
+            reason = f" ({result['reason']})" if result.get("reason") else ""
+            self.log(f"  {timing}  {result['status']:<11} {self.tasks[key]['name']}:{key[1]}{reason}")
+
+        busy_time = sum(r.get("duration", 0.0) for r in self.results.values())
+        wall_time = (self.finished_at or 0.0) - (self.started_at or 0.0)
+        self.log(f"\nWall time {wall_time:.1f}s, component time {busy_time:.1f}s")
+        if self.provider_cache:
+            skipped = sum(1 for r in self.results.values() if r.get("init_skipped"))
+            self.log(f"terraform init skipped for {skipped} of {len(self.tasks)} components")
+        ordered = any(task["depends_on"] for task in self.tasks.values())
+        for stack in self.dags if ordered else []:
+            path, total = self.critical_path(stack)
+            if path:
+                self.log(f"Critical path of {self.dags[stack].name or stack} ({total:.1f}s): {' -> '.join(path)}")
+
+        counts = {}  # type: Dict[str, int]
+        for result in self.results.values():
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+        self.log(", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Run atmos terraform plan/apply across stacks in dependency order")
+    parser.add_argument("command", choices=COMMANDS, help="Terraform command to run")
+    parser.add_argument("stacks", nargs="+", help="Stack manifests or tenant-account-environment names")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Concurrent atmos processes (default: 4)")
+    parser.add_argument("-c", "--component", action="append", help="Only run this component (repeatable)")
+    parser.add_argument("--auto-approve", action="store_true", help="Required for apply")
+    parser.add_argument("--detailed-exitcode", action="store_true", help="Plan with -detailed-exitcode")
+    parser.add_argument("--plan-dir", metavar="DIR", help="Save plans to DIR/<stack>/<component>.tfplan")
+    parser.add_argument("--log-dir", metavar="DIR",
+                        help="Also write each component's output to DIR/<stack>/<component>.log")
+    parser.add_argument("--durations", metavar="FILE", help="JSON map of component to seconds from a previous run")
+    parser.add_argument("--report", metavar="FILE", help="Write per-component status and timing as JSON")
+    parser.add_argument("--atmos", default="atmos", help="atmos binary (default: atmos)")
+    parser.add_argument("--plugin-cache", action="store_true",
+                        help="Warm and use the shared provider cache; skip init where it is current")
+    parser.add_argument("--dry-run", action="store_true", help="Print the start order without running atmos")
+    args = parser.parse_args()
+
+    if args.command == "apply" and not args.auto_approve and not args.dry_run:
+        print("Error: apply runs components concurrently and needs --auto-approve", file=sys.stderr)
+        sys.exit(1)
+    if args.detailed_exitcode and args.command != "plan":
+        print("Error: --detailed-exitcode only applies to plan", file=sys.stderr)
+        sys.exit(1)
+
+    durations = None
+    if args.durations:
+        with open(args.durations, "r") as f:
+            durations = json.load(f)
+
+    resolver = StackResolver.for_repo(args.repo_root)
+    executor = StackExecutor(
+        args.repo_root, args.command, jobs=args.jobs, atmos=args.atmos,
+        extra_args=["-detailed-exitcode"] if args.detailed_exitcode else [],
+        plan_dir=args.plan_dir, log_dir=args.log_dir, durations=durations, dry_run=args.dry_run,
+        provider_cache=ProviderCache(resolver) if args.plugin_cache else None,
+        outputs_store=OutputsStore(args.repo_root, components_path=resolver.graph.components_base_path)
+    )
+    for name in args.stacks:
+        stack = find_stack(resolver, name)
+        if stack is None:
+            print(f"Error: {name} is not a stack", file=sys.stderr)
+            sys.exit(1)
+        dag = ComponentDAG.for_stack(resolver, stack)
+        for cycle in dag.cycles:
+            executor.log(f"Warning: dependency cycle in {name}: {' -> '.join(cycle)}; "
+                         f"skipping {', '.join(dag.blocked)}")
+        executor.add_stack(dag, args.component)
+
+    results = executor.run()
+    executor.print_summary()
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(executor.report(), f, indent=2)
+
+    statuses = {r["status"] for r in results.values()}
+    if statuses - set(SUCCEEDED):
+        sys.exit(1)
+    sys.exit(2 if "changes" in statuses else 0)
+
+
+if __name__ == "__main__":
+    main()
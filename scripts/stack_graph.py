@@ -0,0 +1,689 @@
+#!/usr/bin/env python3
+"""
+Atmos Stack Import Graph
+
+Builds an index of every YAML manifest under the stacks base path and the
+`import:` edges between them, so that questions such as "which stacks pull
+in catalog/vpc/defaults" or "what does orgs/fnx/dev/eu-west-2/testenv-01
+import" can be answered without re-parsing the tree.
+
+Top-level stacks are the manifests matched by `stacks.included_paths` and
+not matched by `stacks.excluded_paths` in atmos.yaml. Import paths are
+resolved the way atmos resolves them: relative to the stacks base path,
+without the file extension, with `./` and `../` relative to the importing
+file and with glob patterns expanded against the known manifests.
+
+The index is serialized to .cache/stack-graph.json. On load only the files
+whose size or modification time changed are re-parsed.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./stack_graph.py stacks [options]
+    ./stack_graph.py imports <stack-or-file> [options]
+    ./stack_graph.py importers <file> [options]
+    ./stack_graph.py components <stack> [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    --rebuild             Ignore the serialized index and re-parse everything
+    --json                Print machine-readable JSON
+"""
+
+import os
+import sys
+import re
+import json
+import hashlib
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Set, Any, Tuple, Optional, Iterable
+
+import yaml
+
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_EXTENSIONS = (".yaml", ".yml")
+GLOB_CHARS = re.compile(r"[*?\[]")
+
+DEFAULT_INCLUDED_PATHS = ["orgs/**/*.yaml"]
+DEFAULT_EXCLUDED_PATHS = ["**/_defaults.yaml"]
+
+# Files atmos and terraform write into a component directory; they are not component source
+GENERATED_DIRS = {".terraform", ".terragrunt-cache"}
+GENERATED_FILES = re.compile(r"(backend\.tf\.json|.*\.tfvars\.json|.*\.planfile|.*\.tfplan|.*\.tfstate(\.backup)?)$")
+
+
+def glob_to_regex(pattern: str) -> "re.Pattern":
+    """Compile a doublestar glob (as used by atmos) into a regex.
+
+    `**` matches zero or more directories, `*` and `?` never cross `/`.
+    """
+    parts = pattern.strip("/").split("/")
+    regex = ""
+    for i, part in enumerate(parts):
+        last = i == len(parts) - 1
+        if part == "**":
+            regex += ".*" if last else "(?:[^/]+/)*"
+            continue
+        segment = ""
+        j = 0
+        while j < len(part):
+            char = part[j]
+            if char == "*":
+                segment += "[^/]*"
+            elif char == "?":
+                segment += "[^/]"
+            elif char == "[":
+                end = part.find("]", j + 1)
+                if end == -1:
+                    segment += re.escape(char)
+                else:
+                    body = part[j + 1:end]
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    segment += f"[{body}]"
+                    j = end
+            else:
+                segment += re.escape(char)
+            j += 1
+        regex += segment if last else segment + "/"
+    return re.compile("^" + regex + "$")
+
+
+def strip_extension(path: str) -> str:
+    """Remove a YAML extension from a stack path"""
+    for ext in YAML_EXTENSIONS:
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def load_yaml_file(file_path: str) -> Any:
+    """Parse a YAML file with the fastest available safe loader"""
+    with open(file_path, "r") as f:
+        return yaml.load(f, Loader=YAML_LOADER)
+
+
+def hash_tree(path: str, skip_dirs: Iterable[str] = ()) -> str:
+    """SHA-256 over the relative paths and contents of the source files under `path`"""
+    digest = hashlib.sha256()
+    skipped = GENERATED_DIRS.union(skip_dirs)
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in skipped)
+        for name in sorted(files):
+            if GENERATED_FILES.match(name):
+                continue
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode() + b"\0")
+            with open(file_path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def write_json_atomic(file_path: str, data: Any, **kwargs):
+    """Write JSON to a temporary file and rename it over `file_path`"""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, file_path)
+
+
+def git_changed_files(repo_root: str, base: str) -> List[str]:
+    """Files changed since `base`, relative to repo_root.
+
+    Compares the merge base of `base` and HEAD with the working tree, so
+    committed, staged and unstaged changes are all included, plus untracked
+    files. Renames are reported as a deletion and an addition so that both
+    the old and the new path are seen.
+    """
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", "-C", repo_root] + list(args),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+        ).stdout
+
+    try:
+        revision = git("merge-base", base, "HEAD").strip() or base
+    except subprocess.CalledProcessError:
+        revision = base
+    changed = git("diff", "--name-only", "--no-renames", "--relative", revision, "--").splitlines()
+    changed += git("ls-files", "--others", "--exclude-standard").splitlines()
+    return sorted(set(path for path in changed if path))
+
+
+def normalize_imports(content: Any) -> List[str]:
+    """Return the import paths declared by a manifest.
+
+    Atmos accepts plain strings or mappings with a `path` key.
+    """
+    if not isinstance(content, dict):
+        return []
+    imports = content.get("import") or []
+    if isinstance(imports, str):
+        imports = [imports]
+    paths = []
+    for imp in imports if isinstance(imports, list) else []:
+        if isinstance(imp, str):
+            paths.append(imp)
+        elif isinstance(imp, dict) and isinstance(imp.get("path"), str):
+            paths.append(imp["path"])
+    return paths
+
+
+def extract_components(content: Any) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Return the component declarations of a manifest keyed by type and name"""
+    result = {}
+    if not isinstance(content, dict):
+        return result
+    components = content.get("components")
+    if not isinstance(components, dict):
+        return result
+    for component_type, entries in components.items():
+        if not isinstance(entries, dict):
+            continue
+        for name, config in entries.items():
+            config = config if isinstance(config, dict) else {}
+            metadata = config.get("metadata") if isinstance(config.get("metadata"), dict) else {}
+            inherits = metadata.get("inherits") or []
+            result.setdefault(component_type, {})[name] = {
+                "component": metadata.get("component") or name,
+                "inherits": [i for i in inherits if isinstance(i, str)] if isinstance(inherits, list) else [],
+                "abstract": metadata.get("type") == "abstract",
+                "depends_on": [d for d in config.get("depends_on") or [] if isinstance(d, str)],
+            }
+    return result
+
+
+class StackGraph:
+    """Import graph over all manifests under the stacks base path"""
+
+    INDEX_VERSION = 1
+
+    def __init__(self, repo_root: str, base_path: str = "stacks",
+                 included_paths: Optional[List[str]] = None,
+                 excluded_paths: Optional[List[str]] = None,
+                 index_path: Optional[str] = None,
+                 components_base_path: str = "components/terraform"):
+        self.repo_root = os.path.abspath(repo_root)
+        self.base_path = base_path
+        self.stacks_path = os.path.join(self.repo_root, base_path)
+        self.included_paths = list(included_paths or DEFAULT_INCLUDED_PATHS)
+        self.excluded_paths = list(excluded_paths or DEFAULT_EXCLUDED_PATHS)
+        self.index_path = index_path or os.path.join(self.repo_root, ".cache", "stack-graph.json")
+        self.components_base_path = components_base_path.strip("/")
+
+        self._included = [glob_to_regex(p) for p in self.included_paths]
+        self._excluded = [glob_to_regex(p) for p in self.excluded_paths]
+
+        # key (stack path without extension) -> node
+        self.nodes = {}  # type: Dict[str, Dict[str, Any]]
+        self._reset_derived()
+
+    @classmethod
+    def from_atmos_config(cls, repo_root: str, **kwargs) -> "StackGraph":
+        """Create a graph using the `stacks` section of atmos.yaml"""
+        atmos = {}
+        atmos_config = os.path.join(repo_root, "atmos.yaml")
+        if os.path.exists(atmos_config):
+            atmos = load_yaml_file(atmos_config) or {}
+        config = atmos.get("stacks") or {}
+        terraform = (atmos.get("components") or {}).get("terraform") or {}
+        kwargs.setdefault("components_base_path", terraform.get("base_path", "components/terraform"))
+        return cls(
+            repo_root,
+            base_path=config.get("base_path", "stacks"),
+            included_paths=config.get("included_paths"),
+            excluded_paths=config.get("excluded_paths"),
+            **kwargs
+        )
+
+    def _reset_derived(self):
+        """Drop edges and memoized query results"""
+        self._edges = {}  # type: Dict[str, List[str]]
+        self._missing = {}  # type: Dict[str, List[str]]
+        self._reverse = defaultdict(set)  # type: Dict[str, Set[str]]
+        self._imports_memo = {}  # type: Dict[str, List[str]]
+        self._importers_memo = {}  # type: Dict[str, Set[str]]
+        self._cycles = []  # type: List[List[str]]
+        self._stacks = None  # type: Optional[List[str]]
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+    # ------------------------------------------------------------------
+
+    def config_fingerprint(self) -> Dict[str, Any]:
+        """Settings that invalidate a serialized index when changed"""
+        return {
+            "version": self.INDEX_VERSION,
+            "base_path": self.base_path,
+            "included_paths": self.included_paths,
+            "excluded_paths": self.excluded_paths,
+        }
+
+    def scan(self) -> Dict[str, Tuple[str, int, int]]:
+        """Walk the stacks tree and return key -> (relative path, mtime_ns, size)"""
+        found = {}
+        stack = [self.stacks_path]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(YAML_EXTENSIONS):
+                    rel_path = os.path.relpath(entry.path, self.stacks_path).replace(os.sep, "/")
+                    stat = entry.stat()
+                    found[strip_extension(rel_path)] = (rel_path, stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def parse_node(self, rel_path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+        """Parse one manifest into a graph node"""
+        node = {
+            "path": rel_path,
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "imports": [],
+            "components": {},
+            "error": None,
+        }
+        try:
+            content = load_yaml_file(os.path.join(self.stacks_path, rel_path))
+        except (yaml.YAMLError, OSError) as e:
+            node["error"] = str(e)
+            return node
+        node["imports"] = normalize_imports(content)
+        node["components"] = extract_components(content)
+        return node
+
+    def refresh(self, paths: Optional[List[str]] = None) -> Set[str]:
+        """Re-parse new or modified manifests and drop deleted ones.
+
+        When `paths` is given only those files are checked, which is what
+        watch mode uses; otherwise the whole tree is stat-ed. Returns the
+        set of keys that were added, changed or removed.
+        """
+        changed = set()
+        if paths is None:
+            found = self.scan()
+            for key in list(self.nodes):
+                if key not in found:
+                    del self.nodes[key]
+                    changed.add(key)
+        else:
+            found = {}
+            for path in paths:
+                key = self.key_for_path(path)
+                if key is None:
+                    continue
+                for ext in YAML_EXTENSIONS:
+                    abs_path = os.path.join(self.stacks_path, key + ext)
+                    if os.path.exists(abs_path):
+                        stat = os.stat(abs_path)
+                        found[key] = (key + ext, stat.st_mtime_ns, stat.st_size)
+                        break
+                else:
+                    if key in self.nodes:
+                        del self.nodes[key]
+                        changed.add(key)
+
+        for key, (rel_path, mtime_ns, size) in found.items():
+            node = self.nodes.get(key)
+            if node and node["path"] == rel_path and node["mtime_ns"] == mtime_ns and node["size"] == size:
+                continue
+            self.nodes[key] = self.parse_node(rel_path, mtime_ns, size)
+            changed.add(key)
+
+        if changed or not self._edges:
+            self._link()
+        return changed
+
+    def build(self) -> "StackGraph":
+        """Parse the whole stacks tree from scratch"""
+        self.nodes = {}
+        self.refresh()
+        return self
+
+    def load(self, rebuild: bool = False) -> "StackGraph":
+        """Load the serialized index, refresh stale entries and save it back"""
+        if not rebuild and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    data = json.load(f)
+                if data.get("config") == self.config_fingerprint():
+                    self.nodes = data.get("nodes", {})
+            except (OSError, ValueError):
+                self.nodes = {}
+        changed = self.refresh() if self.nodes else self.build().nodes.keys()
+        if changed or not os.path.exists(self.index_path):
+            self.save()
+        return self
+
+    def save(self):
+        """Write the index atomically"""
+        write_json_atomic(self.index_path, {"config": self.config_fingerprint(), "nodes": self.nodes},
+                          separators=(",", ":"))
+
+    def _resolve_import(self, importer: str, imp: str) -> List[str]:
+        """Resolve one import string of `importer` to node keys"""
+        if imp.startswith("./") or imp.startswith("../"):
+            imp = os.path.normpath(os.path.join(os.path.dirname(importer), imp)).replace(os.sep, "/")
+        imp = strip_extension(imp.strip("/"))
+        if GLOB_CHARS.search(imp):
+            pattern = glob_to_regex(imp)
+            return sorted(key for key in self.nodes if key != importer and pattern.match(key))
+        return [imp] if imp in self.nodes else []
+
+    def _link(self):
+        """Resolve import strings into edges and reverse edges"""
+        self._reset_derived()
+        for key, node in self.nodes.items():
+            edges = []
+            for imp in node["imports"]:
+                resolved = self._resolve_import(key, imp)
+                if not resolved:
+                    self._missing.setdefault(key, []).append(imp)
+                for target in resolved:
+                    if target not in edges:
+                        edges.append(target)
+                    self._reverse[target].add(key)
+            self._edges[key] = edges
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def key_for_path(self, path: str) -> Optional[str]:
+        """Map a file path (absolute, repo-relative or stack-relative) to a node key"""
+        abs_path = path if os.path.isabs(path) else os.path.join(self.repo_root, path)
+        rel_path = os.path.relpath(abs_path, self.stacks_path).replace(os.sep, "/")
+        if not rel_path.startswith("../"):
+            return strip_extension(rel_path) if rel_path.endswith(YAML_EXTENSIONS) else None
+        # Stack-relative form, e.g. "catalog/vpc/defaults"
+        key = strip_extension(path.strip("/"))
+        return key if key in self.nodes else None
+
+    def is_stack(self, key: str) -> bool:
+        """Whether a manifest is a top-level stack per included/excluded paths"""
+        node = self.nodes.get(key)
+        if node is None:
+            return False
+        path = node["path"]
+        return any(p.match(path) for p in self._included) and not any(p.match(path) for p in self._excluded)
+
+    @property
+    def stacks(self) -> List[str]:
+        """All top-level stack names"""
+        if self._stacks is None:
+            self._stacks = sorted(key for key in self.nodes if self.is_stack(key))
+        return self._stacks
+
+    @property
+    def cycles(self) -> List[List[str]]:
+        """Import cycles found while computing transitive imports"""
+        for key in self.nodes:
+            self.imports_of(key)
+        return self._cycles
+
+    def direct_imports(self, key: str) -> List[str]:
+        """Keys imported directly by a manifest, in declaration order"""
+        return list(self._edges.get(key, []))
+
+    def direct_importers(self, key: str) -> Set[str]:
+        """Keys that directly import a manifest"""
+        return set(self._reverse.get(key, ()))
+
+    def missing_imports(self, key: str) -> List[str]:
+        """Import strings of a manifest that resolve to no file"""
+        return list(self._missing.get(key, []))
+
+    def imports_of(self, key: str) -> List[str]:
+        """Transitive imports of a manifest in atmos merge order (deepest first)"""
+        if key in self._imports_memo:
+            return self._imports_memo[key]
+
+        order = []  # type: List[str]
+        seen = set()  # type: Set[str]
+        path = []  # type: List[str]
+
+        def visit(current: str):
+            for target in self._edges.get(current, []):
+                if target in path:
+                    cycle = path[path.index(target):] + [target]
+                    if cycle not in self._cycles:
+                        self._cycles.append(cycle)
+                    continue
+                if target in seen:
+                    continue
+                if target in self._imports_memo:
+                    for sub in self._imports_memo[target]:
+                        if sub not in seen:
+                            seen.add(sub)
+                            order.append(sub)
+                else:
+                    path.append(target)
+                    visit(target)
+                    path.pop()
+                seen.add(target)
+                order.append(target)
+
+        path.append(key)
+        visit(key)
+        self._imports_memo[key] = order
+        return order
+
+    def importers_of(self, key: str) -> Set[str]:
+        """Every manifest that imports `key` directly or transitively"""
+        if key in self._importers_memo:
+            return self._importers_memo[key]
+        result = set()
+        pending = [key]
+        while pending:
+            current = pending.pop()
+            for importer in self._reverse.get(current, ()):
+                if importer not in result:
+                    result.add(importer)
+                    pending.append(importer)
+        result.discard(key)
+        self._importers_memo[key] = result
+        return result
+
+    def stacks_importing(self, key: str) -> List[str]:
+        """Top-level stacks affected by `key`, including `key` itself if it is a stack"""
+        affected = {k for k in self.importers_of(key) if self.is_stack(k)}
+        if self.is_stack(key):
+            affected.add(key)
+        return sorted(affected)
+
+    def stack_files(self, stack: str) -> List[str]:
+        """All manifests that make up a stack, in merge order, ending with the stack itself"""
+        return self.imports_of(stack) + [stack]
+
+    def stack_fingerprint(self, stack: str) -> str:
+        """Identity of every manifest a stack is made of, by path, mtime and size"""
+        digest = hashlib.sha256()
+        for key in self.stack_files(stack):
+            node = self.nodes[key]
+            digest.update(f"{key}:{node['mtime_ns']}:{node['size']}\n".encode())
+        return digest.hexdigest()
+
+    def stack_components(self, stack: str) -> Dict[str, Dict[str, Any]]:
+        """Components visible in a stack with their defining files and resolved inherits chain.
+
+        Keys are `<type>/<name>`, e.g. `terraform/vpc/main`.
+        """
+        declared = {}  # type: Dict[str, Dict[str, Any]]
+        for key in self.stack_files(stack):
+            for component_type, entries in self.nodes[key]["components"].items():
+                for name, info in entries.items():
+                    entry = declared.setdefault(f"{component_type}/{name}", {
+                        "type": component_type,
+                        "name": name,
+                        "component": info["component"],
+                        "inherits": [],
+                        "abstract": False,
+                        "depends_on": [],
+                        "files": [],
+                    })
+                    entry["files"].append(key)
+                    # Later manifests override earlier ones, like the atmos deep merge
+                    if info["component"] != name:
+                        entry["component"] = info["component"]
+                    if info["inherits"]:
+                        entry["inherits"] = list(info["inherits"])
+                    if info["depends_on"]:
+                        entry["depends_on"] = list(info["depends_on"])
+                    entry["abstract"] = info["abstract"]
+
+        for qualified, entry in declared.items():
+            chain = []  # type: List[str]
+            missing = []  # type: List[str]
+
+            def walk(name: str, trail: Tuple[str, ...]):
+                base = declared.get(f"{entry['type']}/{name}")
+                if base is None:
+                    missing.append(name)
+                    return
+                for parent in base["inherits"]:
+                    if parent in trail:
+                        missing.append(f"{parent} (cycle)")
+                        continue
+                    walk(parent, trail + (parent,))
+                if name != entry["name"] and name not in chain:
+                    chain.append(name)
+
+            walk(entry["name"], (entry["name"],))
+            entry["inherits_chain"] = chain
+            entry["missing_inherits"] = missing
+            entry["inherited_files"] = sorted({
+                f for base in chain for f in declared[f"{entry['type']}/{base}"]["files"]
+            })
+        return declared
+
+    def importers_of_removed(self, key: str) -> Set[str]:
+        """Manifests that imported a manifest which no longer exists"""
+        importers = set()
+        for importer, node in self.nodes.items():
+            for imp in node["imports"]:
+                if imp.startswith("./") or imp.startswith("../"):
+                    imp = os.path.normpath(os.path.join(os.path.dirname(importer), imp)).replace(os.sep, "/")
+                imp = strip_extension(imp.strip("/"))
+                if imp == key or (GLOB_CHARS.search(imp) and glob_to_regex(imp).match(key)):
+                    importers.add(importer)
+        return importers
+
+    def affected_stacks(self, paths: List[str]) -> Dict[str, List[str]]:
+        """Map changed repo-relative paths to the stacks they affect.
+
+        A manifest affects every stack that imports it, directly or
+        transitively, including through glob imports and imports of files
+        that have since been deleted. atmos.yaml and the stack schemas affect
+        every stack. A Terraform component directory affects the stacks with
+        a component pointing at it. Anything else affects no stack.
+        Returns stack -> changed paths responsible.
+        """
+        affected = defaultdict(list)  # type: Dict[str, List[str]]
+        schemas_prefix = f"{self.base_path}/schemas/"
+        components_prefix = self.components_base_path + "/"
+        component_dirs = None  # type: Optional[Dict[str, Set[str]]]
+
+        for path in paths:
+            path = path.replace(os.sep, "/")
+            if path == "atmos.yaml" or path.startswith(schemas_prefix):
+                for stack in self.stacks:
+                    affected[stack].append(path)
+                continue
+
+            if path.startswith(components_prefix):
+                if component_dirs is None:
+                    component_dirs = defaultdict(set)
+                    for stack in self.stacks:
+                        for entry in self.stack_components(stack).values():
+                            component_dirs[entry["component"].strip("/")].add(stack)
+                relative = path[len(components_prefix):]
+                for component, stacks in component_dirs.items():
+                    if relative.startswith(component + "/"):
+                        for stack in stacks:
+                            affected[stack].append(path)
+                continue
+
+            key = self.key_for_path(path)
+            if key is None:
+                continue
+            if key in self.nodes:
+                stacks = self.stacks_importing(key)
+            else:
+                importers = self.importers_of_removed(key)
+                stacks = sorted({s for i in importers for s in self.stacks_importing(i)})
+            for stack in stacks:
+                affected[stack].append(path)
+        return dict(affected)
+
+
+def main():
+    """Main entry point for the script"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    common.add_argument("--rebuild", action="store_true", help="Ignore the serialized index and re-parse everything")
+    common.add_argument("--json", action="store_true", help="Print machine-readable JSON")
+    parser = argparse.ArgumentParser(description="Query the Atmos stack import graph")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("stacks", parents=[common], help="List top-level stacks")
+    imports_parser = subparsers.add_parser("imports", parents=[common], help="What does a stack or manifest pull in")
+    imports_parser.add_argument("target")
+    importers_parser = subparsers.add_parser("importers", parents=[common], help="What imports a manifest")
+    importers_parser.add_argument("target")
+    components_parser = subparsers.add_parser("components", parents=[common],
+                                              help="Components of a stack with inherits chains")
+    components_parser.add_argument("target")
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    graph = StackGraph.from_atmos_config(args.repo_root).load(rebuild=args.rebuild)
+
+    target = None
+    if args.command != "stacks":
+        target = graph.key_for_path(args.target)
+        if target is None or target not in graph.nodes:
+            print(f"Error: {args.target} is not a manifest under {graph.base_path}/")
+            sys.exit(1)
+
+    if args.command == "stacks":
+        result = graph.stacks
+    elif args.command == "imports":
+        result = graph.imports_of(target)
+    elif args.command == "importers":
+        result = {"files": sorted(graph.importers_of(target)), "stacks": graph.stacks_importing(target)}
+    else:
+        result = graph.stack_components(target)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif isinstance(result, dict) and args.command == "importers":
+        print("Stacks:")
+        for stack in result["stacks"]:
+            print(f"  {stack}")
+        print("Files:")
+        for key in result["files"]:
+            print(f"  {key}")
+    elif isinstance(result, dict):
+        for qualified, entry in sorted(result.items()):
+            chain = " <- ".join(entry["inherits_chain"])
+            print(f"{qualified} ({entry['component']}){' inherits ' + chain if chain else ''}")
+    else:
+        for key in result:
+            print(key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Atmos Stack Resolver
+
+Resolves stacks to their final component configuration without the atmos
+binary, following the atmos merge rules:
+
+1. Imports are processed depth-first in declaration order and the importing
+   manifest is deep-merged on top of them.
+2. Maps are merged recursively; lists follow `settings.list_merge_strategy`
+   from atmos.yaml (replace, append or merge).
+3. A component's configuration is the deep merge of its `metadata.inherits`
+   chain (each base with its own bases first) and then its own sections.
+   `metadata` itself is never inherited.
+4. Global `vars`/`settings`/`env` are merged under the component-type level
+   (`terraform.vars`, ...) and then under the component's own sections.
+
+Every manifest is resolved once and memoized, so shared bases such as
+catalog/vpc/defaults are merged a single time no matter how many stacks
+import them. Results share structure with the memo and must be treated as
+read-only.
+
+Template placeholders such as ${tenant} and {{ .vars.x }} are left as-is.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./stack_resolver.py [options]                         Resolve every stack and print a summary
+    ./stack_resolver.py [options] <stack>                 Print every component of a stack
+    ./stack_resolver.py [options] <stack> -c <component>  Print one component
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -c, --component NAME  Component to print
+    --include-abstract    Include abstract components
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Set, Any, Tuple, Optional, Iterable
+
+import yaml
+
+from stack_graph import StackGraph, load_yaml_file
+
+# Component sections that are merged with the global and component-type level
+MERGED_SECTIONS = ("vars", "settings", "env")
+
+PLACEHOLDER = re.compile(r"\$\{([\w.-]+)\}")
+
+FALSE_STRINGS = {"false", "no", "off", "0"}
+
+
+def deep_merge(base: Any, override: Any, list_strategy: str = "replace") -> Any:
+    """Merge `override` into `base` without mutating either.
+
+    Unchanged subtrees are shared with the inputs rather than copied.
+    """
+    if isinstance(base, dict) and isinstance(override, dict):
+        if not base:
+            return override
+        if not override:
+            return base
+        merged = dict(base)
+        for key, value in override.items():
+            if key in merged:
+                merged[key] = deep_merge(merged[key], value, list_strategy)
+            else:
+                merged[key] = value
+        return merged
+    if isinstance(base, list) and isinstance(override, list):
+        if list_strategy == "append":
+            return base + override
+        if list_strategy == "merge":
+            merged_list = [
+                deep_merge(base[i], override[i], list_strategy) if i < len(base) else override[i]
+                for i in range(len(override))
+            ]
+            return merged_list + base[len(override):]
+    return override
+
+
+def fill_placeholders(value: Any, context: Dict[str, Any]) -> Any:
+    """Replace ${name} in strings with values from `context`, leaving unknown names as-is"""
+    if isinstance(value, str):
+        return PLACEHOLDER.sub(lambda m: str(context.get(m.group(1), m.group(0))), value)
+    if isinstance(value, dict):
+        return {k: fill_placeholders(v, context) for k, v in value.items()}
+    if isinstance(value, list):
+        return [fill_placeholders(v, context) for v in value]
+    return value
+
+
+def is_false(value: Any) -> bool:
+    """Whether a var value means false, including its common string spellings"""
+    return value is False or (isinstance(value, str) and value.strip().lower() in FALSE_STRINGS)
+
+
+class StackResolver:
+    """Memoized, atmos-compatible deep merge of stacks and components"""
+
+    def __init__(self, graph: StackGraph, list_merge_strategy: Optional[str] = None):
+        self.graph = graph
+        atmos_config_path = os.path.join(graph.repo_root, "atmos.yaml")
+        atmos_config = (load_yaml_file(atmos_config_path) or {}) if os.path.exists(atmos_config_path) else {}
+        if list_merge_strategy is None:
+            list_merge_strategy = (atmos_config.get("settings") or {}).get("list_merge_strategy", "replace")
+        self.list_merge_strategy = list_merge_strategy
+        # components.<type> in atmos.yaml, for the backend defaults
+        self.component_defaults = atmos_config.get("components") or {}  # type: Dict[str, Any]
+
+        self._content = {}  # type: Dict[str, Any]
+        self._resolved = {}  # type: Dict[str, Dict[str, Any]]
+        self._stacks = {}  # type: Dict[str, Dict[str, Any]]
+        self.errors = {}  # type: Dict[str, str]
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_repo(cls, repo_root: str) -> "StackResolver":
+        """Create a resolver over the serialized import graph of a repository"""
+        return cls(StackGraph.from_atmos_config(repo_root).load())
+
+    def merge(self, base: Any, override: Any) -> Any:
+        """Deep merge using the configured list strategy"""
+        return deep_merge(base, override, self.list_merge_strategy)
+
+    def invalidate(self, keys: Iterable[str]):
+        """Forget cached results for changed manifests and everything importing them"""
+        stale = set()  # type: Set[str]
+        for key in keys:
+            stale.add(key)
+            importers = {key} if key in self.graph.nodes else self.graph.importers_of_removed(key)
+            for importer in importers:
+                stale.add(importer)
+                stale.update(self.graph.importers_of(importer))
+        for key in stale:
+            self._content.pop(key, None)
+            self._resolved.pop(key, None)
+            self._stacks.pop(key, None)
+            self.errors.pop(key, None)
+
+    def content(self, key: str) -> Dict[str, Any]:
+        """Parsed content of one manifest"""
+        if key not in self._content:
+            node = self.graph.nodes[key]
+            try:
+                content = load_yaml_file(os.path.join(self.graph.stacks_path, node["path"]))
+            except (yaml.YAMLError, OSError) as e:
+                self.errors[key] = str(e)
+                content = None
+            self._content[key] = content if isinstance(content, dict) else {}
+        return self._content[key]
+
+    def resolve_manifest(self, key: str, _visiting: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Deep merge of a manifest's imports (in order) with its own content"""
+        if key in self._resolved:
+            self.hits += 1
+            return self._resolved[key]
+        self.misses += 1
+
+        visiting = _visiting if _visiting is not None else set()
+        visiting.add(key)
+        merged = {}  # type: Dict[str, Any]
+        for target in self.graph.direct_imports(key):
+            if target in visiting:
+                # Import cycles are reported by the graph; break them here
+                continue
+            merged = self.merge(merged, self.resolve_manifest(target, visiting))
+        own = {k: v for k, v in self.content(key).items() if k != "import"}
+        merged = self.merge(merged, own)
+        visiting.discard(key)
+
+        self._resolved[key] = merged
+        return merged
+
+    def _inherited(self, components: Dict[str, Any], name: str, trail: List[str],
+                   memo: Dict[str, Tuple[Dict[str, Any], List[str]]]) -> Tuple[Dict[str, Any], List[str]]:
+        """Merged sections of a component and its resolved inherits chain"""
+        if name in memo:
+            return memo[name]
+        own = components.get(name)
+        if not isinstance(own, dict):
+            return {}, []
+        merged = {}  # type: Dict[str, Any]
+        chain = []  # type: List[str]
+        metadata = own.get("metadata") if isinstance(own.get("metadata"), dict) else {}
+        for base in metadata.get("inherits") or []:
+            if base in trail or base not in components:
+                continue
+            base_merged, base_chain = self._inherited(components, base, trail + [base], memo)
+            merged = self.merge(merged, base_merged)
+            for parent in base_chain + [base]:
+                if parent not in chain:
+                    chain.append(parent)
+        merged = self.merge(merged, {k: v for k, v in own.items() if k != "metadata"})
+        memo[name] = (merged, chain)
+        return memo[name]
+
+    def resolve_stack(self, stack: str, include_abstract: bool = False) -> Dict[str, Any]:
+        """Final configuration of every component in a stack.
+
+        Returns {"vars", "settings", "env", "components": {type: {name: config}}}.
+        """
+        if stack not in self._stacks:
+            config = self.resolve_manifest(stack)
+            resolved_components = {}  # type: Dict[str, Dict[str, Any]]
+            for component_type, components in (config.get("components") or {}).items():
+                if not isinstance(components, dict):
+                    continue
+                type_section = config.get(component_type) if isinstance(config.get(component_type), dict) else {}
+                memo = {}  # type: Dict[str, Tuple[Dict[str, Any], List[str]]]
+                for name, own in components.items():
+                    if not isinstance(own, dict):
+                        continue
+                    merged, chain = self._inherited(components, name, [name], memo)
+                    metadata = own.get("metadata") if isinstance(own.get("metadata"), dict) else {}
+
+                    final = dict(merged)
+                    for section in MERGED_SECTIONS:
+                        final[section] = self.merge(
+                            self.merge(config.get(section) or {}, type_section.get(section) or {}),
+                            merged.get(section) or {}
+                        )
+                    if "backend" in type_section or "backend" in merged:
+                        final["backend"] = self.merge(type_section.get("backend") or {}, merged.get("backend") or {})
+                    final["backend_type"] = merged.get("backend_type") or type_section.get("backend_type")
+                    final["metadata"] = metadata
+                    final["component"] = metadata.get("component") or own.get("component") or name
+                    final["inheritance"] = chain
+                    final["abstract"] = metadata.get("type") == "abstract"
+                    resolved_components.setdefault(component_type, {})[name] = final
+
+            self._stacks[stack] = {
+                "vars": config.get("vars") or {},
+                "settings": config.get("settings") or {},
+                "env": config.get("env") or {},
+                "components": resolved_components,
+            }
+
+        result = self._stacks[stack]
+        if include_abstract:
+            return result
+        return dict(result, components={
+            component_type: {name: c for name, c in components.items() if not c["abstract"]}
+            for component_type, components in result["components"].items()
+        })
+
+    def resolve_component(self, stack: str, component: str,
+                          component_type: str = "terraform") -> Optional[Dict[str, Any]]:
+        """Final configuration of one component in a stack"""
+        components = self.resolve_stack(stack, include_abstract=True)["components"]
+        return components.get(component_type, {}).get(component)
+
+    def backend_config(self, stack: str, component: str,
+                       component_type: str = "terraform") -> Tuple[Optional[str], Dict[str, Any]]:
+        """Backend type and configuration of a component.
+
+        The backend section of atmos.yaml is merged under the component's own
+        and ${var} placeholders are filled from the component's vars, with
+        ${component} standing for the Terraform component.
+        """
+        config = self.resolve_component(stack, component, component_type)
+        if config is None:
+            return None, {}
+        defaults = self.component_defaults.get(component_type) or {}
+        backend_type = config.get("backend_type") or defaults.get("backend_type")
+        if not backend_type:
+            return None, {}
+        backend = self.merge((defaults.get("backend") or {}).get(backend_type) or {},
+                             (config.get("backend") or {}).get(backend_type) or {})
+        context = dict(config.get("vars") or {}, component=config["component"])
+        return backend_type, fill_placeholders(backend, context)
+
+    def resolve_all(self, stacks: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Resolve many stacks, sharing the manifest memo between them"""
+        return {stack: self.resolve_stack(stack) for stack in (stacks if stacks is not None else self.graph.stacks)}
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Resolve Atmos stacks to final component configuration")
+    parser.add_argument("stack", nargs="?", help="Stack to print, e.g. orgs/fnx/dev/eu-west-2/testenv-01")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-c", "--component", help="Component to print")
+    parser.add_argument("--include-abstract", action="store_true", help="Include abstract components")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    resolver = StackResolver.for_repo(args.repo_root)
+
+    if not args.stack:
+        resolved = resolver.resolve_all()
+        elapsed = time.perf_counter() - start
+        for stack, config in resolved.items():
+            count = sum(len(c) for c in config["components"].values())
+            print(f"{stack}: {count} components")
+        print(f"\nResolved {len(resolved)} stacks in {elapsed * 1000:.1f}ms "
+              f"({resolver.misses} manifests merged, {resolver.hits} memo hits)")
+        for key, error in sorted(resolver.errors.items()):
+            print(f"Error: {key}: {error}")
+        sys.exit(1 if resolver.errors else 0)
+
+    if args.stack not in resolver.graph.nodes or not resolver.graph.is_stack(args.stack):
+        print(f"Error: {args.stack} is not a stack")
+        sys.exit(1)
+
+    if args.component:
+        result = resolver.resolve_component(args.stack, args.component)
+        if result is None:
+            print(f"Error: component {args.component} not found in {args.stack}")
+            sys.exit(1)
+    else:
+        result = resolver.resolve_stack(args.stack, include_abstract=args.include_abstract)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Stack Scaffolding
+
+Creates tenant, account, region and environment stacks in bulk from a
+matrix spec, in the layout of stacks/orgs:
+
+    orgs/<tenant>/_defaults.yaml
+    orgs/<tenant>/<account>/_defaults.yaml
+    orgs/<tenant>/<account>/<region>/_defaults.yaml
+    orgs/<tenant>/<account>/<region>/<environment>.yaml
+    orgs/<tenant>/<account>/<region>/<environment>/components/globals.yaml
+    orgs/<tenant>/<account>/<region>/<environment>/components/<template>.yaml
+
+The last file imports catalog/templates/<template>. Tenant, stage and region
+mixins are added when missing.
+
+Every environment gets its own VPC CIDR from cidr_pool. Environments that
+already exist keep theirs, and CIDRs used by other stacks are skipped. The
+CIDR is set as vpc_cidr and as the template's own VPC CIDR var (e.g.
+web_app_vpc_cidr). Template vars without a default that the spec doesn't
+set are listed as warnings.
+
+Files are rendered in one process and written on a thread pool. Writes are
+idempotent: identical files are left alone, and files that differ are kept
+unless --force is given. New content goes to a temporary file that is
+renamed over the target. Afterwards the import graph is refreshed and every
+scaffolded stack is checked:
+
+- it is matched by stacks.included_paths
+- its imports exist, parse and don't form a cycle
+- it resolves to the tenant-account-environment name, and no other stack
+  has that name
+
+Spec:
+
+    tenants: [acme]                  # or tenant: acme
+    template: serverless-api         # default catalog template (optional)
+    cidr_pool: 10.64.0.0/10          # default: 10.64.0.0/10
+    cidr_prefix: 16                  # default: 16
+    vars:                            # vars of every environment
+      domain_name: example.com
+    accounts:
+      dev:
+        stage: dev                   # default: the account name
+        account_id: "111111111111"
+        regions:                     # region -> environments, or a list of
+          eu-west-2: [dev-01, dev-02]  # regions sharing `environments`
+          us-east-2: [dev-03]
+      prod:
+        regions: [eu-west-2]
+        environments:
+          - name: production
+            template: web-application
+            vpc_cidr: 10.20.0.0/16
+            vars: {app_domain_name: example.com}
+
+Stacks are named tenant-account-environment, so an environment name can
+only be used once per account, whatever its region.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+
+Usage:
+    ./stack_scaffold.py SPEC [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -j, --jobs N          Writer threads (default: 8)
+    --force               Overwrite scaffolded files that were changed since
+    --dry-run             Report what would be written without writing
+    -v, --verbose         List every file with its status
+
+Exit code: 0 on success, 1 when the spec is invalid or the sanity check fails.
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+import yaml
+
+from catalog_rewrite import write_text_atomic
+from stack_dag import stack_name
+from stack_graph import StackGraph, load_yaml_file
+from stack_resolver import StackResolver
+
+DEFAULT_CIDR_POOL = "10.64.0.0/10"
+DEFAULT_CIDR_PREFIX = 16
+
+NAME = re.compile(r"^[a-z][a-z0-9-]*$")
+
+# ${var} placeholders without a default, and the var a template reads its VPC CIDR from
+REQUIRED_PLACEHOLDER = re.compile(r"\$\{\s*([A-Za-z_]\w*)\s*\}")
+VPC_CIDR_PLACEHOLDER = re.compile(r"vpc_cidr:\s*[\"']?\$\{\s*([A-Za-z_]\w*)\s*\|")
+
+# Vars every scaffolded stack sets, and placeholders atmos fills in itself
+SCAFFOLD_VARS = {"tenant", "account", "account_id", "environment", "stage", "region", "namespace",
+                 "availability_zones", "vpc_cidr", "component"}
+
+HEADER = "# Generated by scripts/stack_scaffold.py; edit freely, rerunning the scaffold keeps your changes\n"
+
+
+class SpecError(ValueError):
+    """The matrix spec is invalid"""
+
+
+def dump(data: Dict[str, Any]) -> str:
+    """YAML in the order given, in block style"""
+    return yaml.safe_dump(data, sort_keys=False, default_flow_style=False)
+
+
+class Scaffolder:
+    """Renders, writes and checks the stacks of a matrix spec"""
+
+    def __init__(self, repo_root: str, spec: Dict[str, Any], force: bool = False, jobs: int = 8):
+        self.repo_root = os.path.abspath(repo_root)
+        self.graph = StackGraph.from_atmos_config(self.repo_root).load()
+        self.spec = spec or {}
+        self.force = force
+        self.jobs = max(1, jobs)
+        self.environments = []  # type: List[Dict[str, Any]]
+        self.files = {}  # type: Dict[str, str]
+        self.warnings = []  # type: List[str]
+        self._templates = {}  # type: Dict[str, Dict[str, Any]]
+
+    # ------------------------------------------------------------------
+    # Spec
+    # ------------------------------------------------------------------
+
+    def template(self, name: str) -> Dict[str, Any]:
+        """Import path, required vars and VPC CIDR vars of a catalog template"""
+        if name not in self._templates:
+            path = os.path.join(self.graph.stacks_path, "catalog", "templates", name + ".yaml")
+            if not os.path.exists(path):
+                raise SpecError(f"template {name} not found in {self.graph.base_path}/catalog/templates")
+            with open(path, "r") as f:
+                text = f.read()
+            self._templates[name] = {
+                "import": f"catalog/templates/{name}",
+                "required": sorted(set(REQUIRED_PLACEHOLDER.findall(text)) - SCAFFOLD_VARS),
+                "cidr_vars": sorted(set(VPC_CIDR_PLACEHOLDER.findall(text))),
+            }
+        return self._templates[name]
+
+    def expand(self) -> List[Dict[str, Any]]:
+        """One entry per tenant x account x region x environment of the spec"""
+        spec = self.spec
+        tenants = spec.get("tenants") or ([spec["tenant"]] if spec.get("tenant") else [])
+        accounts = spec.get("accounts") or {}
+        if not tenants or not isinstance(accounts, dict) or not accounts:
+            raise SpecError("the spec needs tenants (or tenant) and accounts")
+
+        environments = []
+        for tenant in tenants:
+            for account, account_spec in accounts.items():
+                account_spec = account_spec or {}
+                regions = account_spec.get("regions") or []
+                if not isinstance(regions, dict):
+                    regions = {region: account_spec.get("environments") for region in regions}
+                if not regions or not all(regions.values()):
+                    raise SpecError(f"account {account} needs regions and environments")
+                for region, entries in regions.items():
+                    for entry in entries:
+                        entry = {"name": entry} if isinstance(entry, str) else dict(entry or {})
+                        environment = {
+                            "tenant": str(tenant),
+                            "account": str(account),
+                            "stage": str(account_spec.get("stage", account)),
+                            "account_id": account_spec.get("account_id"),
+                            "region": str(region),
+                            "environment": str(entry.get("name", "")),
+                            "template": entry.get("template", account_spec.get("template", spec.get("template"))),
+                            "vpc_cidr": entry.get("vpc_cidr"),
+                            "vars": dict(spec.get("vars") or {}, **(account_spec.get("vars") or {}),
+                                         **(entry.get("vars") or {})),
+                        }
+                        for key in ("tenant", "account", "stage", "region", "environment"):
+                            if not NAME.match(environment[key]):
+                                raise SpecError(f"{key} {environment[key]!r} must start with a letter and contain "
+                                                "only lowercase letters, numbers and hyphens")
+                        environments.append(environment)
+
+        names = [self.stack_name(e) for e in environments]
+        duplicates = sorted({n for n in names if names.count(n) > 1})
+        if duplicates:
+            raise SpecError(f"the spec defines these stacks more than once: {', '.join(duplicates)} "
+                            "(stacks are named tenant-account-environment, so an environment name can only be "
+                            "used in one region of an account)")
+        return environments
+
+    @staticmethod
+    def stack_name(environment: Dict[str, Any]) -> str:
+        """tenant-account-environment name of a spec environment"""
+        return f"{environment['tenant']}-{environment['account']}-{environment['environment']}"
+
+    @staticmethod
+    def stack_key(environment: Dict[str, Any]) -> str:
+        """Graph key of a spec environment's stack manifest"""
+        return "orgs/{tenant}/{account}/{region}/{environment}".format(**environment)
+
+    # ------------------------------------------------------------------
+    # CIDRs
+    # ------------------------------------------------------------------
+
+    def allocate_cidrs(self):
+        """Give every environment without a vpc_cidr the next free network of the pool"""
+        resolver = StackResolver(self.graph)
+        owned = {}  # type: Dict[str, str]
+        used = []  # type: List[ipaddress.IPv4Network]
+        for key in self.graph.stacks:
+            cidr = (resolver.content(key).get("vars") or {}).get("vpc_cidr")
+            try:
+                network = ipaddress.ip_network(str(cidr), strict=False)
+            except ValueError:
+                continue
+            owned[key] = str(network)
+            used.append(network)
+
+        pending = []
+        for environment in self.environments:
+            if environment["vpc_cidr"] is None:
+                environment["vpc_cidr"] = owned.get(self.stack_key(environment))
+            if environment["vpc_cidr"] is None:
+                pending.append(environment)
+            else:
+                used.append(ipaddress.ip_network(str(environment["vpc_cidr"]), strict=False))
+        if not pending:
+            return
+
+        pool = ipaddress.ip_network(str(self.spec.get("cidr_pool", DEFAULT_CIDR_POOL)))
+        prefix = int(self.spec.get("cidr_prefix", DEFAULT_CIDR_PREFIX))
+        candidates = pool.subnets(new_prefix=prefix)
+        for environment in pending:
+            for network in candidates:
+                if not any(network.overlaps(u) for u in used):
+                    environment["vpc_cidr"] = str(network)
+                    used.append(network)
+                    break
+            else:
+                raise SpecError(f"cidr_pool {pool} has no free /{prefix} left for {self.stack_name(environment)}")
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def mixin_exists(self, kind: str, name: str) -> bool:
+        """Whether a mixin exists or is already planned"""
+        return f"mixins/{kind}/{name}" in self.graph.nodes or f"mixins/{kind}/{name}.yaml" in self.files
+
+    def add(self, key: str, text: str):
+        """Plan a file; shared defaults are planned by the first environment that needs them"""
+        self.files.setdefault(key + ".yaml", text)
+
+    def render(self, environment: Dict[str, Any]):
+        """Add the files of one environment, and the shared defaults and mixins it needs"""
+        tenant, account, region = environment["tenant"], environment["account"], environment["region"]
+        stage, name = environment["stage"], environment["environment"]
+        tenant_key, account_key = f"orgs/{tenant}", f"orgs/{tenant}/{account}"
+        region_key, stack_key = f"{account_key}/{region}", self.stack_key(environment)
+
+        for kind, value in (("tenant", tenant), ("stage", stage), ("region", region)):
+            if not self.mixin_exists(kind, value):
+                self.add(f"mixins/{kind}/{value}", f"# {kind.capitalize()} mixin: {value}\n{HEADER}\n" +
+                         dump({"vars": {kind: value}}))
+
+        self.add(f"{tenant_key}/_defaults", HEADER + "\n" + dump({"vars": {"namespace": tenant, "tenant": tenant}}))
+        account_vars = {"account": account}
+        if environment["account_id"]:
+            account_vars["account_id"] = str(environment["account_id"])
+        account_vars["aws_profile"] = account
+        self.add(f"{account_key}/_defaults", HEADER + "\n" + dump({
+            "import": [f"{tenant_key}/_defaults", f"mixins/tenant/{tenant}", f"mixins/stage/{stage}"],
+            "vars": account_vars,
+        }))
+        self.add(f"{region_key}/_defaults", HEADER + "\n" + dump({
+            "import": [f"{account_key}/_defaults", f"mixins/region/{region}"],
+            "vars": {"region": region, "availability_zones": [f"{region}{zone}" for zone in "abc"]},
+        }))
+
+        template = self.template(environment["template"]) if environment["template"] else None
+        components = [f"{stack_key}/components/globals"]
+        if template:
+            components.append(f"{stack_key}/components/{environment['template']}")
+
+        self.add(stack_key, f"# {self.stack_name(environment)} stack\n{HEADER}\n" + dump({
+            "import": ["catalog/_base/defaults", f"mixins/tenant/{tenant}", f"mixins/stage/{stage}",
+                       f"mixins/region/{region}", f"{account_key}/_defaults"] + components,
+            "vars": {"tenant": tenant, "account": account, "environment": name, "stage": stage,
+                     "namespace": tenant, "region": region, "vpc_cidr": environment["vpc_cidr"]},
+        }))
+
+        global_vars = {"environment": name}
+        if template:
+            global_vars.update({var: environment["vpc_cidr"] for var in template["cidr_vars"]})
+        global_vars.update(environment["vars"])
+        self.add(f"{stack_key}/components/globals", f"# Environment-wide settings for {name}\n{HEADER}\n" + dump({
+            "import": [f"{region_key}/_defaults"],
+            "vars": global_vars,
+            "tags": {"Tenant": tenant, "Account": account, "Environment": name, "ManagedBy": "Terraform",
+                     "Provisioner": "Atmos"},
+        }))
+
+        if template:
+            self.add(f"{stack_key}/components/{environment['template']}",
+                     f"# Components of the {environment['template']} template for {name}\n{HEADER}\n" +
+                     dump({"import": [f"{stack_key}/components/globals", template["import"]]}))
+            missing = [var for var in template["required"] if var not in global_vars]
+            if missing:
+                self.warnings.append(f"{self.stack_name(environment)}: {environment['template']} needs "
+                                     f"{', '.join(missing)} (set them under vars in the spec)")
+
+    def plan(self) -> Dict[str, str]:
+        """Stacks-relative path -> content of every file of the spec"""
+        self.environments = self.expand()
+        self.allocate_cidrs()
+        for environment in self.environments:
+            self.render(environment)
+        return self.files
+
+    # ------------------------------------------------------------------
+    # Writing and checking
+    # ------------------------------------------------------------------
+
+    def write_file(self, rel_path: str, text: str, dry_run: bool) -> str:
+        """Write one file unless it is unchanged or was edited; returns its status"""
+        path = os.path.join(self.graph.stacks_path, rel_path)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                if f.read() == text:
+                    return "unchanged"
+            if not self.force:
+                return "kept"
+            status = "updated"
+        else:
+            status = "created"
+        if not dry_run:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_text_atomic(path, text)
+        return status
+
+    def write(self, dry_run: bool = False) -> Dict[str, str]:
+        """Write every planned file on a thread pool; returns path -> status"""
+        paths = sorted(self.files)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            statuses = pool.map(lambda p: self.write_file(p, self.files[p], dry_run), paths)
+            return dict(zip(paths, statuses))
+
+    def sanity_check(self) -> List[str]:
+        """Problems of the scaffolded stacks in the refreshed import graph"""
+        graph = self.graph = StackGraph.from_atmos_config(self.repo_root).load()
+        resolver = StackResolver(graph)
+        problems = []
+        names = {}  # type: Dict[str, List[str]]
+        for stack in graph.stacks:
+            name = stack_name(resolver.resolve_stack(stack))
+            if name:
+                names.setdefault(name, []).append(stack)
+
+        cyclic = {key for cycle in graph.cycles for key in cycle}
+        for environment in self.environments:
+            key, expected = self.stack_key(environment), self.stack_name(environment)
+            if key not in graph.nodes:
+                problems.append(f"{expected}: {key}.yaml was not written")
+                continue
+            if not graph.is_stack(key):
+                problems.append(f"{expected}: {key}.yaml is not matched by stacks.included_paths")
+                continue
+            for file_key in graph.stack_files(key):
+                node = graph.nodes[file_key]
+                if node["error"]:
+                    problems.append(f"{expected}: {node['path']} is not valid YAML: {node['error'].splitlines()[0]}")
+                for missing in graph.missing_imports(file_key):
+                    problems.append(f"{expected}: {node['path']} imports {missing}, which doesn't exist")
+                if file_key in cyclic:
+                    problems.append(f"{expected}: {node['path']} is part of an import cycle")
+            resolved = stack_name(resolver.resolve_stack(key))
+            if resolved != expected:
+                problems.append(f"{expected}: {key}.yaml resolves to stack name {resolved}")
+            elif len(names.get(expected, [])) > 1:
+                others = [s for s in names[expected] if s != key]
+                problems.append(f"{expected}: also defined by {', '.join(others)}")
+        for key, error in sorted(resolver.errors.items()):
+            problems.append(f"could not resolve {key}: {error}")
+        return sorted(set(problems))
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Scaffold tenant/account/region/environment stacks from a matrix spec")
+    parser.add_argument("spec", help="Matrix spec (YAML)")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=8, help="Writer threads (default: 8)")
+    parser.add_argument("--force", action="store_true", help="Overwrite scaffolded files that were changed since")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be written without writing")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List every file with its status")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        scaffolder = Scaffolder(args.repo_root, load_yaml_file(args.spec), force=args.force, jobs=args.jobs)
+        scaffolder.plan()
+    except (OSError, yaml.YAMLError, SpecError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    statuses = scaffolder.write(dry_run=args.dry_run)
+    counts = {}  # type: Dict[str, int]
+    for path, status in statuses.items():
+        counts[status] = counts.get(status, 0) + 1
+        if args.verbose or status == "kept":
+            print(f"  {status:<9} {scaffolder.graph.base_path}/{path}")
+    for warning in scaffolder.warnings:
+        print(f"⚠️  {warning}")
+
+    verb = "Would scaffold" if args.dry_run else "Scaffolded"
+    print(f"{verb} {len(scaffolder.environments)} environments, {len(statuses)} files: " +
+          ", ".join(f"{counts[s]} {s}" for s in ("created", "updated", "unchanged", "kept") if s in counts) +
+          f" ({time.perf_counter() - start:.2f}s)")
+    if counts.get("kept"):
+        print("Kept files differ from the scaffold; rerun with --force to overwrite them")
+    if args.dry_run:
+        return
+
+    problems = scaffolder.sanity_check()
+    for problem in problems:
+        print(f"❌ {problem}")
+    print(f"Sanity check: {'failed' if problems else 'ok'} ({len(scaffolder.graph.stacks)} stacks in the import graph, "
+          f"{time.perf_counter() - start:.2f}s total)")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
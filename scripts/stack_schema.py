@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Atmos Manifest Schema Checks
+
+Validates stack manifests against the JSON schema configured under
+schemas.atmos.manifest in atmos.yaml
+(stacks/schemas/atmos/atmos-manifest/1.0/atmos-manifest.json), without the
+atmos CLI. Violations are reported with the JSON pointer of the offending
+value, e.g. /components/terraform/vpc/vars.
+
+- The schema is checked and compiled once per process. Worker processes
+  forked after compilation inherit the compiled validator.
+- Manifests are parsed and checked on a process pool, because YAML parsing
+  and schema evaluation are CPU bound.
+- Results are cached in .cache/schema-results.json by path, mtime and size.
+  The cache is dropped when the schema or the jsonschema installation changes,
+  so a rerun only checks the manifests that were edited.
+
+Used by the schema phase of validate_atmos.py; also runs on its own, e.g.
+as a pre-commit hook.
+
+Requirements:
+    - Python 3.6+
+    - PyYAML: pip install pyyaml
+    - jsonschema: pip install jsonschema
+
+Usage:
+    ./stack_schema.py [FILE...] [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -j, --jobs N          Worker processes (default: number of CPUs, at most 8)
+    --no-cache            Check every manifest, ignoring and not updating the result cache
+
+Without FILE arguments every manifest under the stacks base path is checked.
+Exit code: 0 when every manifest is valid, 1 on violations, 2 when the schema
+can't be loaded.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+import yaml
+
+from stack_graph import StackGraph, load_yaml_file, write_json_atomic
+
+try:
+    import jsonschema
+    from jsonschema.exceptions import SchemaError, best_match
+    from jsonschema.validators import validator_for
+except ImportError:
+    jsonschema = None
+    SchemaError = ValueError
+
+CACHE_VERSION = 1
+DEFAULT_SCHEMA_PATH = "stacks/schemas/atmos/atmos-manifest/1.0/atmos-manifest.json"
+
+# Below this many manifests a process pool costs more than it saves
+MIN_PARALLEL_FILES = 32
+
+# (schema path, mtime_ns) -> compiled validator, per process
+_compiled = {}  # type: Dict[Tuple[str, int], Any]
+
+
+def compiled_validator(schema_path: str) -> Any:
+    """The schema's validator, checked against its metaschema and compiled on first use"""
+    key = (schema_path, os.stat(schema_path).st_mtime_ns)
+    if key not in _compiled:
+        with open(schema_path, "r") as f:
+            schema = json.load(f)
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        _compiled[key] = cls(schema)
+    return _compiled[key]
+
+
+def json_pointer(path: Any) -> str:
+    """RFC 6901 pointer for a jsonschema error path"""
+    return "".join("/" + str(part).replace("~", "~0").replace("/", "~1") for part in path) or "/"
+
+
+def violations(validator: Any, document: Any) -> List[Dict[str, str]]:
+    """Schema violations of a parsed manifest, most specific error first for oneOf/anyOf failures"""
+    found = []
+    for error in validator.iter_errors(document if document is not None else {}):
+        if error.context:
+            error = best_match(error.context)
+        found.append({
+            "pointer": json_pointer(error.absolute_path),
+            "message": error.message,
+            "schema_path": json_pointer(error.absolute_schema_path),
+        })
+    return sorted(found, key=lambda v: (v["pointer"], v["message"]))
+
+
+def check_file(schema_path: str, file_path: str) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """Violations of one manifest file, or the reason it couldn't be parsed"""
+    try:
+        document = load_yaml_file(file_path)
+    except (yaml.YAMLError, OSError) as e:
+        return [], str(e)
+    return violations(compiled_validator(schema_path), document), None
+
+
+def _check_batch(args: Tuple[str, List[str]]) -> List[Tuple[List[Dict[str, str]], Optional[str]]]:
+    schema_path, file_paths = args
+    return [check_file(schema_path, path) for path in file_paths]
+
+
+class SchemaChecker:
+    """Checks manifests against the atmos manifest schema with a persistent result cache"""
+
+    def __init__(self, repo_root: str, schema_path: Optional[str] = None, cache_path: Optional[str] = None,
+                 jobs: int = min(8, os.cpu_count() or 1)):
+        self.repo_root = os.path.abspath(repo_root)
+        if schema_path is None:
+            atmos_config = os.path.join(self.repo_root, "atmos.yaml")
+            atmos = (load_yaml_file(atmos_config) or {}) if os.path.exists(atmos_config) else {}
+            schema_path = ((atmos.get("schemas") or {}).get("atmos") or {}).get("manifest", DEFAULT_SCHEMA_PATH)
+        self.schema_path = os.path.join(self.repo_root, schema_path)
+        self.cache_path = cache_path or os.path.join(self.repo_root, ".cache", "schema-results.json")
+        self.jobs = max(1, jobs)
+        self.checked = 0
+        self.cached = 0
+
+    @property
+    def available(self) -> bool:
+        """Whether jsonschema is installed"""
+        return jsonschema is not None
+
+    @property
+    def relative_schema_path(self) -> str:
+        """Schema path relative to the repository root"""
+        return os.path.relpath(self.schema_path, self.repo_root)
+
+    def fingerprint(self) -> str:
+        """Identity of the schema and of the jsonschema installation evaluating it"""
+        validators = sys.modules[validator_for.__module__].__file__
+        digest = hashlib.sha256(f"{validators}:{os.stat(validators).st_mtime_ns}".encode())
+        with open(self.schema_path, "rb") as f:
+            digest.update(f.read())
+        return digest.hexdigest()
+
+    def load_cache(self, fingerprint: str) -> Dict[str, Any]:
+        """Cached results, or none when they were recorded against another schema"""
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != CACHE_VERSION or cache.get("schema") != fingerprint:
+            return {}
+        return cache.get("files") or {}
+
+    def check(self, files: Dict[str, Tuple[int, int]], use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Check files given as absolute path -> (mtime_ns, size).
+
+        Returns path -> {"violations": [...], "error": parse error or None}.
+        Raises OSError or jsonschema's SchemaError when the schema itself is
+        unreadable or invalid.
+        """
+        fingerprint = self.fingerprint()
+        cache = self.load_cache(fingerprint) if use_cache else {}
+
+        results = {}  # type: Dict[str, Dict[str, Any]]
+        pending = []  # type: List[str]
+        for path, (mtime_ns, size) in files.items():
+            key = os.path.relpath(path, self.repo_root)
+            entry = cache.get(key)
+            if entry and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+                results[path] = entry
+            else:
+                pending.append(path)
+        self.cached = len(results)
+        self.checked = len(pending)
+        if pending:
+            compiled_validator(self.schema_path)  # compile before forking, and fail early on a bad schema
+
+        if len(pending) >= MIN_PARALLEL_FILES and self.jobs > 1:
+            # A few batches per worker keeps the pool busy without pickling each file separately
+            per_batch = max(1, len(pending) // (self.jobs * 4))
+            batches = [pending[i:i + per_batch] for i in range(0, len(pending), per_batch)]
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                work = [(self.schema_path, batch) for batch in batches]
+                outcomes = [o for batch in pool.map(_check_batch, work) for o in batch]
+        else:
+            outcomes = [check_file(self.schema_path, path) for path in pending]
+
+        for path, (found, error) in zip(pending, outcomes):
+            mtime_ns, size = files[path]
+            results[path] = {"mtime_ns": mtime_ns, "size": size, "violations": found, "error": error}
+
+        if use_cache and pending:
+            cache.update({os.path.relpath(p, self.repo_root): results[p] for p in pending if not results[p]["error"]})
+            write_json_atomic(self.cache_path, {"version": CACHE_VERSION, "schema": fingerprint, "files": cache})
+        return results
+
+    def check_graph(self, graph: StackGraph, keys: Optional[List[str]] = None,
+                    use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Check manifests of an import graph (all of them by default), keyed by graph key.
+
+        Manifests the graph couldn't parse are left out; the graph reports those.
+        """
+        paths = {}  # type: Dict[str, str]
+        files = {}  # type: Dict[str, Tuple[int, int]]
+        for key in sorted(graph.nodes if keys is None else keys):
+            node = graph.nodes.get(key)
+            if node and not node["error"]:
+                paths[key] = os.path.join(graph.stacks_path, node["path"])
+                files[paths[key]] = (node["mtime_ns"], node["size"])
+        results = self.check(files, use_cache=use_cache)
+        return {key: results[path] for key, path in paths.items()}
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Validate stack manifests against the atmos manifest schema")
+    parser.add_argument("files", nargs="*", help="Manifests to check (default: every manifest)")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="Worker processes (default: number of CPUs, at most 8)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and don't update the result cache")
+    args = parser.parse_args()
+
+    if jsonschema is None:
+        print("Error: jsonschema is required: pip install jsonschema", file=sys.stderr)
+        sys.exit(2)
+
+    checker = SchemaChecker(args.repo_root, jobs=args.jobs)
+    try:
+        if args.files:
+            files = {}
+            for path in args.files:
+                stat = os.stat(path)
+                files[os.path.abspath(path)] = (stat.st_mtime_ns, stat.st_size)
+            results = checker.check(files, use_cache=not args.no_cache)
+        else:
+            graph = StackGraph.from_atmos_config(checker.repo_root).load()
+            results = {os.path.join(graph.stacks_path, graph.nodes[key]["path"]): result
+                       for key, result in checker.check_graph(graph, use_cache=not args.no_cache).items()}
+    except (OSError, ValueError, SchemaError) as e:
+        print(f"Error: could not load {checker.relative_schema_path}: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    failed = 0
+    for path, result in sorted(results.items()):
+        name = os.path.relpath(path, checker.repo_root)
+        if result["error"]:
+            print(f"{name}: invalid YAML: {result['error']}")
+        for violation in result["violations"]:
+            print(f"{name}:{violation['pointer']}: {violation['message']}")
+        failed += bool(result["error"] or result["violations"])
+    print(f"{len(results) - failed} of {len(results)} manifests match {checker.relative_schema_path} "
+          f"({checker.checked} checked, {checker.cached} cached)", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
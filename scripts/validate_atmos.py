@@ -5,13 +5,20 @@ Atmos Validation Tool
 This script performs comprehensive validation of Atmos stacks:
 1. Validates YAML syntax for all catalog and environment files
 2. Validates catalog structure and component definitions
-3. Validates environment imports against the catalog
-4. Validates component dependencies are satisfied
-5. Runs atmos commands to validate the stack configuration
+3. Validates stack imports and metadata.inherits using the import graph
+4. Checks ${var} placeholders against the vars in scope for each stack (placeholder_scan.py)
+5. Validates every manifest against the atmos manifest schema (stack_schema.py)
+6. Resolves every stack natively (imports, mixins, inherits, vars/settings)
+7. Checks VPC and subnet ranges for overlaps and exhaustion across the estate (network_index.py)
+8. Checks S3 bucket, IAM role and DynamoDB table names for collisions and limits (name_index.py)
+9. Validates component dependencies are satisfied
+10. Orders each stack's components into deployment waves and rejects dependency cycles
+11. Runs atmos commands to validate the stack configuration
 
 Requirements:
     - Python 3.6+
     - PyYAML: pip install pyyaml
+    - jsonschema (optional, for the schema phase): pip install jsonschema
 
 Usage:
     ./validate_atmos.py [options]
@@ -19,6 +26,14 @@ Usage:
 Options:
     -r, --repo-root PATH  Path to repository root (default: current directory)
     -v, --verbose         Enable verbose output
+    --since REV           Only validate stacks affected by changes since REV
+    --describe-mode MODE  single: one `atmos describe stacks --format json` call (default)
+                          parallel: one `atmos describe stacks -s` call per stack
+    -j, --jobs N          Worker count for per-stack atmos calls and schema checks
+    --watch               Keep running and revalidate affected stacks on change (see validator_watch.py)
+    --port PORT           Port for the watch mode query interface (default: 8765, 0 disables it)
+    -f, --format FORMAT   text (default), jsonl or sarif; jsonl and sarif stream results as produced
+    --cprofile PATH       Capture a cProfile of the run and write the stats to PATH
 """
 
 import os
@@ -28,45 +43,278 @@ import subprocess
 import yaml
 import json
 import argparse
+import time
+import cProfile
+import pstats
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Set, Any, Tuple, Optional
 
+from stack_graph import StackGraph, git_changed_files
+from stack_resolver import StackResolver
+from stack_dag import ComponentDAG
+from stack_schema import SchemaChecker, SchemaError
+from network_index import NetworkIndex
+from name_index import NameIndex
+from placeholder_scan import PlaceholderScanner
+
+OUTPUT_FORMATS = ("text", "jsonl", "sarif")
+
+
+class JsonLinesEmitter:
+    """Writes each result as a JSON object on its own line as soon as it is recorded"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def begin(self):
+        pass
+
+    def emit(self, result: Dict[str, Any]):
+        self.stream.write(json.dumps(result) + "\n")
+        self.stream.flush()
+
+    def end(self, summary: Dict[str, Any], profile: Dict[str, Any]):
+        self.emit(dict(type="profile", **profile))
+        self.emit(dict(type="summary", **summary))
+
+
+class SarifEmitter:
+    """Streams a SARIF 2.1.0 log, writing each result into the open results array"""
+
+    LEVELS = {"error": "error", "warning": "warning", "success": "none", "skipped": "none"}
+    KINDS = {"error": "fail", "warning": "fail", "success": "pass", "skipped": "notApplicable"}
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.count = 0
+
+    def begin(self):
+        self.stream.write(
+            '{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", "runs": [{'
+            '"tool": {"driver": {"name": "validate_atmos", "rules": []}}, "results": [\n'
+        )
+        self.stream.flush()
+
+    def emit(self, result: Dict[str, Any]):
+        sarif = {
+            "ruleId": result["phase"],
+            "kind": self.KINDS[result["level"]],
+            "level": self.LEVELS[result["level"]],
+            "message": {"text": result["message"]},
+            "properties": {"stack": result["stack"], "durationMs": result["duration_ms"]},
+        }
+        if result["file"]:
+            sarif["locations"] = [{"physicalLocation": {"artifactLocation": {"uri": result["file"]}}}]
+        self.stream.write((",\n" if self.count else "") + json.dumps(sarif))
+        self.stream.flush()
+        self.count += 1
+
+    def end(self, summary: Dict[str, Any], profile: Dict[str, Any]):
+        self.stream.write(
+            "\n], \"invocations\": [" + json.dumps({"executionSuccessful": summary["passed"]}) + "], "
+            "\"properties\": " + json.dumps({"summary": summary, "profile": profile}) + "}]}\n"
+        )
+        self.stream.flush()
+
 
 class AtmosValidator:
-    def __init__(self, repo_root: str, verbose: bool = False):
+    # Changes to the validator itself invalidate every previous result
+    TOOLING_FILES = ("scripts/validate_atmos.py", "scripts/stack_graph.py", "scripts/stack_resolver.py",
+                     "scripts/stack_dag.py", "scripts/stack_schema.py", "scripts/network_index.py",
+                     "scripts/name_index.py", "scripts/placeholder_scan.py")
+
+    DESCRIBE_MODES = ("single", "parallel")
+
+    def __init__(self, repo_root: str, verbose: bool = False, describe_mode: str = "single",
+                 jobs: int = min(8, os.cpu_count() or 1), output_format: str = "text"):
         self.repo_root = repo_root
         self.verbose = verbose
+        self.describe_mode = describe_mode
+        self.jobs = max(1, jobs)
+        self.output_format = output_format
+        self.emitter = {"jsonl": JsonLinesEmitter, "sarif": SarifEmitter}.get(output_format, lambda: None)()
+        if self.emitter:
+            # Open the document before any phase, including --since's "changes", can emit into it
+            self.emitter.begin()
         self.catalog_path = os.path.join(repo_root, "stacks", "catalog")
         self.stacks_path = os.path.join(repo_root, "stacks")
-        self.account_path = os.path.join(repo_root, "stacks", "account")
         
         # Track validation results
         self.errors = []
         self.warnings = []
         self.successful_validations = []
+        self.skipped = []
+
+        # Structured results and timing profile
+        self.results = []  # type: List[Dict[str, Any]]
+        self.phase = "setup"
+        self.phase_timings = defaultdict(float)  # type: Dict[str, float]
+        self._last_result_at = time.perf_counter()
+        self._record_lock = threading.Lock()
+
+        # (command, seconds) for every subprocess that was run
+        self.command_timings = []  # type: List[Tuple[str, float]]
         
         # Cache
         self.catalog_components = {}
         self.environment_components = defaultdict(dict)
+        self.described_stacks = {}  # type: Dict[str, Any]
         self.dependencies = defaultdict(set)
+        self._graph = None
+        self._resolver = None
+        self.schema = SchemaChecker(repo_root, jobs=self.jobs)
+        # Watch mode hands in a long-lived scanner so only changed files are rescanned
+        self.placeholders = PlaceholderScanner(repo_root)
+        self._placeholders_scanned = False
+
+        # Incremental mode: None means validate every stack
+        self.only_stacks = None  # type: Optional[Set[str]]
 
     def log(self, message: str):
         """Log verbose information if enabled"""
         if self.verbose:
-            print(f"INFO: {message}")
-    
+            # Keep stdout clean for structured output
+            print(f"INFO: {message}", file=sys.stderr if self.emitter else sys.stdout)
+
+    def record(self, level: str, message: str, stack: Optional[str] = None, file: Optional[str] = None,
+               duration: Optional[float] = None):
+        """Record a result and stream it if a structured output format is active.
+
+        Unless given, a result's duration is the time spent since the previous
+        result (or the start of the phase), i.e. the time taken by its check.
+        """
+        with self._record_lock:
+            now = time.perf_counter()
+            if duration is None:
+                duration = now - self._last_result_at
+            self._last_result_at = now
+            {"error": self.errors, "warning": self.warnings,
+             "success": self.successful_validations, "skipped": self.skipped}[level].append(message)
+            result = {
+                "type": "result",
+                "level": level,
+                "phase": self.phase,
+                "stack": stack,
+                "file": file,
+                "message": message,
+                "duration_ms": round(duration * 1000, 3),
+            }
+            self.results.append(result)
+            if self.emitter:
+                self.emitter.emit(result)
+
+    def error(self, message: str, **kwargs):
+        self.record("error", message, **kwargs)
+
+    def warning(self, message: str, **kwargs):
+        self.record("warning", message, **kwargs)
+
+    def success(self, message: str, **kwargs):
+        self.record("success", message, **kwargs)
+
+    def skip(self, message: str, **kwargs):
+        self.record("skipped", message, **kwargs)
+
+    def stack_file(self, key: str) -> Optional[str]:
+        """Repo-relative path of a manifest in the import graph"""
+        node = self.graph.nodes.get(key)
+        return f"{self.graph.base_path}/{node['path']}" if node else None
+
+    def run_phase(self, phase: str, check):
+        """Run one validation phase, attributing its results and time to it"""
+        self.phase = phase
+        start = self._last_result_at = time.perf_counter()
+        try:
+            check()
+        finally:
+            self.phase_timings[phase] += time.perf_counter() - start
+
     def validate(self) -> bool:
         """Run all validations and return if successful"""
-        self.validate_catalog_yaml()
-        self.validate_catalog_structure()
-        self.validate_environments()
-        self.validate_dependencies()
-        self.validate_atmos_commands()
+        self.run_phase("catalog-yaml", self.validate_catalog_yaml)
+        self.run_phase("catalog-structure", self.validate_catalog_structure)
+        self.run_phase("environments", self.validate_environments)
+        self.run_phase("placeholders", self.validate_placeholders)
+        self.run_phase("schema", self.validate_schema)
+        self.run_phase("resolution", self.validate_resolved_stacks)
+        self.run_phase("network", self.validate_network)
+        self.run_phase("names", self.validate_names)
+        self.run_phase("dependencies", self.validate_dependencies)
+        self.run_phase("dependency-graph", self.validate_dependency_graph)
+        self.run_phase("atmos", self.validate_atmos_commands)
         
         return len(self.errors) == 0
 
+    def summary(self) -> Dict[str, Any]:
+        """Result counts"""
+        return {
+            "passed": not self.errors,
+            "successful_validations": len(self.successful_validations),
+            "warnings": len(self.warnings),
+            "errors": len(self.errors),
+            "skipped": len(self.skipped),
+        }
+
+    def profile(self, top: int = 10) -> Dict[str, Any]:
+        """Slowest phases, stacks, files and subprocesses of the run"""
+        by_stack = defaultdict(float)  # type: Dict[str, float]
+        by_file = defaultdict(float)  # type: Dict[str, float]
+        for result in self.results:
+            if result["stack"]:
+                by_stack[result["stack"]] += result["duration_ms"]
+            if result["file"]:
+                by_file[result["file"]] += result["duration_ms"]
+        by_command = defaultdict(float)  # type: Dict[str, float]
+        for cmd, seconds in self.command_timings:
+            by_command[cmd] += seconds * 1000
+
+        def rank(timings: Dict[str, float]) -> List[Dict[str, Any]]:
+            ordered = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:top]
+            return [{"name": name, "duration_ms": round(ms, 3)} for name, ms in ordered]
+
+        return {
+            "total_ms": round(sum(self.phase_timings.values()) * 1000, 3),
+            "phases": rank({phase: seconds * 1000 for phase, seconds in self.phase_timings.items()}),
+            "stacks": rank(by_stack),
+            "files": rank(by_file),
+            "commands": rank(by_command),
+        }
+
+    def limit_to_changes(self, base: str):
+        """Restrict stack checks to stacks affected by changes since `base`"""
+        self.log(f"Computing stacks affected by changes since {base}...")
+        try:
+            changed = git_changed_files(self.repo_root, base)
+        except (subprocess.CalledProcessError, OSError) as e:
+            self.warning(f"Could not diff against {base}, validating all stacks: {str(e).strip()}")
+            return
+
+        tooling = [path for path in changed if path in self.TOOLING_FILES or path == self.schema.relative_schema_path]
+        if tooling:
+            self.log(f"Validator changed ({', '.join(tooling)}), validating all stacks")
+            return
+
+        affected = self.graph.affected_stacks(changed)
+        for stack, paths in sorted(affected.items()):
+            self.log(f"{stack} affected by {', '.join(paths)}")
+        self.only_stacks = set(affected)
+
+        for stack in self.graph.stacks:
+            if stack not in self.only_stacks:
+                self.skip(f"Stack {stack} (not affected by changes since {base})", stack=stack)
+        self.success(
+            f"{len(changed)} files changed since {base}, {len(self.only_stacks)} of "
+            f"{len(self.graph.stacks)} stacks affected"
+        )
+
     def report(self):
         """Print validation report"""
+        if self.emitter:
+            self.emitter.end(self.summary(), self.profile())
+            return
+
         print("\n" + "=" * 80)
         print(" ATMOS VALIDATION REPORT ".center(80, "="))
         print("=" * 80)
@@ -83,6 +331,22 @@ class AtmosValidator:
             for warning in self.warnings:
                 print(f"  ! {warning}")
         
+        # Print where the time went, slowest first
+        if self.verbose:
+            profile = self.profile(top=5)
+            print(f"\n⏱️  PROFILE ({profile['total_ms']:.1f}ms):")
+            for section in ("phases", "stacks", "files", "commands"):
+                if profile[section]:
+                    print(f"  Slowest {section}:")
+                    for entry in profile[section]:
+                        print(f"    {entry['duration_ms']:10.1f}ms  {entry['name']}")
+
+        # Print skipped checks
+        if self.skipped:
+            print("\n⏭️  SKIPPED:")
+            for skipped in self.skipped:
+                print(f"  - {skipped}")
+
         # Print errors
         if self.errors:
             print("\n❌ ERRORS:")
@@ -94,6 +358,8 @@ class AtmosValidator:
         print(f"SUMMARY: {'PASSED' if not self.errors else 'FAILED'}")
         print(f"  Successful validations: {len(self.successful_validations)}")
         print(f"  Warnings: {len(self.warnings)}")
+        if self.skipped:
+            print(f"  Skipped: {len(self.skipped)}")
         print(f"  Errors: {len(self.errors)}")
         print("=" * 80 + "\n")
 
@@ -103,10 +369,12 @@ class AtmosValidator:
             with open(file_path, 'r') as f:
                 return yaml.safe_load(f)
         except yaml.YAMLError as e:
-            self.errors.append(f"Invalid YAML in {os.path.relpath(file_path, self.repo_root)}: {str(e)}")
+            self.error(f"Invalid YAML in {os.path.relpath(file_path, self.repo_root)}: {str(e)}",
+                       file=os.path.relpath(file_path, self.repo_root))
             return None
         except Exception as e:
-            self.errors.append(f"Failed to read {os.path.relpath(file_path, self.repo_root)}: {str(e)}")
+            self.error(f"Failed to read {os.path.relpath(file_path, self.repo_root)}: {str(e)}",
+                       file=os.path.relpath(file_path, self.repo_root))
             return None
 
     def validate_catalog_yaml(self):
@@ -130,9 +398,9 @@ class AtmosValidator:
                 invalid_count += 1
                 
         if invalid_count == 0:
-            self.successful_validations.append(f"All {valid_count} catalog YAML files are valid")
+            self.success(f"All {valid_count} catalog YAML files are valid")
         else:
-            self.errors.append(f"Found {invalid_count} invalid YAML files in catalog")
+            self.error(f"Found {invalid_count} invalid YAML files in catalog")
 
     def validate_catalog_structure(self):
         """Validate the structure of catalog components"""
@@ -147,13 +415,15 @@ class AtmosValidator:
                 continue
                 
             if not content or "name" not in content or "components" not in content:
-                self.errors.append(f"Catalog component {component_name} missing required fields (name or components)")
+                self.error(f"Catalog component {component_name} missing required fields (name or components)",
+                           file=f"stacks/catalog/{component_name}.yaml")
                 invalid_count += 1
                 continue
                 
             # Check terraform components section
             if "terraform" not in content.get("components", {}):
-                self.warnings.append(f"Catalog component {component_name} has no terraform components")
+                self.warning(f"Catalog component {component_name} has no terraform components",
+                             file=f"stacks/catalog/{component_name}.yaml")
             
             # Extract dependencies
             for tf_component, tf_config in content.get("components", {}).get("terraform", {}).items():
@@ -166,25 +436,30 @@ class AtmosValidator:
             valid_count += 1
                 
         if invalid_count == 0:
-            self.successful_validations.append(f"All {valid_count} catalog components have valid structure")
+            self.success(f"All {valid_count} catalog components have valid structure")
 
-    def find_environments(self) -> List[Tuple[str, str, str]]:
-        """Find all environments in the stacks/account directory"""
-        environments = []
-        
-        if os.path.exists(self.account_path):
-            for tenant in os.listdir(self.account_path):
-                tenant_path = os.path.join(self.account_path, tenant)
-                if os.path.isdir(tenant_path):
-                    for account in os.listdir(tenant_path):
-                        account_path = os.path.join(tenant_path, account)
-                        if os.path.isdir(account_path):
-                            for env in os.listdir(account_path):
-                                env_path = os.path.join(account_path, env)
-                                if os.path.isdir(env_path) and os.path.exists(os.path.join(env_path, "main.yaml")):
-                                    environments.append((tenant, account, env))
-        
-        return environments
+    @property
+    def graph(self) -> StackGraph:
+        """Import graph over the stacks tree, loaded from the serialized index"""
+        if self._graph is None:
+            self._graph = StackGraph.from_atmos_config(self.repo_root).load()
+        return self._graph
+
+    @property
+    def resolver(self) -> StackResolver:
+        """Native stack resolver sharing the import graph"""
+        if self._resolver is None:
+            self._resolver = StackResolver(self.graph)
+        return self._resolver
+
+    def find_environments(self) -> List[str]:
+        """Find all top-level stacks matched by stacks.included_paths in atmos.yaml.
+
+        In incremental mode only the stacks affected by the change set are returned.
+        """
+        if self.only_stacks is None:
+            return self.graph.stacks
+        return [stack for stack in self.graph.stacks if stack in self.only_stacks]
 
     def validate_environments(self):
         """Validate all environment stacks"""
@@ -192,67 +467,149 @@ class AtmosValidator:
         environments = self.find_environments()
         
         if not environments:
-            self.warnings.append("No environments found in stacks/account directory")
+            if self.only_stacks is None:
+                self.warning("No stacks matched stacks.included_paths in atmos.yaml")
             return
-            
-        for tenant, account, env in environments:
-            env_path = os.path.join(self.account_path, tenant, account, env)
-            main_file = os.path.join(env_path, "main.yaml")
-            
-            # Validate main.yaml 
-            main_content = self.load_yaml(main_file)
-            if not main_content:
-                continue
-                
-            # Check imports
-            if "import" not in main_content:
-                self.errors.append(f"Environment {tenant}/{account}/{env} main.yaml missing 'import' section")
+
+        reported_files = set()  # type: Set[str]
+        for stack in environments:
+            stack_node = self.graph.nodes[stack]
+            if not stack_node["error"] and not stack_node["imports"]:
+                self.error(f"Stack {stack} missing 'import' section", stack=stack, file=self.stack_file(stack))
                 continue
-                
-            # Extract catalog imports
-            catalog_imports = []
-            for imp in main_content.get("import", []):
-                if isinstance(imp, str) and imp.startswith("catalog/"):
-                    catalog_imports.append(imp[8:])  # Remove "catalog/" prefix
-            
-            # Verify all imported components exist in catalog
-            missing_imports = []
-            for imp in catalog_imports:
-                if imp not in self.catalog_components:
-                    missing_imports.append(imp)
-            
-            if missing_imports:
-                self.errors.append(f"Environment {tenant}/{account}/{env} imports catalog components that don't exist: {', '.join(missing_imports)}")
+
+            # Every manifest the stack pulls in must parse and resolve its own imports
+            broken_imports = []
+            for key in self.graph.stack_files(stack):
+                node = self.graph.nodes[key]
+                if node["error"] and key not in reported_files:
+                    reported_files.add(key)
+                    self.error(f"Invalid YAML in {self.graph.base_path}/{node['path']}: {node['error']}",
+                               stack=stack, file=self.stack_file(key))
+                for imp in self.graph.missing_imports(key):
+                    broken_imports.append(imp if key == stack else f"{imp} (from {key})")
+
+            if broken_imports:
+                self.error(f"Stack {stack} imports manifests that don't exist: {', '.join(broken_imports)}",
+                           stack=stack, file=self.stack_file(stack))
             else:
-                self.successful_validations.append(f"Environment {tenant}/{account}/{env} imports valid catalog components")
-                
-            # Check component files in the environment
-            for filename in os.listdir(env_path):
-                if not filename.endswith('.yaml') or filename in ['main.yaml', 'variables.yaml']:
-                    continue
-                    
-                component_name = filename[:-5]  # Remove .yaml
-                component_path = os.path.join(env_path, filename)
-                
-                # Load and validate the component file
-                component_content = self.load_yaml(component_path)
-                if component_content:
-                    self.environment_components[(tenant, account, env)][component_name] = component_content
-                    
-                    # Check imports
-                    component_imports = []
-                    for imp in component_content.get("import", []):
-                        if isinstance(imp, str) and imp.startswith("catalog/"):
-                            component_imports.append(imp[8:])  # Remove "catalog/" prefix
-                    
-                    # Verify component's catalog imports exist
-                    missing_component_imports = []
-                    for imp in component_imports:
-                        if imp not in self.catalog_components:
-                            missing_component_imports.append(imp)
-                    
-                    if missing_component_imports:
-                        self.errors.append(f"Component {component_name} in {tenant}/{account}/{env} imports catalog components that don't exist: {', '.join(missing_component_imports)}")
+                self.success(
+                    f"Stack {stack} resolves all {len(self.graph.imports_of(stack))} imported manifests",
+                    stack=stack, file=self.stack_file(stack)
+                )
+
+            # Check metadata.inherits chains against the components visible in the stack
+            components = self.graph.stack_components(stack)
+            self.environment_components[stack] = components
+            for qualified, component in sorted(components.items()):
+                if component["missing_inherits"]:
+                    self.error(
+                        f"Component {component['name']} in {stack} inherits from components that aren't "
+                        f"defined in the stack: {', '.join(component['missing_inherits'])}",
+                        stack=stack, file=self.stack_file(component["files"][-1])
+                    )
+
+        validated_files = {key for stack in environments for key in self.graph.stack_files(stack)}
+        for cycle in self.graph.cycles:
+            if validated_files.intersection(cycle):
+                self.error(f"Import cycle: {' -> '.join(cycle)}", file=self.stack_file(cycle[0]))
+
+    def validate_placeholders(self):
+        """Check ${var} placeholders against the vars in scope for each stack, and flag unused vars"""
+        self.log("Scanning placeholders...")
+        if not self._placeholders_scanned:
+            self.placeholders.scan(self.graph)
+            self._placeholders_scanned = True
+        findings = self.placeholders.findings(None if self.only_stacks is None else self.find_environments())
+        for finding in findings:
+            {"error": self.error, "warning": self.warning}[finding["level"]](
+                finding["message"], stack=finding["stack"], file=self.stack_file(finding["file"]))
+        if not findings:
+            self.success(f"All placeholders have a var in scope and every stack-wide var is read "
+                         f"({self.placeholders.scanned} manifests scanned, {self.placeholders.unchanged} unchanged)")
+
+    def validate_schema(self):
+        """Validate every manifest against the atmos manifest schema"""
+        self.log(f"Validating manifests against {self.schema.relative_schema_path}...")
+        if not self.schema.available:
+            self.skip("Schema validation (jsonschema not installed: pip install jsonschema)")
+            return
+        if not os.path.exists(self.schema.schema_path):
+            self.warning(f"Manifest schema {self.schema.relative_schema_path} not found, skipping schema validation")
+            return
+
+        keys = None
+        if self.only_stacks is not None:
+            keys = sorted({key for stack in self.find_environments() for key in self.graph.stack_files(stack)})
+        try:
+            results = self.schema.check_graph(self.graph, keys)
+        except (OSError, ValueError, SchemaError) as e:
+            self.error(f"Could not load manifest schema {self.schema.relative_schema_path}: {e}",
+                       file=self.schema.relative_schema_path)
+            return
+
+        invalid = 0
+        for key, result in sorted(results.items()):
+            for violation in result["violations"]:
+                self.error(f"Schema violation in {self.stack_file(key)} at {violation['pointer']}: "
+                           f"{violation['message']}", stack=key if self.graph.is_stack(key) else None,
+                           file=self.stack_file(key))
+            invalid += bool(result["violations"])
+        if not invalid:
+            self.success(f"All {len(results)} manifests match {self.schema.relative_schema_path} "
+                         f"({self.schema.checked} checked, {self.schema.cached} unchanged)")
+
+    def validate_resolved_stacks(self):
+        """Resolve every stack natively and check the final component configuration"""
+        self.log("Resolving stacks natively...")
+        components_path = os.path.join(self.repo_root, self.graph.components_base_path)
+
+        for stack in self.find_environments():
+            resolved = self.resolver.resolve_stack(stack)
+            terraform = resolved["components"].get("terraform", {})
+            missing = sorted({
+                c["component"] for c in terraform.values()
+                if not os.path.isdir(os.path.join(components_path, c["component"]))
+            })
+            if missing:
+                self.warning(
+                    f"Stack {stack} uses Terraform components not found in "
+                    f"{self.graph.components_base_path}: {', '.join(missing)}",
+                    stack=stack, file=self.stack_file(stack)
+                )
+            self.success(f"Stack {stack} resolves {len(terraform)} Terraform components natively",
+                         stack=stack, file=self.stack_file(stack))
+
+        for key, error in sorted(self.resolver.errors.items()):
+            self.error(f"Failed to resolve {key}: {error}", file=self.stack_file(key))
+
+    def validate_network(self):
+        """Check VPC and subnet ranges for overlaps, stray subnets and exhaustion"""
+        self.log("Checking VPC and subnet ranges...")
+        # Overlaps are checked against the whole estate, but only reported for the selected stacks
+        index = NetworkIndex(self.repo_root).load(resolver=self.resolver)
+        stacks = None if self.only_stacks is None else self.find_environments()
+        findings = index.findings(stacks)
+        for finding in findings:
+            {"error": self.error, "warning": self.warning}[finding["level"]](
+                finding["message"], stack=finding["stack"], file=self.stack_file(finding["stack"]))
+        if not findings:
+            checked = [key for key in index.vpcs if stacks is None or key[0] in stacks]
+            self.success(f"All {len(checked)} VPCs have non-overlapping ranges with their subnets inside them "
+                         f"({len(index.vpcs)} VPCs indexed, {index.resolved} stacks resolved, {index.cached} cached)")
+
+    def validate_names(self):
+        """Check resource names derived from the naming patterns for collisions and AWS limits"""
+        self.log("Checking resource names...")
+        # Collisions are checked against the whole estate, but only reported for the selected stacks
+        index = NameIndex(self.repo_root).load(resolver=self.resolver)
+        stacks = None if self.only_stacks is None else self.find_environments()
+        findings = index.findings(stacks)
+        for finding in findings:
+            self.error(finding["message"], stack=finding["stack"], file=self.stack_file(finding["stack"]))
+        if not findings:
+            self.success(f"All {len(index.users)} S3 bucket, IAM role and DynamoDB table names are unique within "
+                         f"their scope and within AWS limits ({index.resolved} stacks resolved, {index.cached} cached)")
 
     def validate_dependencies(self):
         """Validate that all dependencies are satisfied"""
@@ -267,23 +624,107 @@ class AtmosValidator:
                     missing_dependencies.add(dep)
         
         if missing_dependencies:
-            self.errors.append(f"Missing components required as dependencies: {', '.join(missing_dependencies)}")
+            self.error(f"Missing components required as dependencies: {', '.join(missing_dependencies)}")
         else:
-            self.successful_validations.append(f"All {len(all_dependencies)} dependency references are satisfied")
+            self.success(f"All {len(all_dependencies)} dependency references are satisfied")
+
+    def validate_dependency_graph(self):
+        """Build each stack's component DAG and check it can be deployed in waves"""
+        self.log("Ordering stack components into deployment waves...")
+        for stack in self.find_environments():
+            dag = ComponentDAG.for_stack(self.resolver, stack)
+            for cycle in dag.cycles:
+                self.error(f"Dependency cycle in {stack}: {' -> '.join(cycle)}",
+                           stack=stack, file=self.stack_file(stack))
+            for name, references in sorted(dag.unresolved.items()):
+                self.warning(f"Component {name} in {stack} depends on components not deployed by the stack: "
+                             f"{', '.join(references)}", stack=stack, file=self.stack_file(stack))
+            if not dag.cycles:
+                path, _ = dag.critical_path()
+                self.success(f"Stack {stack} deploys {len(dag.components)} components in {len(dag.waves())} waves "
+                             f"(critical path: {' -> '.join(path)})", stack=stack, file=self.stack_file(stack))
 
     def run_cmd(self, cmd: List[str]) -> Tuple[int, str, str]:
-        """Run a command and return exit code, stdout, stderr"""
+        """Run a command from the repo root and return exit code, stdout, stderr"""
+        start = time.perf_counter()
         try:
             process = subprocess.Popen(
                 cmd, 
                 stdout=subprocess.PIPE, 
                 stderr=subprocess.PIPE,
-                text=True
+                text=True,
+                cwd=self.repo_root
             )
             stdout, stderr = process.communicate()
             return process.returncode, stdout, stderr
         except Exception as e:
             return 1, "", str(e)
+        finally:
+            self.command_timings.append((" ".join(cmd), time.perf_counter() - start))
+
+    def describe_all_stacks(self) -> Optional[Dict[str, Any]]:
+        """Describe every stack with a single atmos invocation.
+
+        Returns the parsed output keyed by stack file (e.g.
+        orgs/fnx/dev/eu-west-2/testenv-01), or None if atmos failed or
+        printed something other than JSON.
+        """
+        exit_code, stdout, stderr = self.run_cmd(["atmos", "describe", "stacks", "--format", "json"])
+        if exit_code != 0:
+            self.log(f"atmos describe stacks --format json failed: {stderr.strip()}")
+            return None
+        try:
+            described = json.loads(stdout)
+        except ValueError as e:
+            self.log(f"atmos describe stacks returned invalid JSON: {e}")
+            return None
+
+        # Atmos keys the output by stack name; map it back to the stack manifest
+        by_file = {}
+        for stack_name, stack in (described or {}).items():
+            stack_file = stack_name
+            for components in (stack.get("components") or {}).values():
+                for component in (components or {}).values():
+                    if isinstance(component, dict) and component.get("atmos_stack_file"):
+                        stack_file = component["atmos_stack_file"]
+                        break
+                else:
+                    continue
+                break
+            by_file[stack_file] = stack
+        return by_file
+
+    def check_described_stack(self, stack_name: str, described: Optional[Dict[str, Any]]):
+        """Check one stack against the single-shot describe output"""
+        if described is None:
+            self.error(f"Stack {stack_name} not found in atmos describe stacks output",
+                       stack=stack_name, file=self.stack_file(stack_name))
+            return
+        components = described.get("components") or {}
+        count = sum(len(c or {}) for c in components.values())
+        if count == 0:
+            self.warning(f"Stack {stack_name} has no components", stack=stack_name, file=self.stack_file(stack_name))
+        self.success(f"Stack {stack_name} validated successfully ({count} components)",
+                     stack=stack_name, file=self.stack_file(stack_name))
+
+    def describe_stacks_in_parallel(self, environments: List[str]):
+        """Describe each stack in its own atmos process on a bounded pool"""
+        def describe(stack_name: str) -> Tuple[str, int, str, float]:
+            start = time.perf_counter()
+            exit_code, stdout, stderr = self.run_cmd(["atmos", "describe", "stacks", "-s", stack_name])
+            return stack_name, exit_code, stderr, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = [pool.submit(describe, stack_name) for stack_name in environments]
+            # Record results as they complete so streaming output is not held back by the slowest stack
+            for future in as_completed(futures):
+                stack_name, exit_code, stderr, elapsed = future.result()
+                if exit_code == 0:
+                    self.success(f"Stack {stack_name} validated successfully",
+                                 stack=stack_name, file=self.stack_file(stack_name), duration=elapsed)
+                else:
+                    self.error(f"Stack {stack_name} validation failed: {stderr.strip()}",
+                               stack=stack_name, file=self.stack_file(stack_name), duration=elapsed)
 
     def validate_atmos_commands(self):
         """Validate with atmos CLI commands"""
@@ -292,26 +733,34 @@ class AtmosValidator:
         # Check if atmos is available
         exit_code, stdout, stderr = self.run_cmd(["which", "atmos"])
         if exit_code != 0:
-            self.warnings.append("Atmos CLI not found in PATH, skipping atmos command validation")
+            self.warning("Atmos CLI not found in PATH, skipping atmos command validation")
             return
             
         # Run atmos validate stacks to check all stacks
-        exit_code, stdout, stderr = self.run_cmd(["atmos", "validate", "stacks"])
-        if exit_code == 0:
-            self.successful_validations.append("atmos validate stacks command succeeded")
+        if self.only_stacks is not None:
+            self.skip("atmos validate stacks (incremental mode describes affected stacks only)")
         else:
-            self.errors.append(f"atmos validate stacks failed: {stderr.strip()}")
+            exit_code, stdout, stderr = self.run_cmd(["atmos", "validate", "stacks"])
+            if exit_code == 0:
+                self.success("atmos validate stacks command succeeded")
+            else:
+                self.error(f"atmos validate stacks failed: {stderr.strip()}")
 
         # Validate specific environments with atmos describe stacks
         environments = self.find_environments()
-        for tenant, account, env in environments:
-            stack_name = f"{tenant}-{account}-{env}"
-            
-            exit_code, stdout, stderr = self.run_cmd(["atmos", "describe", "stacks", "-s", stack_name])
-            if exit_code == 0:
-                self.successful_validations.append(f"Stack {stack_name} validated successfully")
-            else:
-                self.errors.append(f"Stack {stack_name} validation failed: {stderr.strip()}")
+        if not environments:
+            return
+
+        if self.describe_mode == "single":
+            described = self.describe_all_stacks()
+            if described is not None:
+                self.described_stacks = described
+                for stack_name in environments:
+                    self.check_described_stack(stack_name, described.get(stack_name))
+                return
+            self.log(f"Falling back to per-stack describe on {self.jobs} workers")
+
+        self.describe_stacks_in_parallel(environments)
 
 
 def main():
@@ -319,6 +768,19 @@ def main():
     parser = argparse.ArgumentParser(description="Validate Atmos stacks, components, and dependencies")
     parser.add_argument("-r", "--repo-root", default=os.getcwd(), help="Path to repository root (default: current directory)")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    parser.add_argument("--since", metavar="REV",
+                        help="Only validate stacks affected by changes since this git revision")
+    parser.add_argument("--describe-mode", choices=AtmosValidator.DESCRIBE_MODES, default="single",
+                        help="Describe all stacks in one atmos call (single) or one call per stack (parallel)")
+    parser.add_argument("-j", "--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="Worker count for per-stack atmos calls")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running, revalidate affected stacks on change and serve results locally")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Port for the watch mode query interface (0 disables it)")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="text",
+                        help="Report format; jsonl and sarif stream each result as it is produced")
+    parser.add_argument("--cprofile", metavar="PATH", help="Capture a cProfile of the run and write the stats to PATH")
     args = parser.parse_args()
     
     # Find repo root - looking for stacks/catalog directory
@@ -328,9 +790,24 @@ def main():
         print("Make sure the --repo-root parameter points to the repository root directory")
         sys.exit(1)
     
+    if args.watch:
+        from validator_watch import run_watch
+        run_watch(repo_root, port=args.port, verbose=args.verbose)
+        return
+
     # Run validation
-    validator = AtmosValidator(repo_root, args.verbose)
+    validator = AtmosValidator(repo_root, args.verbose, describe_mode=args.describe_mode, jobs=args.jobs,
+                               output_format=args.format)
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler:
+        profiler.enable()
+    if args.since:
+        validator.run_phase("changes", lambda: validator.limit_to_changes(args.since))
     validator.validate()
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
     validator.report()
     
     # Return exit code
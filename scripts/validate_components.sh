@@ -7,26 +7,19 @@ cd "$REPO_ROOT" || exit 1
 
 echo "===================== VALIDATING CATALOG TENANT VALUES ====================="
 echo "Checking if all catalog components have tenant defined..."
-if [ -f "./scripts/validate_catalog_tenant.py" ]; then
-  ./scripts/validate_catalog_tenant.py
+if ./scripts/catalog_rewrite.py check; then
+  echo ""
 else
-  echo "Validation script not found. Run this first:"
-  echo "chmod +x ./scripts/validate_catalog_tenant.py"
-fi
-echo ""
-
-echo "===================== ADDING TENANT TO CATALOG COMPONENTS =================="
-echo "Would you like to add tenant to catalog components? (y/n)"
-read -r add_tenant
-if [[ "$add_tenant" == "y" ]]; then
-  if [ -f "./scripts/add_tenant_to_catalog.py" ]; then
-    ./scripts/add_tenant_to_catalog.py
-  else
-    echo "Tenant addition script not found. Run this first:"
-    echo "chmod +x ./scripts/add_tenant_to_catalog.py"
+  echo ""
+  echo "===================== ADDING TENANT TO CATALOG COMPONENTS =================="
+  ./scripts/catalog_rewrite.py apply --dry-run
+  echo "Would you like to apply these changes to the catalog components? (y/n)"
+  read -r add_tenant
+  if [[ "$add_tenant" == "y" ]]; then
+    ./scripts/catalog_rewrite.py apply
   fi
+  echo ""
 fi
-echo ""
 
 echo "===================== ATMOS STACKS LISTING ================================"
 echo "Listing all stacks with the current configuration:"
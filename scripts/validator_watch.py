@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Atmos Validator Watch Mode
+
+Keeps the import graph, the parsed manifests, the placeholder scan and the
+resolved stacks in memory and revalidates only the stacks affected by each
+filesystem change.
+Results are served over a small local HTTP interface so that editors and
+pre-commit hooks can ask for them without re-parsing anything.
+
+File changes are picked up through watchdog when it is installed
+(pip install watchdog) and by polling file sizes and modification times
+otherwise.
+
+Endpoints (127.0.0.1 only):
+    GET  /health               Model status
+    GET  /results              Results for every stack
+    GET  /results/<stack>      Results for one stack
+    GET  /importers/<file>     Files and stacks importing a manifest
+    POST /refresh              Apply changes now; body: {"paths": [...]} (optional)
+
+Requirements:
+    - Python 3.7+
+    - PyYAML: pip install pyyaml
+    - watchdog (optional): pip install watchdog
+
+Usage:
+    ./validator_watch.py [options]
+    ./validate_atmos.py --watch [options]
+
+Options:
+    -r, --repo-root PATH  Path to repository root (default: current directory)
+    -p, --port PORT       Port for the query interface (default: 8765, 0 disables it)
+    -i, --interval SECS   Polling interval when watchdog is not installed (default: 0.5)
+    -v, --verbose         Enable verbose output
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set, Any, Optional
+from urllib.parse import unquote
+
+from stack_graph import StackGraph
+from stack_resolver import StackResolver
+from placeholder_scan import PlaceholderScanner
+from validate_atmos import AtmosValidator
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+DEFAULT_PORT = 8765
+
+
+class ValidationWatcher:
+    """Warm in-memory validation model that revalidates affected stacks on change"""
+
+    def __init__(self, repo_root: str, verbose: bool = False):
+        self.repo_root = os.path.abspath(repo_root)
+        self.verbose = verbose
+        self.lock = threading.RLock()
+        self.results = {}  # type: Dict[str, Dict[str, Any]]
+        self.pending: Set[str] = set()
+        self.last_change = None  # type: Optional[Dict[str, Any]]
+        self.load()
+
+    def log(self, message: str):
+        """Print a timestamped status line"""
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def load(self):
+        """Build the model from the serialized index and validate every stack"""
+        with self.lock:
+            start = time.perf_counter()
+            self.graph = StackGraph.from_atmos_config(self.repo_root).load()
+            self.resolver = StackResolver(self.graph)
+            self.placeholders = PlaceholderScanner(self.repo_root)
+            self.results = {}
+            self.validate_stacks(self.graph.stacks)
+            self.log(f"Loaded {len(self.graph.nodes)} manifests and validated {len(self.graph.stacks)} stacks "
+                     f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def validate_stacks(self, stacks: List[str]):
+        """Run the offline stack checks for each stack against the warm model"""
+        validator = AtmosValidator(self.repo_root, self.verbose)
+        validator._graph = self.graph
+        validator._resolver = self.resolver
+        validator.placeholders = self.placeholders
+        for stack in stacks:
+            start = time.perf_counter()
+            validator.errors, validator.warnings, validator.successful_validations = [], [], []
+            validator.results = []
+            validator.only_stacks = {stack}
+            validator.validate_environments()
+            validator.validate_placeholders()
+            validator.validate_resolved_stacks()
+            validator.validate_dependency_graph()
+            self.results[stack] = {
+                "passed": not validator.errors,
+                "errors": validator.errors,
+                "warnings": validator.warnings,
+                "successful_validations": validator.successful_validations,
+                "validated_at": time.time(),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
+
+    def apply_changes(self, paths: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Re-parse changed manifests and revalidate the stacks they affect.
+
+        With `paths` only those files are checked; otherwise the pending
+        watchdog events are used, or the whole tree is stat-ed when polling.
+        """
+        with self.lock:
+            start = time.perf_counter()
+            if paths is None and self.pending:
+                paths, self.pending = sorted(self.pending), set()
+            rel_paths = [os.path.relpath(p, self.repo_root) if os.path.isabs(p) else p for p in paths or []]
+            if "atmos.yaml" in rel_paths:
+                self.load()
+                return {"changed": ["atmos.yaml"], "revalidated": sorted(self.results)}
+
+            changed = self.graph.refresh(rel_paths if paths is not None else None)
+            if not changed:
+                return {"changed": [], "revalidated": []}
+
+            self.resolver.invalidate(changed)
+            changed_paths = [f"{self.graph.base_path}/{key}.yaml" for key in sorted(changed)]
+            affected = sorted(self.graph.affected_stacks(changed_paths))
+            for stack in list(self.results):
+                if stack not in self.graph.stacks:
+                    del self.results[stack]
+            self.validate_stacks(affected)
+            self.graph.save()
+
+            elapsed = (time.perf_counter() - start) * 1000
+            errors = sum(len(self.results[s]["errors"]) for s in affected)
+            warnings = sum(len(self.results[s]["warnings"]) for s in affected)
+            self.last_change = {
+                "changed": sorted(changed),
+                "revalidated": affected,
+                "duration_ms": round(elapsed, 3),
+            }
+            self.log(f"{len(changed)} manifests changed, revalidated {len(affected)} stacks in {elapsed:.1f}ms: "
+                     f"{errors} errors, {warnings} warnings")
+            for stack in affected:
+                for error in self.results[stack]["errors"]:
+                    self.log(f"  ✗ {error}")
+            return self.last_change
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate status of the model"""
+        with self.lock:
+            return {
+                "status": "ok",
+                "files": len(self.graph.nodes),
+                "stacks": len(self.graph.stacks),
+                "failed_stacks": sorted(s for s, r in self.results.items() if not r["passed"]),
+                "last_change": self.last_change,
+            }
+
+    def watch(self, interval: float = 0.5):
+        """Block forever, applying changes as they are observed"""
+        if Observer is not None:
+            watcher = self
+
+            class Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+                        if path and (path.endswith((".yaml", ".yml"))):
+                            with watcher.lock:
+                                watcher.pending.add(path)
+
+            observer = Observer()
+            observer.schedule(Handler(), self.graph.stacks_path, recursive=True)
+            observer.schedule(Handler(), self.repo_root, recursive=False)
+            observer.start()
+            self.log(f"Watching {self.graph.stacks_path} for changes (watchdog)")
+            try:
+                while True:
+                    time.sleep(0.05)
+                    if self.pending:
+                        self.apply_changes()
+            finally:
+                observer.stop()
+                observer.join()
+        else:
+            self.log(f"Watching {self.graph.stacks_path} for changes (polling every {interval}s)")
+            atmos_config = os.path.join(self.repo_root, "atmos.yaml")
+            atmos_mtime = os.path.getmtime(atmos_config) if os.path.exists(atmos_config) else None
+            while True:
+                time.sleep(interval)
+                current = os.path.getmtime(atmos_config) if os.path.exists(atmos_config) else None
+                if current != atmos_mtime:
+                    atmos_mtime = current
+                    self.apply_changes(["atmos.yaml"])
+                else:
+                    self.apply_changes()
+
+
+def make_handler(watcher: ValidationWatcher):
+    """Build the HTTP request handler bound to a watcher"""
+
+    class QueryHandler(BaseHTTPRequestHandler):
+        def send_json(self, status: int, payload: Any):
+            body = json.dumps(payload, indent=2).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = unquote(self.path.split("?", 1)[0]).rstrip("/")
+            if path in ("", "/health"):
+                self.send_json(200, watcher.summary())
+            elif path == "/results":
+                with watcher.lock:
+                    self.send_json(200, {"summary": watcher.summary(), "stacks": watcher.results})
+            elif path.startswith("/results/"):
+                stack = path[len("/results/"):]
+                with watcher.lock:
+                    result = watcher.results.get(stack)
+                if result is None:
+                    self.send_json(404, {"error": f"unknown stack {stack}"})
+                else:
+                    self.send_json(200, result)
+            elif path.startswith("/importers/"):
+                with watcher.lock:
+                    key = watcher.graph.key_for_path(path[len("/importers/"):])
+                    if key is None or key not in watcher.graph.nodes:
+                        self.send_json(404, {"error": "unknown manifest"})
+                        return
+                    self.send_json(200, {
+                        "files": sorted(watcher.graph.importers_of(key)),
+                        "stacks": watcher.graph.stacks_importing(key),
+                    })
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/refresh":
+                self.send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            paths = None
+            if length:
+                try:
+                    paths = json.loads(self.rfile.read(length) or b"{}").get("paths")
+                except ValueError:
+                    self.send_json(400, {"error": "invalid JSON body"})
+                    return
+            change = watcher.apply_changes(paths)
+            with watcher.lock:
+                stacks = {s: watcher.results[s] for s in change["revalidated"] if s in watcher.results}
+            self.send_json(200, dict(change, results=stacks))
+
+        def log_message(self, format, *args):
+            if watcher.verbose:
+                watcher.log("HTTP " + format % args)
+
+    return QueryHandler
+
+
+def run_watch(repo_root: str, port: int = DEFAULT_PORT, interval: float = 0.5, verbose: bool = False):
+    """Start the query interface and watch for changes until interrupted"""
+    watcher = ValidationWatcher(repo_root, verbose)
+    if port:
+        server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(watcher))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        watcher.log(f"Query interface on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        watcher.watch(interval)
+    except KeyboardInterrupt:
+        watcher.graph.save()
+        watcher.log("Stopped")
+
+
+def main():
+    """Main entry point for the script"""
+    parser = argparse.ArgumentParser(description="Watch Atmos stacks and revalidate affected stacks on change")
+    parser.add_argument("-r", "--repo-root", default=os.getcwd(),
+                        help="Path to repository root (default: current directory)")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT,
+                        help="Port for the query interface (0 disables it)")
+    parser.add_argument("-i", "--interval", type=float, default=0.5,
+                        help="Polling interval when watchdog is not installed")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.repo_root, "stacks")):
+        print(f"Error: Could not find stacks directory in {args.repo_root}")
+        sys.exit(1)
+    run_watch(args.repo_root, args.port, args.interval, args.verbose)
+
+
+if __name__ == "__main__":
+    main()